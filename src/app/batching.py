@@ -0,0 +1,104 @@
+import threading
+
+# Search.predict scores large feature frames in batches: big enough to amortize
+# the per-call overhead of the scorer, small enough to bound the working memory.
+# The batch size climbs over powers of two while the observed throughput improves.
+
+MIN_BATCH_SIZE = 256
+DEFAULT_BATCH_SIZE = 8192
+DEFAULT_MEMORY_LIMIT = 64 << 20  # bytes of scoring working memory per batch
+
+
+def row_bytes(n_features: int) -> int:
+    """
+    Estimated scoring working memory of one row: the float64 input copy, the
+    scaled copy of sklearn pipelines and a few per-row temporaries.
+    """
+    return 8 * (2 * n_features + 4)
+
+
+def power_of_two(n: int) -> int:
+    """
+    :return: Largest power of two <= n (n >= 1).
+    """
+    return 1 << (max(n, 1).bit_length() - 1)
+
+
+class AdaptiveBatchSize:
+    """
+    Thread-safe batch size chooser. Keeps a smoothed throughput (rows/s) per
+    batch size and moves to the best of the current size and its halved and
+    doubled neighbours, trying an unmeasured doubled size first.
+    """
+
+    def __init__(
+        self,
+        initial: int = DEFAULT_BATCH_SIZE,
+        memory_limit: int = DEFAULT_MEMORY_LIMIT,
+        minimum: int = MIN_BATCH_SIZE,
+        smoothing: float = 0.3,
+    ) -> None:
+        """
+        :param initial: Batch size used until throughput is observed.
+        :param memory_limit: Maximum working memory of a batch in bytes.
+        :param minimum: Smallest batch size, whatever the memory limit.
+        :param smoothing: Weight of a new observation in the throughput average.
+        """
+        self.minimum = power_of_two(minimum)
+        self.size = max(power_of_two(initial), self.minimum)
+        self.memory_limit = memory_limit
+        self.smoothing = smoothing
+        self.throughput = {}  # batch size -> smoothed rows/s
+        self.lock = threading.Lock()
+
+    def cap(self, row_bytes: int) -> int:
+        """
+        :return: Largest batch size within the memory limit.
+        """
+        return max(self.minimum, power_of_two(self.memory_limit // max(row_bytes, 1)))
+
+    def batch_size(self, row_bytes: int) -> int:
+        """
+        :param row_bytes: Working memory of one row, see row_bytes.
+        :return: Number of rows to score at once.
+        """
+        with self.lock:
+            return min(self.size, self.cap(row_bytes))
+
+    def observe(self, size: int, seconds: float, row_bytes: int) -> None:
+        """
+        Records the duration of a full batch and moves the batch size.
+
+        :param size: Rows of the batch, as returned by batch_size.
+        :param seconds: Scoring time of the batch.
+        :param row_bytes: Working memory of one row.
+        """
+        rate = size / max(seconds, 1e-9)
+        with self.lock:
+            previous = self.throughput.get(size)
+            self.throughput[size] = (
+                rate
+                if previous is None
+                else (1 - self.smoothing) * previous + self.smoothing * rate
+            )
+            cap = self.cap(row_bytes)
+            up, down = size * 2, size // 2
+            if up <= cap and up not in self.throughput:
+                self.size = up
+                return
+            neighbours = [
+                s
+                for s in (down, size, up)
+                if s in self.throughput and self.minimum <= s <= cap
+            ]
+            self.size = max(neighbours, key=self.throughput.get)
+
+    def snapshot(self) -> dict:
+        """
+        :return: Dictionary with the current batch size and the observed throughput.
+        """
+        with self.lock:
+            return {
+                "size": self.size,
+                "throughput": dict(sorted(self.throughput.items())),
+            }
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def content_hash(obj) -> bytes:
+    """
+    Stable hash of a JSON-like object, independent of dictionary key order.
+
+    :param obj: Talent or job dictionary.
+    :return: 16 byte digest.
+    """
+    data = json.dumps(obj, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(data.encode(), digest_size=16).digest()
+
+
+def file_hash(path: str) -> str:
+    """
+    :param path: Path of the file.
+    :return: Hex digest of the file content, used as model version.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MatchCache:
+    """
+    Thread-safe LRU cache of pair results with an optional time to live.
+    Keys are (talent hash, job hash, model version), values (label, score).
+    """
+
+    def __init__(self, maxsize: int, ttl: float = None) -> None:
+        """
+        :param maxsize: Maximum number of cached pairs, least recently used are evicted.
+        :param ttl: Seconds an entry stays valid, None for no expiry.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get_many(self, keys: list) -> list:
+        """
+        :param keys: Cache keys.
+        :return: List with the cached value of every key, None for misses.
+        """
+        now = time.monotonic()
+        values = []
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is not None and entry[1] is not None and entry[1] < now:
+                    del self.entries[key]
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    self.misses += 1
+                    values.append(None)
+                else:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    values.append(entry[0])
+        return values
+
+    def get(self, key):
+        return self.get_many([key])[0]
+
+    def put_many(self, keys: list, values) -> None:
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self.lock:
+            for key, value in zip(keys, values):
+                self.entries[key] = (value, expires)
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def put(self, key, value) -> None:
+        self.put_many([key], [value])
+
+    def clear(self) -> None:
+        """
+        Drops every entry, e.g. after the model changed.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,659 @@
+import datetime
+import io
+import numpy as np
+from src.features.encoders import Vocabularies, Vocabulary
+from src.features.encoding import (
+    NOT_LISTED,
+    NOT_REQUIRED,
+    JobEncoding,
+    TalentEncoding,
+    encode_profiles,
+)
+from src.models.scoring import LinearScorer, SklearnScorer
+from src.app.ranking import DEFAULT_BLOCK_SIZE, TopK, iter_blocks, score_pairs
+from src.app.snapshot import JsonValues, pack_json, read_snapshot, write_snapshot
+
+# encoding fields with vocabulary (or layer) axes: field -> (width names of the
+# axes after the first one, fill value)
+TALENT_COLUMNS = {
+    "roles": (("roles",), 0),
+    "language_levels": (("languages",), NOT_LISTED),
+}
+JOB_COLUMNS = {
+    "roles": (("roles",), 0),
+    "seniorities": (("seniorities",), 0),
+    "language_levels": (("layers", "languages"), NOT_REQUIRED),
+}
+# profile placeholder of the slots whose profile is read from a snapshot
+STORED = object()
+
+
+def resize(array: np.ndarray, shape: tuple, fill) -> np.ndarray:
+    """
+    Copies an array into a larger one, filling the new cells.
+    """
+    out = np.full(shape, fill, dtype=array.dtype)
+    out[tuple(slice(0, n) for n in array.shape)] = array
+    return out
+
+
+def top_entries(
+    scores: np.ndarray, labels: np.ndarray, active: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Selects the k best active columns of every row, ties going to the lowest column.
+
+    :param scores: (rows, columns) scores.
+    :param labels: (rows, columns) labels.
+    :param active: (columns,) mask of the columns to consider.
+    :param k: Number of entries to keep.
+    :return: Tuple of (rows, k) ids (-1 for empty entries), scores and labels.
+    """
+    scores = np.where(active[None, :], scores, -np.inf)
+    order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    top = np.take_along_axis(scores, order, axis=1)
+    valid = top > -np.inf
+    shape = (len(scores), k)
+    return (
+        resize(np.where(valid, order, -1), shape, -1),
+        resize(np.where(valid, top, -np.inf), shape, -np.inf),
+        resize(np.where(valid, np.take_along_axis(labels, order, axis=1), 0), shape, 0),
+    )
+
+
+class Pool:
+    """
+    Slots of the entities on one side of the index (talents or jobs).
+    Removed entities free their slot for the next added one.
+    """
+
+    def __init__(self) -> None:
+        self.slots = {}  # entity id -> slot
+        self.ids = []  # slot -> entity id
+        self.profiles = []  # slot -> entity dictionary (or STORED)
+        self.free = []
+        self.stored = None  # JsonValues of the snapshot profiles, per slot
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __contains__(self, entity_id) -> bool:
+        return entity_id in self.slots
+
+    def allocate(self, entity_id, profile: dict) -> tuple[int, bool]:
+        """
+        :return: Tuple of the entity slot and whether the entity was already there.
+        """
+        slot = self.slots.get(entity_id)
+        existed = slot is not None
+        if not existed:
+            if self.free:
+                slot = self.free.pop()
+            else:
+                slot = len(self.ids)
+                self.ids.append(None)
+                self.profiles.append(None)
+            self.slots[entity_id] = slot
+        self.ids[slot] = entity_id
+        self.profiles[slot] = profile
+        return slot, existed
+
+    def release(self, entity_id) -> int:
+        slot = self.slots.pop(entity_id)
+        self.ids[slot] = None
+        self.profiles[slot] = None
+        self.free.append(slot)
+        return slot
+
+    def profile(self, slot: int) -> dict:
+        """
+        :return: Entity dictionary of a slot, decoded from the snapshot if needed.
+        """
+        profile = self.profiles[slot]
+        return self.stored[slot] if profile is STORED else profile
+
+    def state(self) -> tuple[dict, dict]:
+        """
+        :return: Tuple of the snapshot metadata and arrays of the pool.
+        """
+        offsets, data = pack_json([self.profile(s) for s in range(len(self.ids))])
+        meta = {"ids": self.ids, "free": self.free}
+        return meta, {"profile_offsets": offsets, "profile_data": data}
+
+    @classmethod
+    def from_state(cls, meta: dict, arrays: dict) -> "Pool":
+        """
+        Restores a pool saved with state, its profiles decoded on access.
+        """
+        pool = cls()
+        pool.ids = meta["ids"]
+        pool.free = meta["free"]
+        pool.slots = {i: slot for slot, i in enumerate(pool.ids) if i is not None}
+        pool.profiles = [None if i is None else STORED for i in pool.ids]
+        pool.stored = JsonValues(arrays["profile_offsets"], arrays["profile_data"])
+        return pool
+
+
+class MatchingIndex:
+    """
+    Live talent and job pools with cached pair scores and top-k lists.
+
+    Entities are encoded once and kept in slots. Adding or updating an entity
+    scores only its pairs with the other pool, removing it scores nothing; the
+    top-k lists of the other side are merged incrementally and only rebuilt
+    from the cached scores for keys that had the entity in their list.
+    best_jobs and best_talents read the kept lists, ties going to the entity
+    in the lowest slot.
+
+    Memory holds every pair score: (talents x jobs) scores and labels. The
+    encodings stay dense, whatever the vocabulary sizes, as they grow in place.
+    save writes the whole state to a snapshot file, load maps it back so a new
+    process serves without rescoring (see src.app.snapshot).
+    """
+
+    def __init__(
+        self,
+        scorer,
+        k: int = 10,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        vocabularies: Vocabularies = None,
+    ):
+        """
+        :param scorer: Compiled scorer (see src.models.scoring).
+        :param k: Length of the kept top lists.
+        :param block_size: Maximum number of pairs scored at once.
+        :param vocabularies: Fitted Vocabularies to start from (copied).
+        """
+        self.scorer = scorer
+        self.k = k
+        self.block_size = block_size
+        self.vocabularies = (
+            vocabularies.copy() if vocabularies is not None else Vocabularies()
+        )
+        self.talents = Pool()
+        self.jobs = Pool()
+        self.talent_encoding, self.job_encoding = encode_profiles(
+            [], [], self.vocabularies, sparse=False
+        )
+        self.talent_active = np.zeros(0, dtype=bool)
+        self.job_active = np.zeros(0, dtype=bool)
+        self.scores = np.full((0, 0), -np.inf)
+        self.labels = np.zeros((0, 0), dtype=np.int64)
+        self.top_jobs = TopK(0, k)  # per talent slot
+        self.top_talents = TopK(0, k)  # per job slot
+        self.model_version = None  # file hash of the scoring model, if known
+
+    def __repr__(self) -> str:
+        return (
+            f"MatchingIndex(talents={len(self.talents)}, jobs={len(self.jobs)}, "
+            f"k={self.k})"
+        )
+
+    def _reserve(self) -> None:
+        """
+        Grows the slot capacity (doubling) to hold every allocated slot.
+        """
+        n_talents, n_jobs = self.scores.shape
+        talent_capacity, job_capacity = n_talents, n_jobs
+        if len(self.talents.ids) > n_talents:
+            talent_capacity = max(len(self.talents.ids), 2 * n_talents)
+        if len(self.jobs.ids) > n_jobs:
+            job_capacity = max(len(self.jobs.ids), 2 * n_jobs)
+        if (talent_capacity, job_capacity) == (n_talents, n_jobs):
+            return
+
+        shape = (talent_capacity, job_capacity)
+        self.scores = resize(self.scores, shape, -np.inf)
+        self.labels = resize(self.labels, shape, 0)
+        self.talent_active = resize(self.talent_active, (talent_capacity,), False)
+        self.job_active = resize(self.job_active, (job_capacity,), False)
+        for ranking, capacity in (
+            (self.top_jobs, talent_capacity),
+            (self.top_talents, job_capacity),
+        ):
+            ranking.scores = resize(ranking.scores, (capacity, self.k), -np.inf)
+            ranking.ids = resize(ranking.ids, (capacity, self.k), -1)
+            ranking.labels = resize(ranking.labels, (capacity, self.k), 0)
+        for encoding, capacity in (
+            (self.talent_encoding, talent_capacity),
+            (self.job_encoding, job_capacity),
+        ):
+            for name, value in vars(encoding).items():
+                setattr(encoding, name, resize(value, (capacity, *value.shape[1:]), 0))
+
+    def _widen(self, *encodings) -> None:
+        """
+        Pads the vocabulary axes of encodings to the current vocabulary sizes, and
+        the language layers of job encodings to the most layers among them.
+        """
+        widths = {
+            "roles": len(self.vocabularies.roles),
+            "seniorities": len(self.vocabularies.seniorities),
+            "languages": len(self.vocabularies.languages),
+            "layers": max(
+                encoding.language_levels.shape[1]
+                for encoding in encodings
+                if isinstance(encoding, JobEncoding)
+            ),
+        }
+        for encoding in encodings:
+            is_talent = isinstance(encoding, TalentEncoding)
+            columns = TALENT_COLUMNS if is_talent else JOB_COLUMNS
+            for name, (axes, fill) in columns.items():
+                value = getattr(encoding, name)
+                shape = (len(value), *(widths[axis] for axis in axes))
+                if value.shape != shape:
+                    setattr(encoding, name, resize(value, shape, fill))
+
+    def _score(self, talent_slots: np.ndarray, job_slots: np.ndarray) -> None:
+        """
+        Scores the talent_slots x job_slots product into the cached pair scores.
+        """
+        for talent_block, job_block in iter_blocks(
+            len(talent_slots), len(job_slots), self.block_size
+        ):
+            talents, jobs = talent_slots[talent_block], job_slots[job_block]
+            label, score = score_pairs(
+                self.scorer,
+                self.talent_encoding.take(talents),
+                self.job_encoding.take(jobs),
+            )
+            cells = np.ix_(talents, jobs)
+            self.scores[cells] = score
+            self.labels[cells] = label
+
+    def _refresh(self, ranking: TopK, scores, labels, active, rows) -> None:
+        """
+        Rebuilds the kept lists of rows from the cached scores.
+        """
+        if len(rows):
+            ranking.ids[rows], ranking.scores[rows], ranking.labels[rows] = top_entries(
+                scores, labels, active, self.k
+            )
+
+    def _merge(self, ranking: TopK, rows, ids, scores, labels) -> None:
+        """
+        Merges new candidates into the kept lists of rows.
+
+        :param ids: (c,) candidate ids, the same for every row.
+        :param scores: (len(rows), c) candidate scores.
+        :param labels: (len(rows), c) candidate labels.
+        """
+        if not len(rows):
+            return
+        shape = scores.shape
+        ids = np.concatenate([ranking.ids[rows], np.broadcast_to(ids, shape)], axis=1)
+        scores = np.concatenate([ranking.scores[rows], scores], axis=1)
+        labels = np.concatenate([ranking.labels[rows], labels], axis=1)
+        # best score first, then lowest slot; empty entries (-inf) sort last
+        order = np.lexsort((np.where(ids < 0, np.iinfo(np.int64).max, ids), -scores))
+        order = order[:, : self.k]
+        ranking.ids[rows] = np.take_along_axis(ids, order, axis=1)
+        ranking.scores[rows] = np.take_along_axis(scores, order, axis=1)
+        ranking.labels[rows] = np.take_along_axis(labels, order, axis=1)
+
+    def _affected(self, ranking: TopK, active: np.ndarray, slots: np.ndarray):
+        """
+        :return: Tuple of the active keys whose list contains one of slots, and the others.
+        """
+        keys = np.flatnonzero(active)
+        hit = np.isin(ranking.ids[keys], slots).any(axis=1)
+        return keys[hit], keys[~hit]
+
+    def upsert_talents(self, talents: dict) -> None:
+        """
+        Adds or replaces talents, scoring them against every job.
+
+        :param talents: Dictionary of talent id -> talent dictionary.
+        """
+        if not talents:
+            return
+        encoding, _ = encode_profiles(
+            list(talents.values()), [], self.vocabularies, sparse=False
+        )
+        allocated = [self.talents.allocate(i, t) for i, t in talents.items()]
+        slots = np.array([slot for slot, _ in allocated], dtype=np.int64)
+        replaced = slots[[existed for _, existed in allocated]]
+        self._reserve()
+        self._widen(self.talent_encoding, self.job_encoding, encoding)
+        for name, value in vars(encoding).items():
+            getattr(self.talent_encoding, name)[slots] = value
+        self.talent_active[slots] = True
+
+        jobs = np.flatnonzero(self.job_active)
+        self._score(slots, jobs)
+        self._refresh(
+            self.top_jobs,
+            self.scores[slots],
+            self.labels[slots],
+            self.job_active,
+            slots,
+        )
+        refresh, merge = self._affected(self.top_talents, self.job_active, replaced)
+        self._refresh(
+            self.top_talents,
+            self.scores[:, refresh].T,
+            self.labels[:, refresh].T,
+            self.talent_active,
+            refresh,
+        )
+        self._merge(
+            self.top_talents,
+            merge,
+            slots,
+            self.scores[np.ix_(slots, merge)].T,
+            self.labels[np.ix_(slots, merge)].T,
+        )
+
+    def upsert_jobs(self, jobs: dict) -> None:
+        """
+        Adds or replaces jobs, scoring them against every talent.
+
+        :param jobs: Dictionary of job id -> job dictionary.
+        """
+        if not jobs:
+            return
+        _, encoding = encode_profiles(
+            [], list(jobs.values()), self.vocabularies, sparse=False
+        )
+        allocated = [self.jobs.allocate(i, j) for i, j in jobs.items()]
+        slots = np.array([slot for slot, _ in allocated], dtype=np.int64)
+        replaced = slots[[existed for _, existed in allocated]]
+        self._reserve()
+        self._widen(self.talent_encoding, self.job_encoding, encoding)
+        for name, value in vars(encoding).items():
+            getattr(self.job_encoding, name)[slots] = value
+        self.job_active[slots] = True
+
+        talents = np.flatnonzero(self.talent_active)
+        self._score(talents, slots)
+        self._refresh(
+            self.top_talents,
+            self.scores[:, slots].T,
+            self.labels[:, slots].T,
+            self.talent_active,
+            slots,
+        )
+        refresh, merge = self._affected(self.top_jobs, self.talent_active, replaced)
+        self._refresh(
+            self.top_jobs,
+            self.scores[refresh],
+            self.labels[refresh],
+            self.job_active,
+            refresh,
+        )
+        self._merge(
+            self.top_jobs,
+            merge,
+            slots,
+            self.scores[np.ix_(merge, slots)],
+            self.labels[np.ix_(merge, slots)],
+        )
+
+    def remove_talents(self, talent_ids: list) -> None:
+        """
+        Removes talents, rebuilding only the job lists they were part of.
+
+        :param talent_ids: Ids of the talents to remove.
+        """
+        slots = np.array([self.talents.release(i) for i in talent_ids], np.int64)
+        self.talent_active[slots] = False
+        self.scores[slots] = -np.inf
+        self.top_jobs.ids[slots], self.top_jobs.scores[slots] = -1, -np.inf
+        refresh, _ = self._affected(self.top_talents, self.job_active, slots)
+        self._refresh(
+            self.top_talents,
+            self.scores[:, refresh].T,
+            self.labels[:, refresh].T,
+            self.talent_active,
+            refresh,
+        )
+
+    def remove_jobs(self, job_ids: list) -> None:
+        """
+        Removes jobs, rebuilding only the talent lists they were part of.
+
+        :param job_ids: Ids of the jobs to remove.
+        """
+        slots = np.array([self.jobs.release(i) for i in job_ids], np.int64)
+        self.job_active[slots] = False
+        self.scores[:, slots] = -np.inf
+        self.top_talents.ids[slots], self.top_talents.scores[slots] = -1, -np.inf
+        refresh, _ = self._affected(self.top_jobs, self.talent_active, slots)
+        self._refresh(
+            self.top_jobs,
+            self.scores[refresh],
+            self.labels[refresh],
+            self.job_active,
+            refresh,
+        )
+
+    def add_talent(self, talent_id, talent: dict) -> None:
+        self.upsert_talents({talent_id: talent})
+
+    def add_job(self, job_id, job: dict) -> None:
+        self.upsert_jobs({job_id: job})
+
+    update_talent = add_talent
+    update_job = add_job
+
+    def remove_talent(self, talent_id) -> None:
+        self.remove_talents([talent_id])
+
+    def remove_job(self, job_id) -> None:
+        self.remove_jobs([job_id])
+
+    def _result(self, talent_slot: int, job_slot: int, score, label) -> dict:
+        return {
+            "talent_id": self.talents.ids[talent_slot],
+            "job_id": self.jobs.ids[job_slot],
+            "talent": self.talents.profile(talent_slot),
+            "job": self.jobs.profile(job_slot),
+            "label": int(label),
+            "score": float(score),
+        }
+
+    def match(self, talent_id, job_id) -> dict:
+        """
+        :return: Cached result of a talent/job pair.
+        """
+        t, j = self.talents.slots[talent_id], self.jobs.slots[job_id]
+        return self._result(t, j, self.scores[t, j], self.labels[t, j])
+
+    def best_jobs(self, talent_id, k: int = None) -> list[dict]:
+        """
+        Returns the best jobs of a talent from its kept list (k up to self.k;
+        larger k sorts the talent's cached scores).
+
+        :param talent_id: Talent id.
+        :param k: Number of jobs, self.k by default.
+        :return: List of results, best first.
+        """
+        slot = self.talents.slots[talent_id]
+        k = k or self.k
+        if k <= self.k:
+            ids, scores, labels = (
+                a[slot, :k]
+                for a in (self.top_jobs.ids, self.top_jobs.scores, self.top_jobs.labels)
+            )
+        else:
+            ids, scores, labels = (
+                a[0]
+                for a in top_entries(
+                    self.scores[slot : slot + 1],
+                    self.labels[slot : slot + 1],
+                    self.job_active,
+                    k,
+                )
+            )
+        return [
+            self._result(slot, j, score, label)
+            for j, score, label in zip(ids, scores, labels)
+            if j >= 0
+        ]
+
+    def best_talents(self, job_id, k: int = None) -> list[dict]:
+        """
+        Returns the best talents of a job from its kept list (k up to self.k;
+        larger k sorts the job's cached scores).
+
+        :param job_id: Job id.
+        :param k: Number of talents, self.k by default.
+        :return: List of results, best first.
+        """
+        slot = self.jobs.slots[job_id]
+        k = k or self.k
+        if k <= self.k:
+            ids, scores, labels = (
+                a[slot, :k]
+                for a in (
+                    self.top_talents.ids,
+                    self.top_talents.scores,
+                    self.top_talents.labels,
+                )
+            )
+        else:
+            ids, scores, labels = (
+                a[0]
+                for a in top_entries(
+                    self.scores[:, slot : slot + 1].T,
+                    self.labels[:, slot : slot + 1].T,
+                    self.talent_active,
+                    k,
+                )
+            )
+        return [
+            self._result(t, slot, score, label)
+            for t, score, label in zip(ids, scores, labels)
+            if t >= 0
+        ]
+
+    def save(self, path: str) -> int:
+        """
+        Writes the index (vocabularies, pools, encodings, pair scores, top lists
+        and scorer) to a snapshot file. Entity ids must be JSON serializable.
+
+        :param path: Path of the snapshot file.
+        :return: Size of the snapshot in bytes.
+        """
+        n_talents, n_jobs = len(self.talents.ids), len(self.jobs.ids)
+        arrays = {
+            "scores": self.scores[:n_talents, :n_jobs],
+            "labels": self.labels[:n_talents, :n_jobs],
+        }
+        pools = {}
+        for side, entity, ranking in (
+            ("talents", "talent", self.top_jobs),
+            ("jobs", "job", self.top_talents),
+        ):
+            pool = getattr(self, side)
+            n = len(pool.ids)
+            pools[side], pool_arrays = pool.state()
+            pool_arrays["active"] = getattr(self, f"{entity}_active")[:n]
+            for name, value in vars(getattr(self, f"{entity}_encoding")).items():
+                pool_arrays[f"encoding.{name}"] = value[:n]
+            for name in ("ids", "scores", "labels"):
+                pool_arrays[f"top.{name}"] = getattr(ranking, name)[:n]
+            for name, value in pool_arrays.items():
+                arrays[f"{side}.{name}"] = value
+        scorer_meta, scorer_arrays = scorer_state(self.scorer)
+        arrays.update(
+            {f"scorer.{name}": value for name, value in scorer_arrays.items()}
+        )
+        meta = {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "model_version": self.model_version,
+            "k": self.k,
+            "block_size": self.block_size,
+            "vocabularies": {
+                name: getattr(self.vocabularies, name).values
+                for name in ("roles", "seniorities", "languages")
+            },
+            "pools": pools,
+            "scorer": scorer_meta,
+        }
+        return write_snapshot(path, arrays, meta)
+
+    @classmethod
+    def load(cls, path: str, scorer=None, mmap: bool = True) -> "MatchingIndex":
+        """
+        Restores an index saved with save. The arrays are memory-mapped copy-on-write:
+        the index serves at once, pages are read on access and shared with the
+        other processes mapping the snapshot, updates only copy the pages they touch.
+
+        :param path: Path of the snapshot file.
+        :param scorer: Scorer of later updates, the saved scorer by default.
+        :param mmap: Map the snapshot instead of reading it into memory.
+        :return: MatchingIndex.
+        """
+        arrays, meta = read_snapshot(path, mmap_arrays=mmap)
+        if scorer is None:
+            scorer = load_scorer_state(meta["scorer"], section(arrays, "scorer"))
+        index = cls(scorer, k=meta["k"], block_size=meta["block_size"])
+        index.model_version = meta["model_version"]
+        for name, values in meta["vocabularies"].items():
+            setattr(index.vocabularies, name, Vocabulary(values))
+        index.scores, index.labels = arrays["scores"], arrays["labels"]
+        for side, entity, encoding_type, ranking in (
+            ("talents", "talent", TalentEncoding, index.top_jobs),
+            ("jobs", "job", JobEncoding, index.top_talents),
+        ):
+            pool_arrays = section(arrays, side)
+            setattr(index, side, Pool.from_state(meta["pools"][side], pool_arrays))
+            encoding = encoding_type(**section(pool_arrays, "encoding"))
+            setattr(index, f"{entity}_encoding", encoding)
+            setattr(index, f"{entity}_active", pool_arrays["active"])
+            for name, value in section(pool_arrays, "top").items():
+                setattr(ranking, name, value)
+        return index
+
+
+def section(arrays: dict, prefix: str) -> dict:
+    """
+    :return: The arrays named "<prefix>.<name>", keyed by name.
+    """
+    start = len(prefix) + 1
+    return {
+        name[start:]: value
+        for name, value in arrays.items()
+        if name.startswith(f"{prefix}.")
+    }
+
+
+def scorer_state(scorer) -> tuple[dict, dict]:
+    """
+    :return: Tuple of the snapshot metadata and arrays of a compiled scorer:
+        the coefficients of a LinearScorer, the pickled model otherwise.
+    """
+    if isinstance(scorer, LinearScorer):
+        meta = {
+            "kind": "linear",
+            "intercept": float(scorer.intercept),
+            "feature_names": scorer.feature_names,
+            "dtype": scorer.dtype.str,
+        }
+        return meta, {"coef": scorer.coef, "classes": scorer.classes}
+    import joblib
+
+    buffer = io.BytesIO()
+    joblib.dump(scorer.model, buffer)
+    return {"kind": "sklearn"}, {
+        "model": np.frombuffer(buffer.getvalue(), dtype=np.uint8)
+    }
+
+
+def load_scorer_state(meta: dict, arrays: dict):
+    """
+    Restores a scorer saved with scorer_state.
+    """
+    if meta["kind"] == "linear":
+        return LinearScorer(
+            arrays["coef"],
+            meta["intercept"],
+            arrays["classes"],
+            feature_names=meta["feature_names"],
+            dtype=meta["dtype"],
+        )
+    import joblib
+
+    return SklearnScorer(joblib.load(io.BytesIO(arrays["model"].tobytes())))
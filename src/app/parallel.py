@@ -0,0 +1,143 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src.features.encoding import TalentEncoding, JobEncoding
+from src.models.scoring import load_scorer
+from src.app.ranking import TopK, rank_pairs, score_pairs
+
+# number of talent x job pairs per worker task
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# per-process state, filled once by the pool initializer
+_worker = {}
+
+
+def _init_worker(model_path: str, scorer_options: dict) -> None:
+    """
+    Loads the model once per worker process.
+    """
+    _worker["scorer"] = load_scorer(model_path, **scorer_options)[1]
+
+
+def _score_chunk(task: tuple) -> tuple[np.ndarray, np.ndarray]:
+    talents, jobs = task
+    return score_pairs(_worker["scorer"], talents, jobs)
+
+
+def _rank_chunk(task: tuple) -> TopK:
+    talents, jobs, talent_offset, k, per, block_size = task
+    return rank_pairs(
+        _worker["scorer"],
+        talents,
+        jobs,
+        k,
+        per,
+        block_size,
+        talent_offset=talent_offset,
+    )
+
+
+class WorkerPool:
+    """
+    Process pool whose workers load the model once and serve every call until
+    close (Search keeps one per loaded model). Each task carries its shard of
+    the encoded talents and the encoded jobs.
+    """
+
+    def __init__(self, model_path: str, scorer_options: dict, n_workers: int) -> None:
+        """
+        :param model_path: Path of the saved model, loaded once per worker.
+        :param scorer_options: Keyword arguments of load_scorer.
+        :param n_workers: Number of worker processes.
+        """
+        self.n_workers = n_workers
+        self.executor = ProcessPoolExecutor(
+            max_workers=n_workers,
+            initializer=_init_worker,
+            initargs=(model_path, scorer_options),
+        )
+
+    def map(self, fn, tasks):
+        # yields in submission order, so the output is deterministic
+        return self.executor.map(fn, tasks)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+def talent_chunks(n_talents: int, n_jobs: int, chunk_size: int) -> list[slice]:
+    """
+    Shards the talent x job product into ranges of talents with about
+    chunk_size pairs each (at least one talent per shard).
+
+    :param n_talents: Number of talents.
+    :param n_jobs: Number of jobs.
+    :param chunk_size: Target number of pairs per shard.
+    :return: List of talent slices in order.
+    """
+    step = max(1, chunk_size // max(n_jobs, 1))
+    return [
+        slice(start, min(start + step, n_talents))
+        for start in range(0, n_talents, step)
+    ]
+
+
+def parallel_score(
+    pool: WorkerPool,
+    talents: TalentEncoding,
+    jobs: JobEncoding,
+    chunk_size: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Scores the whole talent x job product over a worker pool.
+
+    :param pool: WorkerPool of the model.
+    :param talents: Encoded talents.
+    :param jobs: Encoded jobs.
+    :param chunk_size: Pairs per worker task.
+    :return: Tuple of labels and scores in talent-major pair order.
+    """
+    chunks = talent_chunks(len(talents), len(jobs), chunk_size)
+    results = list(
+        pool.map(_score_chunk, [(talents.take(chunk), jobs) for chunk in chunks])
+    )
+    if not results:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    labels, scores = zip(*results)
+    return np.concatenate(labels, axis=None), np.concatenate(scores, axis=None)
+
+
+def parallel_rank(
+    pool: WorkerPool,
+    talents: TalentEncoding,
+    jobs: JobEncoding,
+    k: int,
+    per: str,
+    block_size: int,
+    chunk_size: int,
+) -> TopK:
+    """
+    Parallel version of rank_pairs: each worker ranks a shard of talents and the
+    partial rankings are merged in shard order, giving the same result as a
+    single process.
+
+    :param pool: WorkerPool of the model.
+    :param talents: Encoded talents.
+    :param jobs: Encoded jobs.
+    :param k: Number of matches to keep per key.
+    :param per: Ranking key, see RANKING_KEYS.
+    :param block_size: Maximum number of pairs scored at once inside a worker.
+    :param chunk_size: Pairs per worker task.
+    :return: TopK over talents, jobs or a single global key.
+    """
+    n_keys = {"job": len(jobs), "talent": len(talents), "global": 1}[per]
+    ranking = TopK(n_keys, k)
+    chunks = talent_chunks(len(talents), len(jobs), chunk_size)
+    tasks = [
+        (talents.take(chunk), jobs, chunk.start, k, per, block_size) for chunk in chunks
+    ]
+    for chunk, partial in zip(chunks, pool.map(_rank_chunk, tasks)):
+        if per == "talent":
+            ranking.push(chunk, partial.ids, partial.scores, partial.labels)
+        else:
+            ranking.merge(partial)
+    return ranking
@@ -0,0 +1,111 @@
+from collections import defaultdict
+from dataclasses import dataclass
+import numpy as np
+
+EMPTY = np.empty(0, dtype=np.int64)
+
+
+@dataclass
+class Constraints:
+    """
+    Hard constraints a job must pass to be scored for a talent.
+    """
+
+    # minimum number of shared job roles, 0 disables the check
+    min_shared_roles: int = 1
+    # the talent seniority is one of the job seniorities
+    require_seniority: bool = True
+    # the talent salary expectation may exceed the job max salary by this fraction,
+    # None disables the check
+    max_salary_overshoot: float = None
+    # minimum fraction of the job languages the talent speaks, None disables the check
+    min_language_ratio: float = None
+
+
+def postings(value_lists: list) -> dict:
+    """
+    Builds an inverted index value -> sorted ids of the lists containing it.
+
+    :param value_lists: One list of values per id.
+    :return: Dictionary of value -> int64 id array.
+    """
+    index = defaultdict(list)
+    for i, values in enumerate(value_lists):
+        for value in set(values):
+            index[value].append(i)
+    return {value: np.array(ids, dtype=np.int64) for value, ids in index.items()}
+
+
+class JobIndex:
+    """
+    Inverted index over jobs returning, for a talent, the jobs passing the
+    hard Constraints, so hopeless pairs are never scored.
+    """
+
+    def __init__(self, jobs: list[dict]) -> None:
+        """
+        :param jobs: List of job dictionaries.
+        """
+        self.n_jobs = len(jobs)
+        self.roles = postings([job["job_roles"] for job in jobs])
+        self.seniorities = postings([job["seniorities"] for job in jobs])
+        job_languages = [[lang["title"] for lang in job["languages"]] for job in jobs]
+        self.languages = postings(job_languages)
+        self.language_count = np.array(
+            [len(set(titles)) for titles in job_languages], dtype=np.int64
+        )
+        self.salary = np.array([job["max_salary"] for job in jobs], dtype=np.float64)
+        self.salary_order = np.argsort(self.salary, kind="stable")
+        self.sorted_salary = self.salary[self.salary_order]
+
+    def candidates(self, talent: dict, constraints: Constraints = None) -> np.ndarray:
+        """
+        :param talent: Talent dictionary.
+        :param constraints: Constraints to apply, Constraints() by default.
+        :return: Sorted ids of the candidate jobs.
+        """
+        constraints = constraints or Constraints()
+        ids = None  # None stands for every job
+
+        if constraints.min_shared_roles > 0:
+            lists = [self.roles.get(role, EMPTY) for role in set(talent["job_roles"])]
+            ids, counts = np.unique(np.concatenate([EMPTY, *lists]), return_counts=True)
+            ids = ids[counts >= constraints.min_shared_roles]
+
+        if constraints.require_seniority:
+            matching = self.seniorities.get(talent["seniority"], EMPTY)
+            ids = matching if ids is None else np.intersect1d(ids, matching, True)
+
+        if constraints.max_salary_overshoot is not None:
+            threshold = talent["salary_expectation"] / (
+                1 + constraints.max_salary_overshoot
+            )
+            if ids is None:
+                start = np.searchsorted(self.sorted_salary, threshold, side="left")
+                ids = np.sort(self.salary_order[start:])
+            else:
+                ids = ids[self.salary[ids] >= threshold]
+
+        if constraints.min_language_ratio is not None:
+            titles = {lang["title"] for lang in talent["languages"]}
+            lists = [self.languages.get(title, EMPTY) for title in titles]
+            spoken = np.bincount(np.concatenate([EMPTY, *lists]), minlength=self.n_jobs)
+            passing = spoken >= constraints.min_language_ratio * self.language_count
+            ids = np.flatnonzero(passing) if ids is None else ids[passing[ids]]
+
+        return np.arange(self.n_jobs) if ids is None else ids
+
+    def candidate_pairs(
+        self, talents: list[dict], constraints: Constraints = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :param talents: List of talent dictionaries.
+        :param constraints: Constraints to apply, Constraints() by default.
+        :return: Tuple of talent and job id arrays of the candidate pairs,
+            talent-major like itertools.product(talents, jobs).
+        """
+        job_ids = [self.candidates(talent, constraints) for talent in talents]
+        talent_ids = np.repeat(
+            np.arange(len(talents)), [len(ids) for ids in job_ids]
+        ).astype(np.int64)
+        return talent_ids, np.concatenate([EMPTY, *job_ids])
@@ -0,0 +1,162 @@
+import numpy as np
+from src.features.feature_utils import FEATURES
+from src.features.build_features import process_encoded_pairs
+from src.features.encoding import TalentEncoding, JobEncoding
+
+RANKING_KEYS = ("job", "talent", "global")
+
+# number of talent x job pairs scored at once
+DEFAULT_BLOCK_SIZE = 100_000
+
+
+def iter_blocks(n_talents: int, n_jobs: int, block_size: int):
+    """
+    Splits the talent x job product into blocks of at most block_size pairs
+    (at least one talent row per block).
+
+    :param n_talents: Number of talents.
+    :param n_jobs: Number of jobs.
+    :param block_size: Maximum number of pairs per block.
+    :return: Generator of (talent slice, job slice) tuples.
+    """
+    job_step = max(1, min(n_jobs, block_size))
+    talent_step = max(1, block_size // job_step)
+    for talent_start in range(0, n_talents, talent_step):
+        talent_block = slice(talent_start, min(talent_start + talent_step, n_talents))
+        for job_start in range(0, n_jobs, job_step):
+            yield talent_block, slice(job_start, min(job_start + job_step, n_jobs))
+
+
+class TopK:
+    """
+    Keeps the k best scored candidates for each of n_keys keys.
+    Ties are broken by insertion order, so pushing blocks in pair order gives
+    deterministic results.
+    """
+
+    def __init__(self, n_keys: int, k: int) -> None:
+        if k < 1:
+            raise ValueError(f"k must be positive, got {k}")
+        self.k = k
+        self.scores = np.full((n_keys, k), -np.inf)
+        self.ids = np.full((n_keys, k), -1, dtype=np.int64)
+        self.labels = np.zeros((n_keys, k), dtype=np.int64)
+
+    def push(self, rows, ids: np.ndarray, scores: np.ndarray, labels: np.ndarray):
+        """
+        Merges a block of candidates into the kept ones.
+
+        :param rows: Keys of the block (slice or index array).
+        :param ids: (len(rows), c) candidate ids.
+        :param scores: (len(rows), c) candidate scores.
+        :param labels: (len(rows), c) candidate labels.
+        """
+        scores = np.concatenate([self.scores[rows], scores], axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")[:, : self.k]
+        self.scores[rows] = np.take_along_axis(scores, order, axis=1)
+        for kept, new in ((self.ids, ids), (self.labels, labels)):
+            merged = np.concatenate([kept[rows], new], axis=1)
+            kept[rows] = np.take_along_axis(merged, order, axis=1)
+
+    def merge(self, other: "TopK") -> None:
+        """
+        Merges another ranking over the same keys, its entries losing ties.
+        """
+        self.push(slice(None), other.ids, other.scores, other.labels)
+
+    def items(self):
+        """
+        Iterates the kept candidates, best first within each key.
+
+        :return: Generator of (key, id, score, label) tuples.
+        """
+        for key in range(len(self.ids)):
+            for i, score, label in zip(
+                self.ids[key], self.scores[key], self.labels[key]
+            ):
+                if i >= 0:
+                    yield key, int(i), float(score), int(label)
+
+
+def score_pairs(
+    scorer, talents: TalentEncoding, jobs: JobEncoding
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Scores every talent x job pair of two encoded blocks.
+
+    :param scorer: Compiled scorer (see src.models.scoring).
+    :param talents: Encoded talents (n).
+    :param jobs: Encoded jobs (m).
+    :return: Tuple of (n, m) labels and (n, m) scores rounded like Search.predict.
+    """
+    df_processed = process_encoded_pairs(talents, jobs, FEATURES)
+    label, score = scorer.predict(df_processed)
+    shape = (len(talents), len(jobs))
+    return np.asarray(label).reshape(shape), np.round(score, 3).reshape(shape)
+
+
+def rank_pairs(
+    scorer,
+    talents: TalentEncoding,
+    jobs: JobEncoding,
+    k: int,
+    per: str,
+    block_size: int,
+    talent_offset: int = 0,
+) -> TopK:
+    """
+    Scores the talent x job product block by block and keeps the k best per key.
+
+    :param scorer: Compiled scorer (see src.models.scoring).
+    :param talents: Encoded talents.
+    :param jobs: Encoded jobs.
+    :param k: Number of matches to keep per key.
+    :param per: Ranking key, see RANKING_KEYS.
+    :param block_size: Maximum number of pairs scored at once.
+    :param talent_offset: Index of the first talent, when ranking a shard of talents.
+    :return: TopK over talents (relative to the shard), jobs or a single global key.
+    """
+    n_keys = {"job": len(jobs), "talent": len(talents), "global": 1}[per]
+    ranking = TopK(n_keys, k)
+
+    for talent_block, job_block in iter_blocks(len(talents), len(jobs), block_size):
+        label, score = score_pairs(
+            scorer, talents.take(talent_block), jobs.take(job_block)
+        )
+        talent_ids = np.arange(len(talents))[talent_block] + talent_offset
+        job_ids = np.arange(len(jobs))[job_block]
+        shape = score.shape
+
+        if per == "talent":
+            ids = np.broadcast_to(job_ids, shape)
+            ranking.push(talent_block, ids, score, label)
+        elif per == "job":
+            ids = np.broadcast_to(talent_ids[:, None], shape).T
+            ranking.push(job_block, ids, score.T, label.T)
+        else:
+            ids = talent_ids[:, None] * len(jobs) + job_ids[None, :]
+            ranking.push(
+                slice(None),
+                ids.reshape(1, -1),
+                score.reshape(1, -1),
+                label.reshape(1, -1),
+            )
+    return ranking
+
+
+def iter_ranked_pairs(ranking: TopK, per: str, n_jobs: int):
+    """
+    Translates the entries of a ranking back into (talent, job) indices.
+
+    :param ranking: Ranking returned by rank_pairs.
+    :param per: Ranking key, see RANKING_KEYS.
+    :param n_jobs: Number of jobs (to decode global pair ids).
+    :return: Generator of (talent index, job index, score, label) tuples.
+    """
+    for key, i, score, label in ranking.items():
+        if per == "talent":
+            yield key, i, score, label
+        elif per == "job":
+            yield i, key, score, label
+        else:
+            yield i // n_jobs, i % n_jobs, score, label
@@ -1,89 +1,679 @@
-import pandas as pd
+from __future__ import annotations
 import numpy as np
 import itertools
-import joblib
+import os
+import threading
+import time
 from src.features.feature_utils import FEATURES
-from src.features.build_features import process_data_pipeline
+from src.features.build_features import (
+    ENGINES,
+    process_data_pipeline,
+    process_encoded_candidates,
+    process_encoded_pairs,
+    process_pair,
+)
+from src.features.encoders import load_vocabularies, vocabularies_path
+from src.features.encoding import encode_profiles
+from src.features.records import JobRecords, TalentRecords, as_records, encode_records
 from src.data.make_dataset import normalize_and_merge
+from src.models.scoring import load_scorer
+from src.models.manifest import (
+    BACKENDS,
+    choose_backend,
+    describes,
+    load_manifest,
+    manifest_path,
+    validate_manifest,
+)
+from src.app.ranking import (
+    RANKING_KEYS,
+    DEFAULT_BLOCK_SIZE,
+    rank_pairs,
+    iter_ranked_pairs,
+)
+from src.app.parallel import (
+    DEFAULT_CHUNK_SIZE,
+    WorkerPool,
+    parallel_rank,
+    parallel_score,
+)
+from src.app.cache import MatchCache, content_hash, file_hash
+from src.app.batching import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_MEMORY_LIMIT,
+    AdaptiveBatchSize,
+    row_bytes,
+)
+from src.app.prefilter import Constraints, JobIndex
+from src.app.matching_index import MatchingIndex
 from src.util.paths import Paths
+from src.util.logger import configure_logging, logger
+from src.util.instrumentation import instrumentation, instrumented
+from src.util.lazy import is_dataframe, lazy_import
+
+pd = lazy_import("pandas")
 
 
 class Search:
-    def __init__(self, model_path: str) -> None:
+    def __init__(
+        self,
+        model_path: str,
+        engine: str = "pandas",
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        fused_scoring: bool = True,
+        dtype=np.float64,
+        n_workers: int = 1,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        cache_size: int = 0,
+        cache_ttl: float = None,
+        model_check_interval: float = 1.0,
+        backend: str = "auto",
+        predict_memory_limit: int = DEFAULT_MEMORY_LIMIT,
+    ) -> None:
         """
         Initializes the Search class by loading the trained model.
-        :param model_path: path to the saved model file.
+        :param model_path: path to the saved model file, a joblib model or a scorer
+            exported with LinearScorer.save (.npz, loads without sklearn).
+        :param engine: default feature engine, "pandas" or "numpy" for process_data_pipeline,
+            "encoded" to encode every talent and job once and broadcast over the pairs,
+            "dict" to compute single matches straight from the dicts (bulk calls then
+            use "encoded").
+        :param block_size: default number of pairs scored at once by top_k.
+        :param fused_scoring: compile linear pipelines into a single dot product + sigmoid,
+            other models always use the sklearn predict/predict_proba path.
+        :param dtype: floating point type of the fused scorer (np.float32 or np.float64).
+        :param n_workers: default number of worker processes for match_bulk and top_k,
+            1 scores in this process. The pool is kept until close (or reload_model),
+            so the workers load the model once.
+        :param chunk_size: default number of pairs per worker task.
+        :param cache_size: maximum number of pair results memoized by match, match_pairs
+            and match_bulk, 0 disables the cache.
+        :param cache_ttl: seconds a cached result stays valid, None for no expiry.
+        :param model_check_interval: with the cache enabled, minimum seconds between
+            checks whether the model file changed (then it is reloaded and the cache
+            invalidated).
+        :param backend: scoring backend, "auto" picks the fastest compatible one
+            measured in the model manifest (fused_scoring and dtype apply when there
+            is no manifest), or a name of src.models.manifest.BACKENDS to force it.
+        :param predict_memory_limit: maximum scoring working memory (bytes) of a
+            predict batch, see src.app.batching.
+        """
+        if backend != "auto" and backend not in BACKENDS:
+            raise ValueError(
+                f"Unknown backend {backend!r}, expected 'auto' or one of {list(BACKENDS)}"
+            )
+        self.model_path = model_path
+        self.backend_option = backend
+        self.predict_memory_limit = predict_memory_limit
+        self.default_scorer_options = {"fused": fused_scoring, "dtype": dtype}
+        self.cache = MatchCache(cache_size, cache_ttl) if cache_size > 0 else None
+        self.model_check_interval = model_check_interval
+        self._model_checked = time.monotonic()
+        # worker processes of match_bulk and top_k, kept across calls
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.load_model()
+        self.engine = engine
+        self.block_size = block_size
+        self.n_workers = n_workers
+        self.chunk_size = chunk_size
+        # per-thread feature row reused by the dict-native match path
+        self._pair_buffers = threading.local()
+
+    def load_model(self) -> None:
         """
-        self.model = joblib.load(model_path)
+        Loads the model file, validates its manifest and compiles the scorer of the
+        chosen backend.
+        """
+        stat = os.stat(self.model_path)
+        self.model_version = file_hash(self.model_path)
+        self.manifest = load_manifest(manifest_path(self.model_path))
+        if self.manifest is not None:
+            if describes(self.manifest, self.model_path, self.model_version):
+                validate_manifest(self.manifest, FEATURES)
+            else:
+                logger.warning(
+                    f"Manifest of {self.model_path} was written for another model "
+                    "file, ignoring it"
+                )
+                self.manifest = None
+
+        self.backend = None
+        if self.backend_option != "auto":
+            self.backend = self.backend_option
+        elif self.manifest is not None:
+            self.backend = choose_backend(
+                self.manifest, exported=self.model_path.endswith(".npz")
+            )
+        if self.backend is None:
+            self.scorer_options = self.default_scorer_options
+        else:
+            self.scorer_options = BACKENDS[self.backend]
+            logger.info(f"Scoring with the {self.backend} backend")
+
+        self.model, self.scorer = load_scorer(self.model_path, **self.scorer_options)
+        # fitted with the training data, copied by every call that extends them
+        self.vocabularies = load_vocabularies(vocabularies_path(self.model_path))
+        # start from the fastest batch size measured for the backend, if any
+        initial = DEFAULT_BATCH_SIZE
+        if (
+            self.backend is not None
+            and self.manifest is not None
+            and self.backend in self.manifest["backends"]
+        ):
+            timings = self.manifest["backends"][self.backend]["batch_sizes"]
+            initial = int(max(timings, key=lambda b: timings[b]["rows_per_second"]))
+        self.batcher = AdaptiveBatchSize(initial, self.predict_memory_limit)
+        self._model_signature = (stat.st_mtime_ns, stat.st_size)
+
+    def reload_model(self, force: bool = False) -> bool:
+        """
+        Reloads the model if its file changed since it was loaded, invalidating the
+        cached results.
+        :param force: reload even if the file looks unchanged.
+        :return: True if the model was reloaded.
+        """
+        stat = os.stat(self.model_path)
+        if not force and (stat.st_mtime_ns, stat.st_size) == self._model_signature:
+            return False
+        self.load_model()
+        with self._pool_lock:
+            if self._pool is not None:
+                # the workers hold the previous model
+                n_workers = self._pool.n_workers
+                self._pool.close()
+                self._pool = WorkerPool(self.model_path, self.scorer_options, n_workers)
+        if self.cache is not None:
+            self.cache.clear()
+        return True
+
+    def _worker_pool(self, n_workers: int) -> WorkerPool:
+        """
+        :param n_workers: Number of worker processes.
+        :return: The pool of the current model, created on first use and recreated
+            if the number of workers changes.
+        """
+        with self._pool_lock:
+            if self._pool is not None and self._pool.n_workers != n_workers:
+                self._pool.close()
+                self._pool = None
+            if self._pool is None:
+                self._pool = WorkerPool(self.model_path, self.scorer_options, n_workers)
+            return self._pool
+
+    def close(self) -> None:
+        """
+        Shuts down the worker processes, if any.
+        """
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool = None
+
+    def __enter__(self) -> "Search":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _check_model(self) -> None:
+        now = time.monotonic()
+        if now - self._model_checked >= self.model_check_interval:
+            self._model_checked = now
+            self.reload_model()
+
+    def _cache_key(self, talent_hash: bytes, job_hash: bytes) -> tuple:
+        return talent_hash, job_hash, self.model_version
 
     def predict(self, df_processed: pd.DataFrame, is_bulk=False) -> tuple[int, float]:
         """
         Make predictions and adjust the score.
-        :param df_processed: Processed DataFrame for prediction.
+        Bulk inputs larger than the adaptive batch size (see src.app.batching) are
+        scored batch by batch into preallocated label and score arrays.
+        :param df_processed: Processed DataFrame (or feature matrix) for prediction.
         :return: Tuple containing the predicted label and adjusted score.
         """
-        # Predict using the model
+        # Predict using the compiled scorer (score is the positive class probability)
         if not is_bulk:
-            label = self.model.predict(df_processed)[0]
-            score = self.model.predict_proba(df_processed)[0][1]  # Positive class score
-            score = round(score, 3)
-        else:
-            label = self.model.predict(df_processed)
-            score = self.model.predict_proba(df_processed)[:, 1]
-            score = np.round(score, 3)
-        return label, score
+            label, score = self.scorer.predict(df_processed)
+            return label[0], round(score[0], 3)
 
-    def match(self, talent: dict, job: dict) -> dict:
+        n_rows, n_features = df_processed.shape
+        bytes_per_row = row_bytes(n_features)
+        size = self.batcher.batch_size(bytes_per_row)
+        if instrumentation.enabled:
+            instrumentation.set_gauge("predict_batch_size", size)
+        if n_rows <= size:
+            label, score = self.scorer.predict(df_processed)
+            return label, np.round(score, 3)
+
+        rows = df_processed.iloc if is_dataframe(df_processed) else df_processed
+        labels = scores = None
+        start = 0
+        while start < n_rows:
+            # the batch size adapts between batches, not only between calls
+            size = self.batcher.batch_size(bytes_per_row)
+            stop = min(start + size, n_rows)
+            begin = time.perf_counter()
+            label, score = self.scorer.predict(rows[start:stop])
+            seconds = time.perf_counter() - begin
+            if labels is None:
+                labels = np.empty(n_rows, dtype=label.dtype)
+                scores = np.empty(n_rows, dtype=score.dtype)
+            labels[start:stop] = label
+            scores[start:stop] = score
+            if stop - start == size:
+                self.batcher.observe(size, seconds, bytes_per_row)
+            if instrumentation.enabled:
+                instrumentation.record("Search.predict.batch", seconds, stop - start)
+                instrumentation.set_gauge("predict_batch_size", size)
+            start = stop
+        np.round(scores, 3, out=scores)
+        return labels, scores
+
+    @instrumented("Search.match", rows=lambda *args, **kwargs: 1)
+    def match(self, talent: dict, job: dict, engine: str = None) -> dict:
         """
         Predicts the match between a single talent and a single job.
 
-        :param talent: Dictionary containing talent features.
-        :param job: Dictionary containing job features.
+        :param talent: Dictionary containing talent features, or TalentRecords of one
+            talent.
+        :param job: Dictionary containing job features, or JobRecords of one job.
+        :param engine: feature engine for this call, defaults to self.engine
+            (records are always scored from their arrays).
         :return: Dictionary containing talent, job, predicted label, and score.
         """
 
-        # for bul we can use normalize and merge, but for single case we do it like this
-        # TODO create wraper to make the code cleaner
-        df_talent = pd.DataFrame([talent]).add_prefix("talent_")
-        df_job = pd.DataFrame([job]).add_prefix("job_")
-        df = pd.concat([df_talent, df_job], axis=1)
+        records = None
+        if isinstance(talent, TalentRecords) or isinstance(job, JobRecords):
+            records = as_records(
+                talent if isinstance(talent, TalentRecords) else [talent],
+                job if isinstance(job, JobRecords) else [job],
+                self.vocabularies.copy(),
+            )
+            if len(records[0]) != 1 or len(records[1]) != 1:
+                raise ValueError("match expects records of a single talent and job")
+            talent, job = records[0][0], records[1][0]
 
-        df_processed = process_data_pipeline(
-            df, FEATURES, label=[], ignore_label=True  # there is no label at this stage
-        )
+        if self.cache is not None:
+            self._check_model()
+            key = self._cache_key(content_hash(talent), content_hash(job))
+            cached = self.cache.get(key)
+            if cached is not None:
+                label, score = cached
+                return {"talent": talent, "job": job, "label": label, "score": score}
+
+        engine = engine or self.engine
+        if records is not None:
+            df_processed = process_encoded_pairs(*encode_records(*records), FEATURES)
+        elif engine == "dict":
+            buffer = getattr(self._pair_buffers, "row", None)
+            if buffer is None:
+                buffer = self._pair_buffers.row = np.empty((1, len(FEATURES)))
+            process_pair(talent, job, FEATURES, out=buffer[0])
+            df_processed = buffer
+        elif engine == "encoded":
+            df_processed = process_encoded_pairs(
+                *encode_profiles([talent], [job], self.vocabularies.copy()), FEATURES
+            )
+        else:
+            # for bul we can use normalize and merge, but for single case we do it like this
+            # TODO create wraper to make the code cleaner
+            df_talent = pd.DataFrame([talent]).add_prefix("talent_")
+            df_job = pd.DataFrame([job]).add_prefix("job_")
+            df = pd.concat([df_talent, df_job], axis=1)
+
+            df_processed = process_data_pipeline(
+                df,
+                FEATURES,
+                label=[],
+                ignore_label=True,  # there is no label at this stage
+                engine=engine,
+                vocabularies=self.vocabularies,
+            )
 
         label, score = self.predict(df_processed)
+        if self.cache is not None:
+            self.cache.put(key, (label, score))
 
         return {"talent": talent, "job": job, "label": label, "score": score}
 
-    def match_bulk(self, talents: list[dict], jobs: list[dict]) -> list[dict]:
+    @instrumented(
+        "Search.match_pairs", rows=lambda self, talents, *args, **kw: len(talents)
+    )
+    def match_pairs(
+        self, talents: list[dict], jobs: list[dict], engine: str = None
+    ) -> list[dict]:
         """
-        Predicts the matches between multiple talents and jobs.
+        Predicts the match of each talent with the job at the same position,
+        with a single process_data_pipeline and predict call for all pairs.
 
         :param talents: List of dictionaries, each containing talent features.
-        :param jobs: List of dictionaries, each containing job features.
-        :return: List of dictionaries containing talents, jobs, predicted labels, and scores.
+        :param jobs: List of dictionaries (same length), each containing job features.
+        :param engine: feature engine for this call, defaults to self.engine
+            ("encoded" scores whole products, so pairs use "numpy" instead).
+        :return: List of dictionaries containing talent, job, predicted label, and score,
+            in input order.
         """
+        engine = engine or self.engine
+        if self.cache is None:
+            label, score = self._score_pairs(talents, jobs, engine)
+        else:
+            self._check_model()
+            keys = [
+                self._cache_key(content_hash(talent), content_hash(job))
+                for talent, job in zip(talents, jobs)
+            ]
+            values = self.cache.get_many(keys)
+            label, score = self._score_cached(keys, values, talents, jobs, engine)
+        return [
+            {"talent": talent, "job": job, "label": label, "score": score}
+            for talent, job, label, score in zip(talents, jobs, label, score)
+        ]
 
-        # combinations
-        talents, jobs = combine_and_separate(talents, jobs)
-
+    def _score_pairs(
+        self, talents: list[dict], jobs: list[dict], engine: str
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Scores each talent with the job at the same position.
+        :return: Tuple of labels and rounded scores.
+        """
         df = normalize_and_merge(talents, jobs)
-
         df_processed = process_data_pipeline(
-            df, FEATURES, label=[], ignore_label=True  # there is no label at this stage
+            df,
+            FEATURES,
+            label=[],
+            ignore_label=True,  # there is no label at this stage
+            engine=engine if engine in ENGINES else "numpy",
+            vocabularies=self.vocabularies,
         )
+        return self.predict(df_processed, is_bulk=True)
 
-        df_output = pd.DataFrame({"talent": talents, "job": jobs})
+    def _score_cached(
+        self,
+        keys: list[tuple],
+        values: list,
+        talents: list[dict],
+        jobs: list[dict],
+        engine: str,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Completes cache lookups by scoring only the misses.
+        :param keys: cache key of every pair.
+        :param values: cached (label, score) of every pair, None for misses.
+        :param talents: talent of every pair.
+        :param jobs: job of every pair.
+        :return: Tuple of labels and rounded scores.
+        """
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            label, score = self._score_pairs(
+                [talents[i] for i in missing], [jobs[i] for i in missing], engine
+            )
+            scored = list(zip(label, score))
+            self.cache.put_many([keys[i] for i in missing], scored)
+            for i, value in zip(missing, scored):
+                values[i] = value
+        label, score = zip(*values) if values else ((), ())
+        return np.array(label), np.array(score, dtype=np.float64)
+
+    @instrumented(
+        "Search.match_bulk",
+        rows=lambda self, talents, jobs, *args, **kw: len(talents) * len(jobs),
+    )
+    def match_bulk(
+        self,
+        talents: list[dict],
+        jobs: list[dict],
+        engine: str = None,
+        n_workers: int = None,
+        chunk_size: int = None,
+    ) -> list[dict]:
+        """
+        Predicts the matches between multiple talents and jobs.
+
+        :param talents: List of dictionaries, each containing talent features, or
+            TalentRecords.
+        :param jobs: List of dictionaries, each containing job features, or JobRecords.
+        :param engine: feature engine for this call, defaults to self.engine
+            (records are always scored from their arrays).
+        :param n_workers: worker processes, defaults to self.n_workers. With more than
+            one worker the product is sharded over a process pool using the encoded
+            entities, whatever the engine.
+        :param chunk_size: pairs per worker task, defaults to self.chunk_size.
+        :return: List of dictionaries containing talents, jobs, predicted labels, and scores.
+        """
+
+        engine = engine or self.engine
+        n_workers = n_workers or self.n_workers
+        records = None
+        if isinstance(talents, TalentRecords) or isinstance(jobs, JobRecords):
+            records = as_records(talents, jobs, self.vocabularies.copy())
+            # results hold the dicts, decoded once per talent and job
+            talents, jobs = records[0].to_dicts(), records[1].to_dicts()
+        if self.cache is not None:
+            self._check_model()
+            talent_hashes = [content_hash(talent) for talent in talents]
+            job_hashes = [content_hash(job) for job in jobs]
+            keys = [self._cache_key(t, j) for t in talent_hashes for j in job_hashes]
+            values = self.cache.get_many(keys)
+            if any(value is not None for value in values):
+                # score only the misses, pair by pair
+                talents, jobs = combine_and_separate(talents, jobs)
+                label, score = self._score_cached(keys, values, talents, jobs, engine)
+                return self._sorted_results(talents, jobs, label, score)
+            # cold product: the full product paths are faster than pair by pair
 
-        label, score = self.predict(df_processed, is_bulk=True)
+        if n_workers > 1:
+            label, score = parallel_score(
+                self._worker_pool(n_workers),
+                *self._encode(talents, jobs, records),
+                chunk_size or self.chunk_size,
+            )
+            talents, jobs = combine_and_separate(talents, jobs)
+        else:
+            if records is not None or engine in ("encoded", "dict"):
+                df_processed = process_encoded_pairs(
+                    *self._encode(talents, jobs, records), FEATURES
+                )
+                talents, jobs = combine_and_separate(talents, jobs)
+            else:
+                # combinations
+                talents, jobs = combine_and_separate(talents, jobs)
+
+                df = normalize_and_merge(talents, jobs)
+
+                df_processed = process_data_pipeline(
+                    df,
+                    FEATURES,
+                    label=[],
+                    ignore_label=True,  # there is no label at this stage
+                    engine=engine,
+                    vocabularies=self.vocabularies,
+                )
+            label, score = self.predict(df_processed, is_bulk=True)
+
+        if self.cache is not None:
+            self.cache.put_many(keys, zip(label, score))
+        return self._sorted_results(talents, jobs, label, score)
+
+    def _encode(
+        self, talents: list[dict], jobs: list[dict], records: tuple = None
+    ) -> tuple:
+        """
+        :return: Talent and job encodings, built from the records if given.
+        """
+        if records is not None:
+            return encode_records(*records)
+        return encode_profiles(talents, jobs, self.vocabularies.copy())
+
+    @staticmethod
+    def _sorted_results(
+        talents: list[dict], jobs: list[dict], label, score
+    ) -> list[dict]:
+        df_output = pd.DataFrame({"talent": talents, "job": jobs})
         df_output["label"] = label
         df_output["score"] = score
 
         df_output.sort_values(by="score", ascending=False, inplace=True)
         return df_output.to_dict(orient="records")
 
+    @instrumented(
+        "Search.match_candidates",
+        rows=lambda self, talents, jobs, *args, **kw: len(talents) * len(jobs),
+    )
+    def match_candidates(
+        self,
+        talents: list[dict],
+        jobs: list[dict],
+        constraints: Constraints = None,
+        index: JobIndex = None,
+        block_size: int = None,
+    ) -> tuple[list[dict], dict]:
+        """
+        Like match_bulk, but only the pairs passing the hard constraints of a
+        prefilter are scored (see src.app.prefilter); pruned pairs are left out.
+
+        :param talents: List of dictionaries, each containing talent features.
+        :param jobs: List of dictionaries, each containing job features.
+        :param constraints: Hard constraints, Constraints() (shared role and seniority) by default.
+        :param index: JobIndex built over jobs, to reuse it across calls.
+        :param block_size: Pairs scored at once, defaults to self.block_size.
+        :return: Tuple of the results (like match_bulk, sorted by score) and a report
+            with the number of pairs, scored candidates and pruned pairs.
+        """
+        index = index or JobIndex(jobs)
+        talent_ids, job_ids = index.candidate_pairs(talents, constraints)
+        block_size = block_size or self.block_size
+
+        talent_encoding, job_encoding = self._encode(talents, jobs)
+        labels, scores = [np.empty(0, dtype=np.int64)], [np.empty(0)]
+        for start in range(0, len(talent_ids), block_size):
+            block = slice(start, start + block_size)
+            df_processed = process_encoded_candidates(
+                talent_encoding,
+                job_encoding,
+                talent_ids[block],
+                job_ids[block],
+                FEATURES,
+            )
+            label, score = self.predict(df_processed, is_bulk=True)
+            labels.append(label)
+            scores.append(score)
+
+        n_pairs = len(talents) * len(jobs)
+        report = {
+            "n_pairs": n_pairs,
+            "n_candidates": len(talent_ids),
+            "n_pruned": n_pairs - len(talent_ids),
+        }
+        logger.info(
+            f"Prefilter pruned {report['n_pruned']} of {n_pairs} pairs, "
+            f"scoring {report['n_candidates']}"
+        )
+        results = self._sorted_results(
+            [talents[t] for t in talent_ids],
+            [jobs[j] for j in job_ids],
+            np.concatenate(labels),
+            np.concatenate(scores),
+        )
+        return results, report
+
+    def create_index(self, k: int = 10) -> MatchingIndex:
+        """
+        Creates an empty stateful index for live talent and job pools, scoring with
+        the current model (see src.app.matching_index).
+
+        :param k: Length of the kept top lists per talent and per job.
+        :return: MatchingIndex.
+        """
+        index = MatchingIndex(
+            self.scorer, k=k, block_size=self.block_size, vocabularies=self.vocabularies
+        )
+        index.model_version = self.model_version
+        return index
+
+    def load_index(self, path: str, mmap: bool = True) -> MatchingIndex:
+        """
+        Warm starts an index from a snapshot written by MatchingIndex.save, scoring
+        later updates with the current model.
+
+        :param path: Path of the snapshot file.
+        :param mmap: Memory-map the snapshot (shared between processes) instead of
+            reading it.
+        :return: MatchingIndex.
+        """
+        index = MatchingIndex.load(path, scorer=self.scorer, mmap=mmap)
+        if index.model_version != self.model_version:
+            raise ValueError(
+                f"Index snapshot {path} was built with another model than "
+                f"{self.model_path}"
+            )
+        return index
+
+    @instrumented(
+        "Search.top_k",
+        rows=lambda self, talents, jobs, *args, **kw: len(talents) * len(jobs),
+    )
+    def top_k(
+        self,
+        talents: list[dict],
+        jobs: list[dict],
+        k: int,
+        per: str = "job",
+        block_size: int = None,
+        n_workers: int = None,
+        chunk_size: int = None,
+    ) -> list[dict]:
+        """
+        Returns the k best matches without materializing the talent x job product.
+        Pairs are scored in blocks of at most block_size, so memory holds one
+        block plus the kept results.
+
+        :param talents: List of dictionaries, each containing talent features.
+        :param jobs: List of dictionaries, each containing job features.
+        :param k: Number of matches to keep per key.
+        :param per: "job" (k talents per job), "talent" (k jobs per talent) or "global".
+        :param block_size: Pairs per block, defaults to self.block_size.
+        :param n_workers: Worker processes, defaults to self.n_workers.
+        :param chunk_size: Pairs per worker task, defaults to self.chunk_size.
+        :return: List of dictionaries containing talents, jobs, predicted labels and
+            scores, grouped by key in input order and sorted by score within a key.
+        """
+        if per not in RANKING_KEYS:
+            raise ValueError(
+                f"Unknown ranking key {per!r}, expected one of {RANKING_KEYS}"
+            )
+        talent_encoding, job_encoding = self._encode(talents, jobs)
+        block_size = block_size or self.block_size
+        n_workers = n_workers or self.n_workers
+        if n_workers > 1:
+            ranking = parallel_rank(
+                self._worker_pool(n_workers),
+                talent_encoding,
+                job_encoding,
+                k,
+                per,
+                block_size,
+                chunk_size or self.chunk_size,
+            )
+        else:
+            ranking = rank_pairs(
+                self.scorer, talent_encoding, job_encoding, k, per, block_size
+            )
+
+        return [
+            {
+                "talent": talents[t],
+                "job": jobs[j],
+                "label": label,
+                "score": score,
+            }
+            for t, j, score, label in iter_ranked_pairs(ranking, per, len(jobs))
+        ]
+
 
+@instrumented(rows=lambda list1, list2: len(list1) * len(list2))
 def combine_and_separate(list1: list, list2: list) -> tuple[list, list]:
     """
     Creates all possible pairs of dictionaries from two lists (talent and job) and then separates them back into two lists.
@@ -114,6 +704,7 @@ def sample_dicts_from_df(df: pd.DataFrame, n: int) -> tuple[list[dict], list[dic
 
 
 if __name__ == "__main__":
+    configure_logging()
 
     # Initialize search system
     search_system = Search(Paths.match_model_path)
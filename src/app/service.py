@@ -0,0 +1,314 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from src.app.search import Search
+from src.util.instrumentation import instrumentation
+from src.util.logger import configure_logging, logger
+from src.util.paths import Paths
+
+# Micro-batching defaults: a single match request waits at most
+# DEFAULT_MAX_LATENCY seconds for others to share its pipeline + predict call.
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_MAX_LATENCY = 0.005
+
+MAX_BODY_SIZE = 64 * 1024 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str = None) -> None:
+        super().__init__(message or status.phrase)
+        self.status = status
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-pair requests into one Search.match_pairs call.
+    """
+
+    def __init__(
+        self,
+        search: Search,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_latency: float = DEFAULT_MAX_LATENCY,
+        executor: ThreadPoolExecutor = None,
+        max_concurrent_batches: int = 1,
+    ) -> None:
+        """
+        :param search: Search instance used for scoring.
+        :param max_batch_size: Maximum number of pairs scored together.
+        :param max_latency: Seconds the first request of a batch waits for more.
+        :param executor: Executor running the scoring calls, the loop default if None.
+        :param max_concurrent_batches: Batches scored at the same time, at most the
+            number of executor threads. While they all run, new requests queue up
+            and form the next batch.
+        """
+        self.search = search
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.max_concurrent_batches = max_concurrent_batches
+        self.queue = None
+        self.task = None
+        self.pending = set()
+        self.n_batches = 0
+        self.n_pairs = 0
+
+    def start(self) -> None:
+        self.queue = asyncio.Queue()
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self) -> None:
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        # batches already taken from the queue still answer their requests
+        await asyncio.gather(*self.pending)
+
+    async def submit(self, talent: dict, job: dict) -> dict:
+        """
+        Queues a pair and waits for its result.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((talent, job, future))
+        return await future
+
+    async def next_batch(self) -> list[tuple]:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_latency
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def score(self, batch: list[tuple]) -> None:
+        """
+        Scores a batch and resolves its futures. If the batch fails, its pairs are
+        scored one by one, so a malformed pair only fails its own request.
+        """
+        loop = asyncio.get_running_loop()
+        talents, jobs, futures = map(list, zip(*batch))
+        try:
+            results = await loop.run_in_executor(
+                self.executor, self.search.match_pairs, talents, jobs
+            )
+        except Exception as error:
+            if len(batch) == 1:
+                if not futures[0].done():
+                    futures[0].set_exception(error)
+                return
+            for pair in batch:
+                await self.score([pair])
+            return
+        self.n_batches += 1
+        self.n_pairs += len(batch)
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.max_concurrent_batches)
+        while True:
+            await slots.acquire()
+            task = loop.create_task(self.score(await self.next_batch()))
+            self.pending.add(task)
+            task.add_done_callback(self.pending.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+
+def to_json(results: list[dict]) -> list[dict]:
+    """
+    Converts numpy labels and scores of Search results to plain Python numbers.
+    """
+    return [
+        {**result, "label": int(result["label"]), "score": float(result["score"])}
+        for result in results
+    ]
+
+
+class MatchService:
+    """
+    Minimal asyncio HTTP/1.1 JSON service around Search.
+
+    Endpoints (all POST with a JSON body, responses are JSON):
+        /match       {"talent": {...}, "job": {...}}, micro-batched
+        /match_bulk  {"talents": [...], "jobs": [...]}
+        /top_k       {"talents": [...], "jobs": [...], "k": 10, "per": "job"}
+    and GET /health, GET /metrics (Prometheus text, see src.util.instrumentation).
+    """
+
+    def __init__(
+        self,
+        search: Search,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_latency: float = DEFAULT_MAX_LATENCY,
+        n_threads: int = 4,
+    ) -> None:
+        """
+        :param search: Search instance used for scoring.
+        :param max_batch_size: Maximum number of single matches scored together.
+        :param max_latency: Seconds a single match waits for others to batch with.
+        :param n_threads: Threads running the scoring calls off the event loop, also
+            the number of micro-batches scored at the same time.
+        """
+        self.search = search
+        # scoring gets its own threads so blocking work never starves the batcher
+        self.executor = ThreadPoolExecutor(max_workers=n_threads)
+        self.batcher = MicroBatcher(
+            search, max_batch_size, max_latency, self.executor, n_threads
+        )
+        self.server = None
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8000) -> None:
+        """
+        Starts listening, port 0 picks a free port (see self.port).
+        """
+        self.batcher.start()
+        self.server = await asyncio.start_server(self.handle, host, port)
+        logger.info(f"Match service listening on {host}:{self.port}")
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+        await self.batcher.stop()
+        self.executor.shutdown(wait=False)
+        self.search.close()
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 8000) -> None:
+        await self.start(host, port)
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.batcher.stop()
+            self.executor.shutdown(wait=False)
+            self.search.close()
+
+    async def route(self, method: str, path: str, payload) -> object:
+        loop = asyncio.get_running_loop()
+        if method == "GET" and path == "/health":
+            return {"status": "ok"}
+        if method == "GET" and path == "/metrics":
+            return instrumentation.prometheus_text() + self.cache_metrics()
+        if method != "POST":
+            raise HTTPError(HTTPStatus.NOT_FOUND)
+        try:
+            if path == "/match":
+                result = await self.batcher.submit(payload["talent"], payload["job"])
+                return to_json([result])[0]
+            if path == "/match_bulk":
+                results = await loop.run_in_executor(
+                    self.executor,
+                    self.search.match_bulk,
+                    payload["talents"],
+                    payload["jobs"],
+                )
+                return to_json(results)
+            if path == "/top_k":
+                results = await loop.run_in_executor(
+                    self.executor,
+                    lambda: self.search.top_k(
+                        payload["talents"],
+                        payload["jobs"],
+                        payload["k"],
+                        per=payload.get("per", "job"),
+                    ),
+                )
+                return to_json(results)
+        except (KeyError, TypeError, ValueError) as error:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid request: {error!r}")
+        raise HTTPError(HTTPStatus.NOT_FOUND)
+
+    def cache_metrics(self, prefix: str = "matching") -> str:
+        """
+        Renders the Search cache statistics in the Prometheus text format.
+        """
+        if self.search.cache is None:
+            return ""
+        lines = []
+        for name, value in self.search.cache.stats().items():
+            kind = "gauge" if name in ("size", "maxsize", "hit_rate") else "counter"
+            suffix = "" if kind == "gauge" else "_total"
+            lines.append(f"# TYPE {prefix}_cache_{name}{suffix} {kind}")
+            lines.append(f"{prefix}_cache_{name}{suffix} {value}")
+        return "\n".join(lines) + "\n"
+
+    async def read_request(self, reader: asyncio.StreamReader) -> tuple:
+        request_line = (await reader.readline()).decode("latin-1").split()
+        if len(request_line) != 3:
+            raise HTTPError(HTTPStatus.BAD_REQUEST)
+        method, path, _ = request_line
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        body = await reader.readexactly(length) if length else b""
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+        return method, path.split("?")[0], payload
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            method, path, payload = await self.read_request(reader)
+            status, body = HTTPStatus.OK, await self.route(method, path, payload)
+        except HTTPError as error:
+            status, body = error.status, {"error": str(error)}
+        except Exception as error:
+            logger.exception("Request failed")
+            status, body = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": repr(error)}
+        if isinstance(body, str):
+            content_type, data = "text/plain; version=0.0.4", body.encode()
+        else:
+            content_type, data = "application/json", json.dumps(body).encode()
+        writer.write(
+            (
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("latin-1")
+            + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+if __name__ == "__main__":
+    configure_logging()
+
+    # the exported scorer starts without sklearn, fall back to the joblib model
+    model_path = Paths.match_scorer_path
+    if not os.path.exists(model_path):
+        model_path = Paths.match_model_path
+    service = MatchService(Search(model_path, engine="numpy", cache_size=100_000))
+    asyncio.run(service.serve_forever(host="0.0.0.0", port=8000))
@@ -0,0 +1,126 @@
+import json
+import mmap
+import os
+import struct
+import numpy as np
+
+# Snapshot file: a single file of flat arrays that a new process memory-maps
+# instead of rebuilding its state, e.g. a MatchingIndex (MatchingIndex.save).
+#   magic (8 bytes) | header length (uint64) | JSON header | arrays
+# The header holds the metadata and, per array, its dtype, shape and offset.
+# Arrays start at ALIGNMENT byte boundaries. Mapped snapshots are copy-on-write:
+# processes mapping the same file share its pages until they modify them.
+
+SNAPSHOT_MAGIC = b"MTCHSNAP"
+SNAPSHOT_VERSION = 1
+ALIGNMENT = 64
+PREFIX = struct.Struct("<8sQ")
+
+
+def pack_json(values: list) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Packs JSON serializable values into flat arrays, None into an empty entry.
+
+    :return: Tuple of (n + 1) int64 offsets and uint8 bytes.
+    """
+    data = [b"" if value is None else json.dumps(value).encode() for value in values]
+    offsets = np.zeros(len(data) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in data], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(data), dtype=np.uint8)
+
+
+class JsonValues:
+    """
+    Values packed with pack_json, decoded on access.
+    """
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray) -> None:
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int):
+        start, end = self.offsets[i : i + 2].tolist()
+        if start == end:
+            return None
+        return json.loads(self.data[start:end].tobytes())
+
+
+def write_snapshot(path: str, arrays: dict[str, np.ndarray], meta: dict) -> int:
+    """
+    Writes a snapshot atomically (to a temporary file renamed over path).
+
+    :param path: Path of the snapshot file.
+    :param arrays: Dictionary name -> numeric array.
+    :param meta: JSON serializable metadata, returned by read_snapshot.
+    :return: Size of the file in bytes.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    entries, offset = {}, 0
+    for name, array in arrays.items():
+        if array.dtype.hasobject:
+            raise ValueError(f"Cannot snapshot the object array {name}")
+        offset += -offset % ALIGNMENT
+        entries[name] = {
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "offset": offset,
+        }
+        offset += array.nbytes
+    header = json.dumps(
+        {"snapshot_version": SNAPSHOT_VERSION, "meta": meta, "arrays": entries}
+    ).encode()
+    start = PREFIX.size + len(header)
+    start += -start % ALIGNMENT
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PREFIX.pack(SNAPSHOT_MAGIC, len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(start + entries[name]["offset"])
+            f.write(array.data)
+        f.truncate(start + offset)
+    os.replace(tmp_path, path)
+    return start + offset
+
+
+def read_snapshot(path: str, mmap_arrays: bool = True) -> tuple[dict, dict]:
+    """
+    Reads a snapshot written by write_snapshot.
+
+    :param path: Path of the snapshot file.
+    :param mmap_arrays: Map the file copy-on-write instead of reading it, so the
+        arrays are paged in on access and shared with other processes.
+    :return: Tuple of the dictionary name -> array (writable) and the metadata.
+    """
+    with open(path, "rb") as f:
+        magic, header_size = PREFIX.unpack(f.read(PREFIX.size))
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a snapshot file")
+        header = json.loads(f.read(header_size))
+        version = header["snapshot_version"]
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {version} in {path}")
+        start = PREFIX.size + header_size
+        start += -start % ALIGNMENT
+        if mmap_arrays:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        else:
+            f.seek(0)
+            buffer = bytearray(f.read())
+
+    arrays = {}
+    for name, entry in header["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        arrays[name] = np.frombuffer(
+            buffer,
+            dtype=dtype,
+            count=int(np.prod(shape)),
+            offset=start + entry["offset"],
+        ).reshape(shape)
+    return arrays, header["meta"]
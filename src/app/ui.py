@@ -1,9 +1,16 @@
 import streamlit as st
 import pandas as pd
-import joblib
 from src.app.search import Search
+from src.app.matching_index import MatchingIndex
+from src.data.streaming import sample_records
+from src.util.logger import configure_logging, logger
 from src.util.paths import Paths
 
+# number of raw records the UI samples its examples from
+UI_SAMPLE_SIZE = 10_000
+# number of talents and of jobs in the index of the Best Jobs mode
+UI_POOL_SIZE = 1_000
+
 
 def sample_dicts_from_df(df: pd.DataFrame, n: int) -> tuple[list[dict], list[dict]]:
     talents = df.talent.sample(n).tolist()
@@ -11,9 +18,40 @@ def sample_dicts_from_df(df: pd.DataFrame, n: int) -> tuple[list[dict], list[dic
     return talents, jobs
 
 
+@st.cache_resource
+def setup_logging() -> None:
+    # once per server process, streamlit reruns the script on every interaction
+    configure_logging()
+
+
 @st.cache_data
-def load_data(data_path: str) -> pd.DataFrame:
-    return pd.read_json(data_path)
+def load_data(data_path: str, max_rows: int = UI_SAMPLE_SIZE) -> pd.DataFrame:
+    # a uniform sample read in one streaming pass, the raw dataset can be larger than memory
+    return pd.DataFrame(sample_records(data_path, max_rows, seed=0))
+
+
+@st.cache_resource
+def load_search(model_path: str) -> Search:
+    # one Search per server process, shared by every session and rerun
+    return Search(model_path)
+
+
+@st.cache_resource
+def load_index(_search: Search, snapshot_path: str, data_path: str) -> MatchingIndex:
+    """
+    Maps the index snapshot, building and saving it first if it is missing or was
+    built with another model.
+    """
+    try:
+        return _search.load_index(snapshot_path)
+    except (FileNotFoundError, ValueError) as e:
+        logger.info(f"Building the index snapshot: {e}")
+    pool = load_data(data_path).iloc[:UI_POOL_SIZE]
+    index = _search.create_index()
+    index.upsert_talents(dict(enumerate(pool.talent)))
+    index.upsert_jobs(dict(enumerate(pool.job)))
+    index.save(snapshot_path)
+    return index
 
 
 def display_results(results: list[dict]) -> None:
@@ -34,14 +72,15 @@ def display_results(results: list[dict]) -> None:
 
 
 def main():
+    setup_logging()
     st.title("Talent-Job Matching System")
 
     # Load model and data
-    search_system = Search(Paths.match_model_path)
+    search_system = load_search(Paths.match_model_path)
     df = load_data(Paths.raw_dataset_path)
 
     # Mode selection
-    mode = st.selectbox("Select Mode", ["Single Match", "Bulk Match"])
+    mode = st.selectbox("Select Mode", ["Single Match", "Bulk Match", "Best Jobs"])
 
     if mode == "Single Match":
         st.subheader("Single Match")
@@ -49,11 +88,20 @@ def main():
         talents, jobs = sample_dicts_from_df(df, sample_size)
 
         if st.button("Run Match"):
-            results = []
-            for talent, job in zip(talents, jobs):
-                result = search_system.match(talent, job)
-                results.append(result)
+            results = search_system.match_pairs(talents, jobs)
             display_results(results)
+    elif mode == "Best Jobs":
+        st.subheader("Best Jobs")
+        index = load_index(
+            search_system, Paths.index_snapshot_path, Paths.raw_dataset_path
+        )
+        talent_id = st.number_input(
+            "Talent", min_value=0, max_value=len(index.talents) - 1, value=0
+        )
+        k = st.number_input("Number of Jobs", min_value=1, value=index.k)
+
+        if st.button("Show Best Jobs"):
+            display_results(index.best_jobs(int(talent_id), int(k)))
     else:
         st.subheader("Bulk Match")
         sample_size = st.number_input("Sample Size", min_value=1, value=5)
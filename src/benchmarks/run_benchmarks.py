@@ -0,0 +1,449 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+import sklearn
+
+from src.app.search import Search, combine_and_separate
+from src.data.make_dataset import normalize_and_merge
+from src.data.synthetic import generate_profiles
+from src.features.build_features import process_data_pipeline
+from src.features.encoding import compute_pair_features, encode_profiles
+from src.features.feature_utils import FEATURES
+from src.features.records import JobRecords, TalentRecords, as_records
+from src.util.logger import configure_logging, logger
+from src.util.paths import Paths
+
+# (n_talents, n_jobs)
+SCENARIOS = [
+    (1, 1),
+    (10, 10),
+    (100, 100),
+    (300, 300),
+    (1_000, 1_000),
+    (3_000, 3_000),
+    (10_000, 10_000),
+]
+
+
+def merged_pairs(talents: list[dict], jobs: list[dict]) -> pd.DataFrame:
+    return normalize_and_merge(*combine_and_separate(talents, jobs))
+
+
+# Each bench_* function does the setup for a stage and returns a callable
+# running only the measured work.
+
+
+# Cold start of a fresh interpreter: importing the Search entry point and loading
+# a model, with the import time checked against a budget.
+IMPORT_BUDGET_SECONDS = 0.5
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from src.app.search import Search
+imported = time.perf_counter()
+Search(sys.argv[1])
+print(json.dumps({"import_seconds": imported - start,
+                  "load_seconds": time.perf_counter() - imported}))
+"""
+
+
+def measure_startup(model_path: str, repeats: int = 3) -> dict:
+    """
+    Measures the cold start of the Search entry point in fresh interpreters.
+
+    :param model_path: Model file loaded after the import.
+    :param repeats: Number of interpreters started, the fastest run is kept.
+    :return: Dictionary of measurements.
+    """
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", STARTUP_SCRIPT, model_path],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    import_seconds = min(run["import_seconds"] for run in runs)
+    return {
+        "model": os.path.basename(model_path),
+        "import_seconds": import_seconds,
+        "load_seconds": min(run["load_seconds"] for run in runs),
+        "import_budget_seconds": IMPORT_BUDGET_SECONDS,
+        "within_budget": import_seconds <= IMPORT_BUDGET_SECONDS,
+    }
+
+
+def bench_combine_and_separate(search, talents, jobs):
+    return lambda: combine_and_separate(talents, jobs)
+
+
+def bench_normalize_and_merge(search, talents, jobs):
+    pairs = combine_and_separate(talents, jobs)
+    return lambda: normalize_and_merge(*pairs)
+
+
+def bench_pipeline(engine: str):
+    def bench(search, talents, jobs):
+        df = merged_pairs(talents, jobs)
+        return lambda: process_data_pipeline(
+            df, FEATURES, [], ignore_label=True, engine=engine
+        )
+
+    return bench
+
+
+def bench_encode_profiles(search, talents, jobs):
+    return lambda: encode_profiles(talents, jobs)
+
+
+def bench_pair_features(sparse: bool):
+    def bench(search, talents, jobs):
+        encodings = encode_profiles(talents, jobs, sparse=sparse)
+        return lambda: compute_pair_features(*encodings)
+
+    return bench
+
+
+def bench_predict(search, talents, jobs):
+    df = process_data_pipeline(
+        merged_pairs(talents, jobs), FEATURES, [], ignore_label=True, engine="numpy"
+    )
+    return lambda: search.predict(df, is_bulk=True)
+
+
+def bench_match(engine: str):
+    def bench(search, talents, jobs):
+        return lambda: search.match(talents[0], jobs[0], engine=engine)
+
+    return bench
+
+
+def bench_match_bulk(engine: str):
+    def bench(search, talents, jobs):
+        return lambda: search.match_bulk(talents, jobs, engine=engine)
+
+    return bench
+
+
+def bench_match_bulk_records(search, talents, jobs):
+    records = as_records(talents, jobs)
+    return lambda: search.match_bulk(*records)
+
+
+def bench_match_bulk_cached(search, talents, jobs):
+    cached = Search(
+        search.model_path, engine="encoded", cache_size=len(talents) * len(jobs)
+    )
+    cached.match_bulk(talents, jobs)
+    return lambda: cached.match_bulk(talents, jobs)
+
+
+def bench_match_candidates(search, talents, jobs):
+    return lambda: search.match_candidates(talents, jobs)
+
+
+def bench_top_k(search, talents, jobs):
+    return lambda: search.top_k(talents, jobs, 10, per="job")
+
+
+# name: (bench function, maximum number of pairs the stage is run for)
+STAGES = {
+    "combine_and_separate": (bench_combine_and_separate, 1_000_000),
+    "normalize_and_merge": (bench_normalize_and_merge, 1_000_000),
+    "process_data_pipeline[pandas]": (bench_pipeline("pandas"), 100_000),
+    "process_data_pipeline[numpy]": (bench_pipeline("numpy"), 1_000_000),
+    "encode_profiles": (bench_encode_profiles, None),
+    "compute_pair_features[dense]": (bench_pair_features(False), 1_000_000),
+    "compute_pair_features[sparse]": (bench_pair_features(True), 1_000_000),
+    "predict": (bench_predict, 1_000_000),
+    "match[pandas]": (bench_match("pandas"), 1),
+    "match[dict]": (bench_match("dict"), 1),
+    "match_bulk[pandas]": (bench_match_bulk("pandas"), 100_000),
+    "match_bulk[numpy]": (bench_match_bulk("numpy"), 1_000_000),
+    "match_bulk[encoded]": (bench_match_bulk("encoded"), 1_000_000),
+    "match_bulk[records]": (bench_match_bulk_records, 1_000_000),
+    "match_bulk[cached]": (bench_match_bulk_cached, 1_000_000),
+    "match_candidates": (bench_match_candidates, None),
+    "top_k[job]": (bench_top_k, None),
+}
+
+
+def measure(run, repeats: int, min_time: float, memory: bool) -> dict:
+    """
+    Times a callable and optionally measures its peak traced memory.
+
+    :param run: Callable to measure.
+    :param repeats: Maximum number of timed runs.
+    :param min_time: Runs slower than this are not repeated.
+    :param memory: Whether to do an extra run under tracemalloc.
+    :return: Dictionary of measurements.
+    """
+    timings = []
+    while len(timings) < repeats:
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+        if timings[0] > min_time:
+            break
+
+    peak = None
+    if memory:
+        # separate run, tracemalloc slows down Python heavy code
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "repeats": len(timings),
+        "min_seconds": min(timings),
+        "median_seconds": statistics.median(timings),
+        "peak_memory_bytes": peak,
+    }
+
+
+def object_size(obj, seen: set = None) -> int:
+    """
+    Deep size of nested dicts, lists and scalars (shared objects counted once).
+    """
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(object_size(k, seen) + object_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(object_size(item, seen) for item in obj)
+    return size
+
+
+def measure_records(talents: list[dict], jobs: list[dict]) -> dict:
+    """
+    Compares the memory held by the dict profiles and by their compact records.
+    """
+    dict_bytes = object_size(talents) + object_size(jobs)
+    record_bytes = (
+        TalentRecords.from_dicts(talents).nbytes + JobRecords.from_dicts(jobs).nbytes
+    )
+    return {
+        "dict_bytes": dict_bytes,
+        "record_bytes": record_bytes,
+        "saving": 1 - record_bytes / dict_bytes,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def metadata() -> dict:
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+    }
+
+
+def run_benchmarks(
+    search: Search,
+    scenarios: list[tuple[int, int]],
+    stages: list[str],
+    max_pairs: int = None,
+    repeats: int = 5,
+    min_time: float = 1.0,
+    memory: bool = True,
+    seed: int = 0,
+) -> dict:
+    """
+    Runs the selected stages on every scenario.
+
+    :param search: Search instance under test.
+    :param scenarios: List of (n_talents, n_jobs).
+    :param stages: Names of STAGES to run.
+    :param max_pairs: Skip scenarios with more pairs than this.
+    :param repeats: Maximum number of timed runs per stage.
+    :param min_time: Stages slower than this are run once.
+    :param memory: Whether to measure peak memory, and the memory of the profiles
+        as dicts and as records.
+    :param seed: Seed of the synthetic profiles.
+    :return: Machine-readable results with run metadata.
+    """
+    results, records = [], []
+    for n_talents, n_jobs in scenarios:
+        n_pairs = n_talents * n_jobs
+        if max_pairs is not None and n_pairs > max_pairs:
+            continue
+        talents, jobs = generate_profiles(n_talents, n_jobs, seed=seed)
+        if memory:
+            record_memory = {
+                "scenario": f"{n_talents}x{n_jobs}",
+                **measure_records(talents, jobs),
+            }
+            records.append(record_memory)
+            logger.info(
+                f"{record_memory['scenario']:>13} {'profiles':<30} "
+                f"dicts {format_bytes(record_memory['dict_bytes'])}, "
+                f"records {format_bytes(record_memory['record_bytes'])} "
+                f"(-{record_memory['saving']:.0%})"
+            )
+        for stage in stages:
+            make_run, stage_max_pairs = STAGES[stage]
+            if stage_max_pairs is not None and n_pairs > stage_max_pairs:
+                continue
+            run = make_run(search, talents, jobs)
+            measurement = measure(run, repeats, min_time, memory)
+            result = {
+                "scenario": f"{n_talents}x{n_jobs}",
+                "stage": stage,
+                "n_talents": n_talents,
+                "n_jobs": n_jobs,
+                "n_pairs": n_pairs,
+                **measurement,
+                "pairs_per_second": n_pairs / measurement["min_seconds"],
+            }
+            results.append(result)
+            logger.info(
+                f"{result['scenario']:>13} {stage:<30} "
+                f"{result['min_seconds'] * 1e3:10.3f} ms "
+                f"{format_bytes(result['peak_memory_bytes']):>10}"
+            )
+    return {"metadata": metadata(), "results": results, "records_memory": records}
+
+
+def format_bytes(n_bytes: int) -> str:
+    if n_bytes is None:
+        return "-"
+    for unit in ("B", "KiB", "MiB"):
+        if n_bytes < 1024:
+            return f"{n_bytes:.0f} {unit}"
+        n_bytes /= 1024
+    return f"{n_bytes:.1f} GiB"
+
+
+def compare(baseline: dict, current: dict) -> list[dict]:
+    """
+    Compares two benchmark result files stage by stage.
+
+    :param baseline: Results of the reference run.
+    :param current: Results of the new run.
+    :return: List of rows with the time and memory ratios (current / baseline).
+    """
+    reference = {(r["scenario"], r["stage"]): r for r in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        before = reference.get((result["scenario"], result["stage"]))
+        if before is None:
+            continue
+        memory_ratio = None
+        if result["peak_memory_bytes"] and before["peak_memory_bytes"]:
+            memory_ratio = result["peak_memory_bytes"] / before["peak_memory_bytes"]
+        rows.append(
+            {
+                "scenario": result["scenario"],
+                "stage": result["stage"],
+                "time_ratio": result["min_seconds"] / before["min_seconds"],
+                "memory_ratio": memory_ratio,
+            }
+        )
+    return rows
+
+
+def parse_scenario(value: str) -> tuple[int, int]:
+    n_talents, _, n_jobs = value.partition("x")
+    return int(n_talents), int(n_jobs or n_talents)
+
+
+if __name__ == "__main__":
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description="Benchmark the matching hot paths.")
+    parser.add_argument("--model", default=Paths.match_model_path)
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        type=parse_scenario,
+        help="NxM, can be repeated (default: 1x1 up to 10000x10000)",
+    )
+    parser.add_argument("--stage", action="append", choices=list(STAGES))
+    parser.add_argument("--max-pairs", type=int)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="results file (default: reports/benchmarks/)")
+    parser.add_argument("--compare", help="previous results file to compare with")
+    parser.add_argument(
+        "--startup-model",
+        action="append",
+        help="model files whose cold start is measured (default: --model and the "
+        "exported scorer, if present)",
+    )
+    args = parser.parse_args()
+
+    report = run_benchmarks(
+        Search(args.model),
+        args.scenario or SCENARIOS,
+        args.stage or list(STAGES),
+        max_pairs=args.max_pairs,
+        repeats=args.repeats,
+        memory=not args.no_memory,
+        seed=args.seed,
+    )
+
+    startup_models = args.startup_model or [
+        path for path in (args.model, Paths.match_scorer_path) if os.path.exists(path)
+    ]
+    report["startup"] = []
+    for model_path in startup_models:
+        startup = measure_startup(model_path)
+        report["startup"].append(startup)
+        log = logger.info if startup["within_budget"] else logger.warning
+        log(
+            f"startup {startup['model']:<20} import "
+            f"{startup['import_seconds'] * 1e3:.0f} ms "
+            f"(budget {IMPORT_BUDGET_SECONDS * 1e3:.0f} ms), "
+            f"model load {startup['load_seconds'] * 1e3:.0f} ms"
+        )
+
+    output = args.output
+    if output is None:
+        os.makedirs(Paths.benchmarks_dir, exist_ok=True)
+        name = f"{report['metadata']['timestamp']}_{report['metadata']['commit']}"
+        output = f"{Paths.benchmarks_dir}/{name.replace(':', '')}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for row in compare(baseline, report):
+            memory_ratio = row["memory_ratio"]
+            logger.info(
+                f"{row['scenario']:>13} {row['stage']:<30} "
+                f"time x{row['time_ratio']:.2f} "
+                f"memory {'-' if memory_ratio is None else f'x{memory_ratio:.2f}'}"
+            )
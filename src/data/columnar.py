@@ -0,0 +1,519 @@
+from __future__ import annotations
+import json
+import os
+import shutil
+import numpy as np
+from src.util.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# Column store: one directory per dataset, holding schema.json and one .npy
+# file per array, so numeric columns load without parsing and can be
+# memory-mapped. Column kinds:
+#   numeric      <name>.npy
+#   categorical  <name>.codes.npy (int32, -1 for missing) + categories in the schema
+#   string_list  <name>.offsets.npy + <name>.codes.npy, e.g. job roles
+#   record_list  <name>.offsets.npy + one encoded column per record field,
+#                e.g. languages [{"title": ..., "rating": ...}]
+#   json         <name>.offsets.npy + <name>.bytes.npy, anything else (dicts)
+# Processed datasets can also store a contiguous float matrix (matrix.npy)
+# of the feature columns, for memory-mapped training and batch scoring.
+# ColumnStoreWriter appends DataFrame chunks, so stores larger than memory
+# can be written chunk by chunk. The kind of a column is chosen from its first
+# chunk and widened when a later chunk does not fit it (see widen): numeric
+# columns to the promoted dtype (int64 -> float64), anything else to json.
+
+FORMAT_VERSION = 1
+SCHEMA_FILE = "schema.json"
+MATRIX_FILE = "matrix.npy"
+WIDEN_BLOCK_SIZE = 1 << 20  # rows rewritten at once when a column is widened
+
+
+class IncompatibleValues(ValueError):
+    """
+    Values a column writer cannot store, see widen.
+    """
+
+
+def is_missing(value) -> bool:
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+class ArrayFile:
+    """
+    .npy file written by appending blocks of rows: the data goes to a part
+    file first, the header with the final shape is written on finish.
+    """
+
+    def __init__(self, path: str, dtype, row_shape: tuple = ()) -> None:
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.row_shape = row_shape
+        self.n_rows = 0
+        open(f"{path}.part", "wb").close()
+
+    def append(self, array: np.ndarray) -> None:
+        array = np.asarray(array)
+        if not np.can_cast(array.dtype, self.dtype, casting="same_kind"):
+            raise IncompatibleValues(
+                f"Cannot append {array.dtype} values to a {self.dtype} column"
+            )
+        with open(f"{self.path}.part", "ab") as f:
+            f.write(np.ascontiguousarray(array, dtype=self.dtype).tobytes())
+        self.n_rows += len(array)
+
+    def blocks(self, block_size: int = WIDEN_BLOCK_SIZE):
+        """
+        :return: Generator of the rows appended so far, block_size rows at a time.
+        """
+        row_size = self.dtype.itemsize * int(np.prod(self.row_shape))
+        for start in range(0, self.n_rows, block_size):
+            count = min(block_size, self.n_rows - start)
+            yield np.fromfile(
+                f"{self.path}.part",
+                dtype=self.dtype,
+                count=count * int(np.prod(self.row_shape)),
+                offset=start * row_size,
+            ).reshape(count, *self.row_shape)
+
+    def cast(self, dtype) -> None:
+        """
+        Rewrites the rows appended so far as dtype.
+        """
+        dtype = np.dtype(dtype)
+        with open(f"{self.path}.cast", "wb") as f:
+            for block in self.blocks():
+                f.write(block.astype(dtype).tobytes())
+        os.replace(f"{self.path}.cast", f"{self.path}.part")
+        self.dtype = dtype
+
+    def discard(self) -> None:
+        os.remove(f"{self.path}.part")
+
+    def finish(self) -> None:
+        header = {
+            "descr": np.lib.format.dtype_to_descr(self.dtype),
+            "fortran_order": False,
+            "shape": (self.n_rows, *self.row_shape),
+        }
+        with open(self.path, "wb") as out, open(f"{self.path}.part", "rb") as part:
+            np.lib.format.write_array_header_1_0(out, header)
+            shutil.copyfileobj(part, out)
+        os.remove(f"{self.path}.part")
+
+
+class OffsetsFile(ArrayFile):
+    """
+    Offsets of variable length rows, starting at 0.
+    """
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path, np.int64)
+        self.end = 0
+        self.append(np.zeros(1, dtype=np.int64))
+
+    def append_lengths(self, lengths) -> None:
+        offsets = self.end + np.cumsum(np.asarray(lengths, dtype=np.int64))
+        self.append(offsets)
+        if len(offsets):
+            self.end = int(offsets[-1])
+
+
+class NumericColumn:
+    def __init__(self, path: str, name: str, dtype) -> None:
+        self.path = path
+        self.name = name
+        self.file = ArrayFile(f"{path}/{name}.npy", dtype)
+
+    def append(self, values) -> None:
+        self.file.append(values)
+
+    def blocks(self):
+        for block in self.file.blocks():
+            yield block.tolist()
+
+    def discard(self) -> None:
+        self.file.discard()
+
+    def finish(self) -> dict:
+        self.file.finish()
+        return {"kind": "numeric", "dtype": self.file.dtype.str}
+
+
+class CategoricalColumn:
+    def __init__(self, path: str, name: str) -> None:
+        self.path = path
+        self.name = name
+        self.file = ArrayFile(f"{path}/{name}.codes.npy", np.int32)
+        self.categories = {}
+
+    def append(self, values) -> None:
+        codes = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            if is_missing(value):
+                codes[i] = -1
+            elif isinstance(value, str):
+                codes[i] = self.categories.setdefault(value, len(self.categories))
+            else:
+                raise IncompatibleValues(
+                    f"Cannot append {value!r} to a categorical column"
+                )
+        self.file.append(codes)
+
+    def blocks(self):
+        categories = np.array(list(self.categories) + [None], dtype=object)
+        for codes in self.file.blocks():
+            yield categories[codes].tolist()
+
+    def discard(self) -> None:
+        self.file.discard()
+
+    def finish(self) -> dict:
+        self.file.finish()
+        return {"kind": "categorical", "categories": list(self.categories)}
+
+
+class JsonColumn:
+    def __init__(self, path: str, name: str) -> None:
+        self.path = path
+        self.name = name
+        self.offsets = OffsetsFile(f"{path}/{name}.offsets.npy")
+        self.data = ArrayFile(f"{path}/{name}.bytes.npy", np.uint8)
+
+    def append(self, values) -> None:
+        data = [json.dumps(value, default=str).encode() for value in values]
+        self.offsets.append_lengths([len(item) for item in data])
+        self.data.append(np.frombuffer(b"".join(data), dtype=np.uint8))
+
+    def finish(self) -> dict:
+        self.offsets.finish()
+        self.data.finish()
+        return {"kind": "json"}
+
+
+def widen(column, values, path: str, name: str):
+    """
+    Replaces a column writer that cannot store values by one that can and
+    appends them: numeric columns are cast to the promoted dtype when the values
+    are numbers, any other column becomes a JsonColumn holding the values
+    written so far. Memory holds WIDEN_BLOCK_SIZE rows of the column at a time.
+
+    :param column: NumericColumn or CategoricalColumn that rejected values.
+    :param values: Values of the chunk.
+    :param path: Dataset directory.
+    :param name: File name of the column.
+    :return: The writer holding the column from now on.
+    """
+    if isinstance(column, NumericColumn):
+        array = np.asarray(values)
+        if array.dtype.kind in "biuf":
+            column.file.cast(np.promote_types(column.file.dtype, array.dtype))
+            column.append(array)
+            return column
+    widened = JsonColumn(path, name)
+    for block in column.blocks():
+        widened.append(block)
+    column.discard()
+    widened.append(values.tolist() if isinstance(values, np.ndarray) else values)
+    return widened
+
+
+def scalar_column(values: list, path: str, name: str):
+    """
+    Chooses the encoding of a flat column (numbers, booleans or strings)
+    from its first values.
+    """
+    present = [value for value in values if not is_missing(value)]
+    if present and all(isinstance(value, str) for value in present):
+        return CategoricalColumn(path, name)
+    if not any(isinstance(value, (list, dict)) for value in present):
+        array = np.asarray(values)
+        if array.dtype != object:
+            return NumericColumn(path, name, array.dtype)
+    return JsonColumn(path, name)
+
+
+class ListColumn:
+    """
+    Variable length lists of strings (string_list) or of records (record_list).
+    """
+
+    def __init__(self, path: str, name: str, kind: str) -> None:
+        self.path = path
+        self.name = name
+        self.kind = kind
+        self.offsets = OffsetsFile(f"{path}/{name}.offsets.npy")
+        self.missing = ArrayFile(f"{path}/{name}.missing.npy", bool)
+        self.values = CategoricalColumn(path, name) if kind == "string_list" else None
+        self.fields = {}
+        self.n_items = 0
+
+    def append(self, values) -> None:
+        missing = np.array([is_missing(value) for value in values], dtype=bool)
+        lists = [[] if m else value for value, m in zip(values, missing)]
+        items = [item for value in lists for item in value]
+        if self.kind == "string_list":
+            self.values.append(items)
+        else:
+            if not all(isinstance(item, dict) for item in items):
+                raise ValueError(f"Cannot append non-records to {self.name}")
+            for field in dict.fromkeys(key for item in items for key in item):
+                if field not in self.fields:
+                    # fields first seen now: earlier items get None
+                    column = scalar_column(
+                        [item.get(field) for item in items],
+                        self.path,
+                        f"{self.name}.{field}",
+                    )
+                    if self.n_items:
+                        column = JsonColumn(self.path, f"{self.name}.{field}")
+                        column.append([None] * self.n_items)
+                    self.fields[field] = column
+            for field, column in self.fields.items():
+                values = [item.get(field) for item in items]
+                try:
+                    column.append(values)
+                except IncompatibleValues:
+                    self.fields[field] = widen(
+                        column, values, self.path, f"{self.name}.{field}"
+                    )
+        self.offsets.append_lengths([len(value) for value in lists])
+        self.missing.append(missing)
+        self.n_items += len(items)
+
+    def finish(self) -> dict:
+        self.offsets.finish()
+        self.missing.finish()
+        has_missing = self.missing.n_rows > 0 and bool(
+            np.load(self.missing.path, mmap_mode="r").any()
+        )
+        if not has_missing:
+            os.remove(self.missing.path)
+        if self.kind == "string_list":
+            entry = {"values": self.values.finish()}
+        else:
+            entry = {
+                "fields": {
+                    field: column.finish() for field, column in self.fields.items()
+                }
+            }
+        return {**entry, "kind": self.kind, "has_missing": has_missing}
+
+
+def column_writer(series: pd.Series, path: str, name: str):
+    """
+    Chooses the encoding of a DataFrame column from its first chunk.
+    """
+    array = series.to_numpy()
+    if array.dtype != object:
+        return NumericColumn(path, name, array.dtype)
+    values = array.tolist()
+    present = [value for value in values if not is_missing(value)]
+    if not present or not all(isinstance(value, list) for value in present):
+        return scalar_column(values, path, name)
+    items = [item for value in present for item in value]
+    if all(isinstance(item, str) for item in items):
+        return ListColumn(path, name, "string_list")
+    if all(isinstance(item, dict) for item in items):
+        return ListColumn(path, name, "record_list")
+    return JsonColumn(path, name)
+
+
+class ColumnStoreWriter:
+    """
+    Writes a column store from one or more DataFrame chunks with the same columns.
+    Memory holds one chunk, plus the categories of categorical columns.
+
+        with ColumnStoreWriter(path) as writer:
+            for chunk in chunks:
+                writer.append(chunk)
+    """
+
+    def __init__(self, path: str, matrix_columns: list = None) -> None:
+        """
+        :param path: Dataset directory, created if needed.
+        :param matrix_columns: Numeric columns to also store as one float64 matrix.
+        """
+        self.path = path
+        self.matrix_columns = matrix_columns
+        self.columns = None
+        self.matrix = None
+        self.n_rows = 0
+        os.makedirs(path, exist_ok=True)
+        # a store being rewritten must not be read meanwhile
+        if os.path.exists(f"{path}/{SCHEMA_FILE}"):
+            os.remove(f"{path}/{SCHEMA_FILE}")
+
+    def __enter__(self) -> "ColumnStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if exc_type is None:
+            self.close()
+
+    def append(self, df: pd.DataFrame) -> None:
+        """
+        :param df: Chunk to append (the index is not stored).
+        """
+        if self.columns is None:
+            self.columns = {
+                column: column_writer(df[column], self.path, f"c{i}")
+                for i, column in enumerate(df.columns)
+            }
+            if self.matrix_columns is not None:
+                self.matrix = ArrayFile(
+                    f"{self.path}/{MATRIX_FILE}",
+                    np.float64,
+                    (len(self.matrix_columns),),
+                )
+        elif list(df.columns) != list(self.columns):
+            raise ValueError("Chunk columns differ from the first chunk")
+
+        for column, writer in self.columns.items():
+            values = df[column].to_numpy()
+            try:
+                writer.append(values)
+            except IncompatibleValues:
+                self.columns[column] = widen(writer, values, self.path, writer.name)
+        if self.matrix is not None:
+            self.matrix.append(df[self.matrix_columns].to_numpy(dtype=np.float64))
+        self.n_rows += len(df)
+
+    def close(self) -> None:
+        """
+        Finishes the files and writes the schema, which makes the store readable.
+        """
+        if self.columns is None:
+            raise ValueError("Nothing was appended to the column store")
+        columns = {}
+        for i, (column, writer) in enumerate(self.columns.items()):
+            columns[column] = {**writer.finish(), "file": f"c{i}"}
+        schema = {"version": FORMAT_VERSION, "n_rows": self.n_rows, "columns": columns}
+        if self.matrix is not None:
+            self.matrix.finish()
+            schema["matrix_columns"] = list(self.matrix_columns)
+        with open(f"{self.path}/{SCHEMA_FILE}", "w") as f:
+            json.dump(schema, f, indent=2)
+
+
+def write_columns(df: pd.DataFrame, path: str, matrix_columns: list = None) -> None:
+    """
+    Writes a DataFrame as a column store directory.
+
+    :param df: DataFrame to write (the index is not stored).
+    :param path: Dataset directory, created if needed.
+    :param matrix_columns: Numeric columns to also store as one float64 matrix.
+    """
+    with ColumnStoreWriter(path, matrix_columns) as writer:
+        writer.append(df)
+
+
+def read_schema(path: str) -> dict:
+    with open(f"{path}/{SCHEMA_FILE}") as f:
+        schema = json.load(f)
+    if schema["version"] != FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported column store version {schema['version']} in {path}"
+        )
+    return schema
+
+
+def load_array(path: str, rows: tuple, mmap: bool = False) -> np.ndarray:
+    """
+    Loads rows [start, stop) of an .npy file, reading only those from disk.
+    """
+    start, stop = rows
+    array = np.load(path, mmap_mode="r")[start:stop]
+    return array if mmap else np.array(array)
+
+
+def decode_values(entry: dict, path: str, name: str, rows: tuple, mmap: bool = False):
+    """
+    Decodes rows [start, stop) of a flat column.
+
+    :return: numpy array (numeric) or object array (strings, None for missing).
+    """
+    if entry["kind"] == "numeric":
+        return load_array(f"{path}/{name}.npy", rows, mmap)
+    if entry["kind"] == "categorical":
+        codes = load_array(f"{path}/{name}.codes.npy", rows)
+        categories = np.array(entry["categories"] + [None], dtype=object)
+        return categories[codes]
+    offsets = load_array(f"{path}/{name}.offsets.npy", (rows[0], rows[1] + 1))
+    data = load_array(f"{path}/{name}.bytes.npy", (offsets[0], offsets[-1])).tobytes()
+    offsets = offsets - offsets[0]
+    values = np.empty(len(offsets) - 1, dtype=object)
+    values[:] = [
+        json.loads(data[start:end]) for start, end in zip(offsets[:-1], offsets[1:])
+    ]
+    return values
+
+
+def decode_column(entry: dict, path: str, rows: tuple, mmap: bool = False):
+    name = entry["file"]
+    if entry["kind"] not in ("string_list", "record_list"):
+        return decode_values(entry, path, name, rows, mmap)
+
+    offsets = load_array(f"{path}/{name}.offsets.npy", (rows[0], rows[1] + 1))
+    item_rows = (offsets[0], offsets[-1])
+    if entry["kind"] == "string_list":
+        items = decode_values(entry["values"], path, name, item_rows).tolist()
+    else:
+        fields = {
+            field: decode_values(
+                field_entry, path, f"{name}.{field}", item_rows
+            ).tolist()
+            for field, field_entry in entry["fields"].items()
+        }
+        items = [dict(zip(fields, values)) for values in zip(*fields.values())]
+    offsets = offsets - offsets[0]
+    values = np.empty(len(offsets) - 1, dtype=object)
+    values[:] = [items[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+    if entry["has_missing"]:
+        values[load_array(f"{path}/{name}.missing.npy", rows)] = np.nan
+    return values
+
+
+def read_columns(
+    path: str, columns: list = None, mmap: bool = False, rows: slice = None
+) -> pd.DataFrame:
+    """
+    Reads (a subset of) the columns of a column store.
+
+    :param path: Dataset directory.
+    :param columns: Columns to read, all by default; the others are not touched.
+    :param mmap: Memory-map numeric columns instead of loading them.
+    :param rows: Contiguous range of rows to read (e.g. slice(0, 10_000)), all by default.
+    :return: DataFrame with the columns in the requested order, indexed by row number.
+    """
+    schema = read_schema(path)
+    columns = list(schema["columns"]) if columns is None else columns
+    missing = [column for column in columns if column not in schema["columns"]]
+    if missing:
+        raise KeyError(f"Columns {missing} not in {path}")
+    start, stop, step = (rows or slice(None)).indices(schema["n_rows"])
+    if step != 1:
+        raise ValueError("Only contiguous row ranges can be read")
+    stop = max(start, stop)
+    return pd.DataFrame(
+        {
+            column: decode_column(schema["columns"][column], path, (start, stop), mmap)
+            for column in columns
+        },
+        index=pd.RangeIndex(start, stop),
+    )
+
+
+def read_matrix(path: str, mmap: bool = True) -> tuple[np.ndarray, list[str]]:
+    """
+    Reads the float64 feature matrix of a column store.
+
+    :param path: Dataset directory.
+    :param mmap: Memory-map the matrix (read only) instead of loading it.
+    :return: Tuple of the (n_rows, n_columns) matrix and its column names.
+    """
+    schema = read_schema(path)
+    if "matrix_columns" not in schema:
+        raise KeyError(f"{path} has no feature matrix")
+    matrix = np.load(f"{path}/{MATRIX_FILE}", mmap_mode="r" if mmap else None)
+    return matrix, schema["matrix_columns"]
@@ -1,8 +1,20 @@
-import pandas as pd
-from src.util.logger import logger
+from __future__ import annotations
+import argparse
+import time
+from src.util.logger import configure_logging, logger
 from src.util.paths import Paths
+from src.data.columnar import ColumnStoreWriter
+from src.data.streaming import DEFAULT_CHUNK_SIZE, iter_chunks
+from src.features.build_features import process_data_pipeline
+from src.features.encoders import Vocabularies
+from src.features.feature_utils import FEATURES, LABEL
+from src.util.instrumentation import instrumented
+from src.util.lazy import lazy_import
 
+pd = lazy_import("pandas")
 
+
+@instrumented()
 def normalize_and_merge(df_talent: pd.DataFrame, df_job: pd.DataFrame) -> pd.DataFrame:
     """
     Merges the talent and job dataframes into a single dataframe.
@@ -13,23 +25,105 @@ def normalize_and_merge(df_talent: pd.DataFrame, df_job: pd.DataFrame) -> pd.Dat
     return df_merged
 
 
+def make_interim_chunk(records: list[dict]) -> pd.DataFrame:
+    """
+    Builds the interim rows (raw columns plus the normalized talent_ and job_
+    columns) of a chunk of raw records.
+
+    :param records: List of raw records with talent, job and label.
+    :return: Interim DataFrame of the chunk.
+    """
+    df = pd.DataFrame(records)
+    df_merged = normalize_and_merge(df.talent, df.job)
+    return df.merge(df_merged, left_index=True, right_index=True)
+
+
+def ingest_raw_dataset(
+    raw_path: str,
+    interim_path: str = None,
+    processed_path: str = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    engine: str = "numpy",
+    vocabularies_path: str = None,
+) -> int:
+    """
+    Streams the raw dataset (JSON array or JSON lines) chunk by chunk into the
+    interim and/or processed column stores, so memory is bounded by the chunk
+    size instead of the dataset size. The role, seniority and language
+    vocabularies are fitted along the way.
+
+    :param raw_path: Path of the raw dataset.
+    :param interim_path: Interim store directory, None to skip it.
+    :param processed_path: Processed store directory (features + label), None to skip it.
+    :param chunk_size: Records per chunk.
+    :param engine: process_data_pipeline engine for the processed store.
+    :param vocabularies_path: Path to save the fitted Vocabularies to, None to skip it.
+    :return: Number of records ingested.
+    """
+    vocabularies = Vocabularies()
+    writers = []
+    if interim_path is not None:
+        interim = ColumnStoreWriter(interim_path)
+        writers.append(interim)
+    if processed_path is not None:
+        processed = ColumnStoreWriter(processed_path, matrix_columns=FEATURES)
+        writers.append(processed)
+
+    n_rows, start = 0, time.perf_counter()
+    for records in iter_chunks(raw_path, chunk_size):
+        df = make_interim_chunk(records)
+        vocabularies.fit(df)
+        if interim_path is not None:
+            interim.append(df)
+        if processed_path is not None:
+            processed.append(
+                process_data_pipeline(
+                    df, FEATURES, LABEL, engine=engine, vocabularies=vocabularies
+                )
+            )
+        n_rows += len(df)
+        elapsed = time.perf_counter() - start
+        logger.info(f"{n_rows} rows ingested ({n_rows / elapsed:.0f} rows/s)")
+
+    for writer in writers:
+        writer.close()
+    if vocabularies_path is not None:
+        vocabularies.save(vocabularies_path)
+        logger.info(
+            f"Vocabularies saved to {vocabularies_path}: "
+            f"{len(vocabularies.roles)} roles, "
+            f"{len(vocabularies.seniorities)} seniorities, "
+            f"{len(vocabularies.languages)} languages"
+        )
+    return n_rows
+
+
 if __name__ == "__main__":
+    configure_logging()
+
+    parser = argparse.ArgumentParser(
+        description="Stream the raw dataset into the interim column store."
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument(
+        "--features",
+        action="store_true",
+        help="also build the processed dataset in the same pass",
+    )
+    args = parser.parse_args()
 
     logger.info(
         "Normalizing json dictionaries and merging them into a single dataframe."
     )
 
-    df = pd.read_json(Paths.raw_dataset_path)
-
-    logger.info(f"data shape: {df.shape}")
-
-    df_merged = normalize_and_merge(df.talent, df.job)
-    print(df_merged.head(5).T)
-    df = df.merge(df_merged, left_index=True, right_index=True)
-
-    df.to_pickle(Paths.interim_dataset_path)
+    n_rows = ingest_raw_dataset(
+        Paths.raw_dataset_path,
+        interim_path=Paths.interim_dataset_path,
+        processed_path=Paths.processed_dataset_path if args.features else None,
+        chunk_size=args.chunk_size,
+        vocabularies_path=Paths.vocabularies_path,
+    )
 
-    logger.info(f"data shape: {df.shape}")
-    logger.info(f"data shape: {df.info()}")
+    logger.info(f"data shape: ({n_rows} rows)")
 
     logger.info("dataset created!")
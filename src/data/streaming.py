@@ -0,0 +1,160 @@
+import json
+import random
+
+# Raw datasets are either a JSON array of records (data/raw/data.json) or
+# JSON lines (one record per line). Both are read incrementally, so memory
+# holds one read block plus the records of the current chunk.
+
+DEFAULT_BLOCK_SIZE = 1 << 20  # characters read at once
+DEFAULT_CHUNK_SIZE = 10_000  # records per chunk
+
+
+class _ArrayBuffer:
+    """
+    Read buffer of iter_json_array: the unread text of the current blocks.
+    """
+
+    def __init__(self, f, block_size: int) -> None:
+        self.f = f
+        self.block_size = block_size
+        self.decoder = json.JSONDecoder()
+        self.text, self.pos, self.eof = "", 0, False
+
+    def refill(self) -> None:
+        # keeps the unread text, so an element can span blocks
+        block = self.f.read(self.block_size)
+        self.eof = not block
+        self.text, self.pos = self.text[self.pos :] + block, 0
+
+    def peek(self) -> str:
+        """
+        :return: The next non-whitespace character, "" at the end of the file.
+        """
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if self.eof:
+                return ""
+            self.refill()
+
+    def expect(self, characters: str) -> str:
+        """
+        Consumes the next non-whitespace character, one of characters.
+        """
+        character = self.peek()
+        if not character:
+            raise ValueError("Unexpected end of JSON array")
+        if character not in characters:
+            raise ValueError(
+                f"Expected {' or '.join(map(repr, characters))} in JSON array, "
+                f"got {character!r}"
+            )
+        self.pos += 1
+        return character
+
+    def decode(self):
+        """
+        Decodes the element at the current position, reading more blocks until
+        it is complete.
+        """
+        if not self.peek():
+            raise ValueError("Unexpected end of JSON array")
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                value, end = None, None
+            # an element is only complete once a delimiter follows it
+            # (a number like 1.5e3 could continue in the next block)
+            if end is not None and (
+                self.eof or (end < len(self.text) and self.text[end] in ",] \t\r\n")
+            ):
+                self.pos = end
+                return value
+            if self.eof:
+                raise ValueError("Truncated JSON array element")
+            self.refill()
+
+
+def iter_json_array(f, block_size: int = DEFAULT_BLOCK_SIZE):
+    """
+    Iterates the elements of a JSON array without loading the whole file.
+
+    :param f: Text file positioned before the opening bracket.
+    :param block_size: Characters read at once.
+    :return: Generator of the decoded elements.
+    """
+    buffer = _ArrayBuffer(f, block_size)
+    if buffer.peek() != "[":
+        raise ValueError("Expected a JSON array")
+    buffer.pos += 1
+    if buffer.peek() == "]":
+        return
+    delimiter = ","
+    while delimiter == ",":
+        yield buffer.decode()
+        delimiter = buffer.expect(",]")
+
+
+def iter_records(path: str, block_size: int = DEFAULT_BLOCK_SIZE):
+    """
+    Iterates the records of a raw dataset, JSON array or JSON lines.
+
+    :param path: Path of the raw dataset.
+    :param block_size: Characters read at once (JSON arrays).
+    :return: Generator of record dictionaries.
+    """
+    with open(path, encoding="utf-8") as f:
+        first = ""
+        while True:
+            first = f.read(1)
+            if not first or not first.isspace():
+                break
+        f.seek(0)
+        if first == "[":
+            yield from iter_json_array(f, block_size)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def iter_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
+    """
+    Groups the records of a raw dataset into lists of at most chunk_size.
+
+    :param path: Path of the raw dataset.
+    :param chunk_size: Records per chunk.
+    :return: Generator of record lists.
+    """
+    chunk = []
+    for record in iter_records(path):
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def sample_records(path: str, n: int, seed: int = None) -> list[dict]:
+    """
+    Draws a uniform sample of n records in one pass (reservoir sampling).
+
+    :param path: Path of the raw dataset.
+    :param n: Sample size.
+    :param seed: Random seed.
+    :return: List of at most n records, in file order.
+    """
+    rng = random.Random(seed)
+    reservoir = []
+    for i, record in enumerate(iter_records(path)):
+        if i < n:
+            reservoir.append((i, record))
+        else:
+            j = rng.randint(0, i)
+            if j < n:
+                reservoir[j] = (i, record)
+    return [record for _, record in sorted(reservoir, key=lambda item: item[0])]
@@ -0,0 +1,122 @@
+import random
+from src.features.encoders import DEGREE_SCALE, PROFICIENCY_SCALE
+
+# Value pools following data/raw/data.json
+ROLES = [
+    "1st-2nd-3rd-level-support",
+    "backend-developer",
+    "business-development-manager",
+    "c-c-developer",
+    "c-net-developer",
+    "cloud-engineer",
+    "cmo-or-head-of-marketing",
+    "consulting",
+    "copywriter",
+    "cto",
+    "customer-success-manager",
+    "data-analyst",
+    "data-engineer",
+    "data-scientist",
+    "database-administrator",
+    "devops-engineer",
+    "engineering-manager",
+    "frontend-developer",
+    "full-stack-developer",
+    "java-developer",
+    "key-account-manager",
+    "machine-learning-engineer",
+    "marketing-team-lead",
+    "network-engineer",
+    "online-marketing-manager",
+    "performance-marketing-manager",
+    "php-developer",
+    "presales-manager",
+    "product-manager",
+    "product-owner",
+    "project-manager",
+    "qa-engineer",
+    "sales-engineer",
+    "sales-manager",
+    "sales-team-lead",
+    "scrum-master-agile-coach",
+    "security",
+    "seo-sea-manager",
+    "site-reliability-engineer",
+    "social-media-marketing-manager",
+    "software-architect",
+    "system-administrator",
+    "system-engineer",
+    "tech-lead",
+    "ui-ux-designer",
+    "ux-researcher",
+]
+SENIORITIES = ["none", "junior", "midlevel", "senior"]
+DEGREES = list(DEGREE_SCALE)
+RATINGS = list(PROFICIENCY_SCALE)
+LANGUAGES = [
+    "German",
+    "English",
+    "French",
+    "Spanish",
+    "Russian",
+    "Turkish",
+    "Arabic",
+    "Persian",
+    "Swedish",
+]
+
+
+def generate_talent(rng: random.Random) -> dict:
+    """
+    Generates a random talent dictionary with the raw dataset schema.
+
+    :param rng: Random number generator.
+    :return: Talent dictionary.
+    """
+    languages = rng.sample(LANGUAGES, rng.randint(1, 4))
+    return {
+        "languages": [
+            {"rating": rng.choice(RATINGS), "title": title} for title in languages
+        ],
+        "job_roles": rng.sample(ROLES, rng.randint(1, 5)),
+        "seniority": rng.choice(SENIORITIES),
+        "salary_expectation": rng.randrange(30_000, 140_000, 10),
+        "degree": rng.choice(DEGREES),
+    }
+
+
+def generate_job(rng: random.Random) -> dict:
+    """
+    Generates a random job dictionary with the raw dataset schema.
+
+    :param rng: Random number generator.
+    :return: Job dictionary.
+    """
+    languages = rng.sample(LANGUAGES[:3], rng.randint(1, 2))
+    return {
+        "languages": [
+            {"title": title, "rating": rng.choice(RATINGS), "must_have": i == 0}
+            for i, title in enumerate(languages)
+        ],
+        "job_roles": rng.sample(ROLES, rng.randint(1, 2)),
+        "seniorities": rng.sample(SENIORITIES[1:], rng.randint(1, 2)),
+        "max_salary": rng.randrange(40_000, 120_000, 1_000),
+        "min_degree": rng.choice(DEGREES[:4]),
+    }
+
+
+def generate_profiles(
+    n_talents: int, n_jobs: int, seed: int = 0
+) -> tuple[list[dict], list[dict]]:
+    """
+    Generates reproducible synthetic talents and jobs.
+
+    :param n_talents: Number of talents.
+    :param n_jobs: Number of jobs.
+    :param seed: Random seed.
+    :return: Tuple of two lists - talents and jobs.
+    """
+    rng = random.Random(seed)
+    talents = [generate_talent(rng) for _ in range(n_talents)]
+    jobs = [generate_job(rng) for _ in range(n_jobs)]
+    return talents, jobs
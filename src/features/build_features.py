@@ -1,6 +1,14 @@
-import pandas as pd
+from __future__ import annotations
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 from src.util.paths import Paths
-from src.util.logger import logger
+from src.util.logger import configure_logging, logger
+from src.util.instrumentation import instrumented
+from src.data.columnar import ColumnStoreWriter, read_columns, read_schema
 from src.features.feature_utils import (
     append_match_ratio,
     append_hit,
@@ -13,16 +21,65 @@ from src.features.feature_utils import (
     append_required_languages,
     append_of_rating_matches,
     append_skill_match_ratio,
+    calculate_match_ratio,
+    calculate_hit,
+    calculate_skill_diff,
+    degree_level_comparison,
+    degree_level_match,
+    calculate_salary_expectation,
+    calculate_matched_languages_ratio,
+    calculate_required_languages,
+    calculate_rating_matches_ratio,
     FEATURES,
     LABEL,
 )  # if this was writen as a class the import would be more elegant for sure
+from src.features.encoders import DEGREE_ENCODER, Vocabularies, load_vocabularies
+from src.features.encoding import (
+    TalentEncoding,
+    JobEncoding,
+    compute_pair_features,
+    compute_paired_features,
+)
+from src.features.vectorized_utils import (
+    compute_set_features,
+    compute_hit,
+    compute_degree_features,
+    compute_salary_features,
+    compute_language_features,
+)
+from src.util.lazy import lazy_import
 
+pd = lazy_import("pandas")
 
-def process_data_pipeline(df, features, label, ignore_label=False):
+ENGINES = ("pandas", "numpy")
+DEFAULT_FEATURE_CHUNK_SIZE = 50_000  # rows per feature build chunk
+
+
+@instrumented()
+def process_data_pipeline(
+    df, features, label, ignore_label=False, engine="pandas", vocabularies=None
+):
+    """
+    Computes the model features for a merged talent/job dataframe.
+
+    :param df: DataFrame with the prefixed talent_ and job_ columns.
+    :param features: List of feature columns to keep.
+    :param label: Name of the label column.
+    :param ignore_label: Whether to drop the label (no label at inference time).
+    :param engine: "pandas" for the row-wise apply path, "numpy" for the
+        vectorized path. Both produce the same output.
+    :param vocabularies: Fitted Vocabularies the numpy path encodes the roles,
+        seniorities and languages with (not modified), fresh ones by default.
+    :return: DataFrame with the selected features (and label).
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
     if ignore_label:
         columns_to_keep = features
     else:
         columns_to_keep = features + [label]
+    if engine == "numpy":
+        return process_data_pipeline_numpy(df, columns_to_keep, label, vocabularies)
     df = append_match_ratio(df, "talent_job_roles", "job_job_roles")
     df = append_hit(df, "talent_seniority", "job_seniorities")
     df = append_skill_diff(df, "talent_job_roles", "job_job_roles")
@@ -49,17 +106,261 @@ def process_data_pipeline(df, features, label, ignore_label=False):
     return df
 
 
+def process_data_pipeline_numpy(df, columns_to_keep, label, vocabularies=None):
+    """
+    Vectorized version of process_data_pipeline: every feature is computed on
+    whole columns with numpy instead of df.apply(axis=1).
+
+    :param df: DataFrame with the prefixed talent_ and job_ columns.
+    :param columns_to_keep: Feature columns (and optionally label) to return.
+    :param label: Name of the label column.
+    :param vocabularies: Fitted Vocabularies (copied before being extended).
+    :return: DataFrame with the selected features (and label).
+    """
+    vocabularies = vocabularies.copy() if vocabularies is not None else Vocabularies()
+    columns = {}
+    columns.update(
+        compute_set_features(
+            df["talent_job_roles"], df["job_job_roles"], vocabularies.roles
+        )
+    )
+    columns["seniority_match"] = compute_hit(
+        df["talent_seniority"], df["job_seniorities"], vocabularies.seniorities
+    )
+    columns.update(
+        compute_salary_features(df["talent_salary_expectation"], df["job_max_salary"])
+    )
+    columns.update(compute_degree_features(df["talent_degree"], df["job_min_degree"]))
+    columns.update(
+        compute_language_features(
+            df["talent_languages"], df["job_languages"], vocabularies.languages
+        )
+    )
+    if label in columns_to_keep:
+        columns[label] = df[label].astype(int).to_numpy()
+
+    return pd.DataFrame(
+        {column: columns[column] for column in columns_to_keep}, index=df.index
+    )
+
+
+@instrumented(rows=lambda talents, jobs, features: len(talents) * len(jobs))
+def process_encoded_pairs(
+    talents: TalentEncoding, jobs: JobEncoding, features: list[str]
+) -> pd.DataFrame:
+    """
+    Computes the features of every talent x job pair from per-entity encodings.
+    Rows are ordered talent-major, like itertools.product(talents, jobs).
+
+    :param talents: Encoded talents.
+    :param jobs: Encoded jobs.
+    :param features: List of feature columns to return.
+    :return: DataFrame with one row per pair.
+    """
+    columns = compute_pair_features(talents, jobs)
+    return pd.DataFrame({feature: columns[feature].ravel() for feature in features})
+
+
+@instrumented(rows=lambda talents, jobs, talent_ids, *args: len(talent_ids))
+def process_encoded_candidates(
+    talents: TalentEncoding,
+    jobs: JobEncoding,
+    talent_ids: np.ndarray,
+    job_ids: np.ndarray,
+    features: list[str],
+) -> pd.DataFrame:
+    """
+    Computes the features of selected talent/job pairs from per-entity encodings.
+
+    :param talents: Encoded talents.
+    :param jobs: Encoded jobs.
+    :param talent_ids: Talent index of every pair.
+    :param job_ids: Job index of every pair.
+    :param features: List of feature columns to return.
+    :return: DataFrame with one row per pair, in the given order.
+    """
+    columns = compute_paired_features(talents.take(talent_ids), jobs.take(job_ids))
+    return pd.DataFrame({feature: columns[feature] for feature in features})
+
+
+def process_pair(
+    talent: dict, job: dict, features: list[str], out: np.ndarray = None
+) -> np.ndarray:
+    """
+    Computes the features of a single talent/job pair straight from the dicts,
+    calling the same row functions as process_data_pipeline (no DataFrame).
+
+    :param talent: Dictionary containing talent features.
+    :param job: Dictionary containing job features.
+    :param features: List of features, in output order.
+    :param out: Optional preallocated float array of len(features) to fill.
+    :return: Array of feature values.
+    """
+    x = {f"talent_{key}": value for key, value in talent.items()}
+    x.update({f"job_{key}": value for key, value in job.items()})
+    x["talent_degree_scaled"] = DEGREE_ENCODER.encode(x["talent_degree"])
+    x["job_min_degree_scaled"] = DEGREE_ENCODER.encode(x["job_min_degree"])
+
+    skill_diff_talent, skill_diff_job = calculate_skill_diff(
+        x, "talent_job_roles", "job_job_roles"
+    )
+    delta, over_budget = calculate_salary_expectation(
+        x, "talent_salary_expectation", "job_max_salary"
+    )
+    values = {
+        "skill_match_ratio": calculate_match_ratio(
+            x, "talent_job_roles", "job_job_roles"
+        ),
+        "seniority_match": calculate_hit(x, "talent_seniority", "job_seniorities"),
+        "skill_diff_talent": skill_diff_talent,
+        "skill_diff_job": skill_diff_job,
+        "salary_expectation_delta": delta,
+        "salary_expectation_over_budget": over_budget,
+        "degree_level_matched": degree_level_match(
+            x, "talent_degree_scaled", "job_min_degree_scaled"
+        ),
+        "degree_level_diff": degree_level_comparison(
+            x, "talent_degree_scaled", "job_min_degree_scaled"
+        ),
+        "language_match_ratio": calculate_matched_languages_ratio(
+            x, "talent_languages", "job_languages"
+        ),
+        "required_languages": calculate_required_languages(x, "job_languages"),
+        "Language_rating_match_ratio": calculate_rating_matches_ratio(
+            x, "talent_languages", "job_languages"
+        ),
+    }
+    if out is None:
+        out = np.empty(len(features), dtype=np.float64)
+    for i, feature in enumerate(features):
+        out[i] = values[feature]
+    return out
+
+
+def interim_columns(path: str) -> list[str]:
+    """
+    :return: The normalized talent_/job_ columns and the label of an interim store
+        (the raw talent/job dicts are not needed for the features).
+    """
+    return [
+        column
+        for column in read_schema(path)["columns"]
+        if column.startswith(("talent_", "job_")) or column == LABEL
+    ]
+
+
+def process_interim_chunk(
+    interim_path: str,
+    start: int,
+    stop: int,
+    engine: str,
+    vocabularies: Vocabularies = None,
+) -> pd.DataFrame:
+    """
+    Reads rows [start, stop) of the interim store and computes their features.
+    Runs in the worker processes of build_processed_dataset.
+    """
+    df = read_columns(
+        interim_path, interim_columns(interim_path), rows=slice(start, stop)
+    )
+    return process_data_pipeline(
+        df, FEATURES, LABEL, engine=engine, vocabularies=vocabularies
+    )
+
+
+def build_processed_dataset(
+    interim_path: str,
+    processed_path: str,
+    n_workers: int = 1,
+    chunk_size: int = DEFAULT_FEATURE_CHUNK_SIZE,
+    engine: str = "pandas",
+    vocabularies: Vocabularies = None,
+) -> int:
+    """
+    Computes the features of the interim store chunk by chunk, over a process pool,
+    and writes them to the processed store. Chunks are written in row order, so the
+    output is the same as a single process_data_pipeline call whatever the number
+    of workers.
+
+    :param interim_path: Interim store directory.
+    :param processed_path: Processed store directory.
+    :param n_workers: Worker processes, 1 computes in this process.
+    :param chunk_size: Rows per chunk.
+    :param engine: process_data_pipeline engine.
+    :param vocabularies: Fitted Vocabularies of the numpy engine.
+    :return: Number of rows processed.
+    """
+    n_rows = read_schema(interim_path)["n_rows"]
+    chunks = [
+        (start, min(start + chunk_size, n_rows))
+        for start in range(0, n_rows, chunk_size)
+    ]
+    start_time = time.perf_counter()
+    done = 0
+
+    def log_progress(df: pd.DataFrame) -> None:
+        nonlocal done
+        done += len(df)
+        elapsed = time.perf_counter() - start_time
+        logger.info(
+            f"{done}/{n_rows} rows ({done / max(n_rows, 1):.0%}, "
+            f"{done / elapsed:.0f} rows/s)"
+        )
+
+    with ColumnStoreWriter(processed_path, matrix_columns=FEATURES) as writer:
+        if n_workers <= 1:
+            for start, stop in chunks:
+                df = process_interim_chunk(
+                    interim_path, start, stop, engine, vocabularies
+                )
+                writer.append(df)
+                log_progress(df)
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                # at most two chunks per worker in flight, to bound memory
+                pending = deque()
+                for start, stop in chunks:
+                    pending.append(
+                        executor.submit(
+                            process_interim_chunk,
+                            interim_path,
+                            start,
+                            stop,
+                            engine,
+                            vocabularies,
+                        )
+                    )
+                    if len(pending) >= 2 * n_workers:
+                        df = pending.popleft().result()
+                        writer.append(df)
+                        log_progress(df)
+                while pending:
+                    df = pending.popleft().result()
+                    writer.append(df)
+                    log_progress(df)
+    return n_rows
+
+
 if __name__ == "__main__":
+    configure_logging()
 
-    logger.info("Loading interim dataset...")
-    df = pd.read_pickle(Paths.interim_dataset_path)
-    logger.info(f"data shape: {df.shape}")
-    df = process_data_pipeline(df, FEATURES, LABEL)
-    logger.info(f"data shape: {df.shape}")
+    parser = argparse.ArgumentParser(description="Build the processed dataset.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_FEATURE_CHUNK_SIZE)
+    parser.add_argument("--engine", choices=ENGINES, default="numpy")
+    args = parser.parse_args()
 
-    logger.info("Saving processed dataset to disk.")
-    df.to_csv(Paths.processed_dataset_path, index=False)
+    logger.info("Building the processed dataset from the interim dataset...")
+    n_rows = build_processed_dataset(
+        Paths.interim_dataset_path,
+        Paths.processed_dataset_path,
+        n_workers=args.workers,
+        chunk_size=args.chunk_size,
+        engine=args.engine,
+        vocabularies=load_vocabularies(Paths.vocabularies_path),
+    )
+    logger.info(f"data shape: ({n_rows}, {len(FEATURES) + 1})")
 
-    logger.info(f"the dataset contains the following features: {df.columns.tolist()}")
+    logger.info(f"the dataset contains the following features: {FEATURES + [LABEL]}")
 
     logger.info("done!")
@@ -0,0 +1,233 @@
+from __future__ import annotations
+import itertools
+import json
+import os
+import numpy as np
+from src.util.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+# Shared encoders of the categorical profile fields. Ordinal fields (degrees,
+# CEFR ratings) map to fixed scales, values outside a scale to its unknown number.
+# Roles, seniorities and language titles are interned into Vocabularies fitted on
+# the training data (make_dataset.py) and saved next to the model. A value unseen
+# at fitting time gets the next free id of a per-call copy, so equal values still
+# compare equal and the features do not change.
+
+# Map degrees to numeric values with 'apprenticeship' added
+DEGREE_SCALE = {
+    "none": 0,
+    "apprenticeship": 1,
+    "associate": 2,
+    "bachelor": 3,
+    "master": 4,
+    "doctorate": 5,
+}
+
+PROFICIENCY_SCALE = {
+    "A1": 1,
+    "A2": 2,
+    "B1": 3,
+    "B2": 4,
+    "C1": 5,
+    "C2": 6,
+}
+
+VOCABULARIES_FORMAT_VERSION = 1
+VOCABULARY_NAMES = ("roles", "seniorities", "languages")
+
+
+class ScaleEncoder:
+    """
+    Maps the values of an ordinal scale to their numbers.
+    """
+
+    def __init__(self, scale: dict, unknown: int) -> None:
+        """
+        :param scale: Mapping of known values to numbers.
+        :param unknown: Number of the values outside the scale.
+        """
+        self.scale = dict(scale)
+        self.unknown = unknown
+        self.values = {number: value for value, number in self.scale.items()}
+        self.index = None  # pandas Index of the scale values, built on first use
+        self.table = np.append(
+            np.fromiter(self.scale.values(), dtype=np.int64), unknown
+        )
+
+    def encode(self, value) -> int:
+        return self.scale.get(value, self.unknown)
+
+    def encode_many(self, values) -> np.ndarray:
+        """
+        :param values: Iterable of values.
+        :return: int64 array of their numbers.
+        """
+        if self.index is None:
+            self.index = pd.Index(list(self.scale), dtype=object)
+        positions = self.index.get_indexer(pd.Index(list(values), dtype=object))
+        return self.table[positions]  # position -1 picks the unknown number
+
+    def decode(self, number: int):
+        """
+        :return: Value of a number, None for the unknown number.
+        """
+        return self.values.get(number)
+
+
+# -1 for unknown degrees, 0 for unknown ratings
+DEGREE_ENCODER = ScaleEncoder(DEGREE_SCALE, unknown=-1)
+PROFICIENCY_ENCODER = ScaleEncoder(PROFICIENCY_SCALE, unknown=0)
+
+
+class Vocabulary:
+    """
+    Interns categorical values into consecutive integer ids.
+    """
+
+    def __init__(self, values=()) -> None:
+        self.ids = {}
+        self.values = []  # id -> value
+        self._index = None  # pandas Index of the values, see encode_many
+        for value in values:
+            self.add(value)
+
+    def add(self, value) -> int:
+        """
+        Returns the id of a value, assigning the next free id to unseen values.
+        """
+        i = self.ids.setdefault(value, len(self.ids))
+        if i == len(self.values):
+            self.values.append(value)
+        return i
+
+    def encode_many(self, values) -> np.ndarray:
+        """
+        Vectorized add: ids of many values, unseen values getting the next free
+        ids in order of first appearance.
+
+        :param values: Iterable of values.
+        :return: int64 array of ids.
+        """
+        values = pd.Index(list(values), dtype=object)
+        ids = self.index().get_indexer(values)
+        unseen = ids < 0
+        if unseen.any():
+            for value in pd.unique(values[unseen]):
+                self.add(value)
+            ids[unseen] = self.index().get_indexer(values[unseen])
+        return ids.astype(np.int64)
+
+    def index(self):
+        if self._index is None or len(self._index) != len(self.values):
+            self._index = pd.Index(self.values, dtype=object)
+        return self._index
+
+    def copy(self) -> "Vocabulary":
+        vocabulary = Vocabulary()
+        vocabulary.ids = dict(self.ids)
+        vocabulary.values = list(self.values)
+        vocabulary._index = self._index
+        return vocabulary
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+class Vocabularies:
+    """
+    Vocabularies shared by the talent and job encodings.
+    """
+
+    def __init__(self) -> None:
+        self.roles = Vocabulary()
+        self.seniorities = Vocabulary()
+        self.languages = Vocabulary()
+
+    def fit(self, df: pd.DataFrame) -> "Vocabularies":
+        """
+        Adds the values of a merged talent/job frame (talent_ and job_ columns).
+
+        :param df: DataFrame with the prefixed talent_ and job_ columns.
+        :return: self.
+        """
+        chain = itertools.chain.from_iterable
+        self.roles.encode_many(
+            itertools.chain(chain(df["talent_job_roles"]), chain(df["job_job_roles"]))
+        )
+        self.seniorities.encode_many(
+            itertools.chain(df["talent_seniority"], chain(df["job_seniorities"]))
+        )
+        self.languages.encode_many(
+            lang["title"]
+            for lang in itertools.chain(
+                chain(df["talent_languages"]), chain(df["job_languages"])
+            )
+        )
+        return self
+
+    def copy(self) -> "Vocabularies":
+        """
+        :return: Vocabularies to extend without changing these ones.
+        """
+        vocabularies = Vocabularies()
+        for name in VOCABULARY_NAMES:
+            setattr(vocabularies, name, getattr(self, name).copy())
+        return vocabularies
+
+    def save(self, path: str) -> None:
+        """
+        Saves the vocabularies and the ordinal scales as JSON.
+
+        :param path: Path of the .json file.
+        """
+        data = {
+            "format_version": VOCABULARIES_FORMAT_VERSION,
+            "degree_scale": DEGREE_SCALE,
+            "proficiency_scale": PROFICIENCY_SCALE,
+            **{name: getattr(self, name).values for name in VOCABULARY_NAMES},
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "Vocabularies":
+        """
+        Loads vocabularies saved with save, checking that they were fitted with the
+        ordinal scales of this code.
+
+        :param path: Path of the .json file.
+        :return: Vocabularies.
+        """
+        with open(path) as f:
+            data = json.load(f)
+        version = data.get("format_version")
+        if version != VOCABULARIES_FORMAT_VERSION:
+            raise ValueError(f"Unsupported vocabularies format version {version}")
+        if (data["degree_scale"], data["proficiency_scale"]) != (
+            DEGREE_SCALE,
+            PROFICIENCY_SCALE,
+        ):
+            raise ValueError(f"{path} was saved with other degree or rating scales")
+        vocabularies = cls()
+        for name in VOCABULARY_NAMES:
+            setattr(vocabularies, name, Vocabulary(data[name]))
+        return vocabularies
+
+
+def vocabularies_path(model_path: str) -> str:
+    """
+    :param model_path: Path of the joblib model or of its exported scorer.
+    :return: Path of the vocabularies saved next to the model.
+    """
+    return f"{os.path.splitext(model_path)[0]}.vocab.json"
+
+
+def load_vocabularies(path: str) -> Vocabularies:
+    """
+    :return: The vocabularies saved at path, empty ones if there is no such file.
+    """
+    if not os.path.exists(path):
+        return Vocabularies()
+    return Vocabularies.load(path)
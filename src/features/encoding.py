@@ -0,0 +1,440 @@
+from dataclasses import dataclass
+import numpy as np
+from src.features.encoders import (
+    DEGREE_ENCODER,
+    PROFICIENCY_ENCODER,
+    PROFICIENCY_SCALE,
+    Vocabularies,
+    Vocabulary,
+)
+from src.util.instrumentation import instrumented
+
+# Every talent and every job is encoded once into arrays (role incidence,
+# seniority ids, degree ordinal, salary, per-language rating levels). Pairwise
+# features are then computed for a talent block x job block by broadcasting,
+# so per-entity work scales with N + M instead of N x M.
+# Languages are fixed-width int8 vectors over the language vocabulary holding
+# the CEFR ordinal (A1-C2 -> 1-6, 0 for unknown ratings) of every listed
+# language. A job lists a language more than once in rare cases; its vectors
+# have one layer per occurrence so every entry keeps counting.
+# Role incidence matrices of wide vocabularies are scipy.sparse CSR matrices:
+# the shared counts of a block are one sparse product, and memory scales with
+# the number of listed roles instead of the vocabulary size. scipy is imported
+# by the sparse code paths only.
+
+# CEFR levels a requirement can have, 0 being an unknown rating
+RATING_LEVELS = np.arange(max(PROFICIENCY_SCALE.values()) + 1, dtype=np.int8)
+# talent level of the languages the talent does not list, offered as "A1"
+NOT_LISTED = -1
+# job level of the languages (or layers) the job does not require
+NOT_REQUIRED = np.iinfo(np.int8).max
+# vocabulary size from which incidence matrices are sparse by default; below it
+# the dense matrix product is as fast
+SPARSE_MIN_WIDTH = 128
+
+
+@dataclass
+class TalentEncoding:
+    roles: np.ndarray  # (n, n_roles) uint8 (or sparse) incidence of distinct roles
+    role_count: np.ndarray  # number of distinct roles
+    seniority: np.ndarray  # seniority id
+    degree: np.ndarray  # DEGREE_SCALE ordinal, -1 if unknown
+    salary: np.ndarray  # salary expectation
+    # (n, n_languages) int8 rating, NOT_LISTED for the languages not listed
+    language_levels: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.degree)
+
+    def take(self, indices) -> "TalentEncoding":
+        """
+        Selects a subset (index array or slice) of the encoded talents.
+        """
+        return TalentEncoding(
+            **{name: value[indices] for name, value in vars(self).items()}
+        )
+
+
+@dataclass
+class JobEncoding:
+    roles: np.ndarray  # (m, n_roles) uint8 (or sparse) incidence of distinct roles
+    role_count: np.ndarray  # number of distinct roles
+    seniorities: np.ndarray  # (m, n_seniorities) uint8 incidence
+    degree: np.ndarray  # DEGREE_SCALE ordinal, -1 if unknown
+    salary: np.ndarray  # max salary
+    # (m, n_layers, n_languages) int8 required rating, NOT_REQUIRED where absent;
+    # layer d holds the (d + 1)-th entry of a language
+    language_levels: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.degree)
+
+    def take(self, indices) -> "JobEncoding":
+        """
+        Selects a subset (index array or slice) of the encoded jobs.
+        """
+        return JobEncoding(
+            **{name: value[indices] for name, value in vars(self).items()}
+        )
+
+
+def is_sparse(width: int, sparse: bool = None) -> bool:
+    """
+    :param width: Vocabulary size.
+    :param sparse: Forced choice, None to decide from the width.
+    :return: Whether incidence matrices of this width are sparse.
+    """
+    return sparse if sparse is not None else width >= SPARSE_MIN_WIDTH
+
+
+def incidence_matrix(
+    id_lists: list[list[int]], width: int, sparse: bool = False
+) -> np.ndarray:
+    """
+    Builds a 0/1 matrix with one row per id list (distinct ids).
+
+    :param id_lists: List of id lists.
+    :param width: Number of columns (vocabulary size).
+    :param sparse: Build a scipy.sparse CSR matrix (int32) instead of a dense one.
+    :return: uint8 matrix of shape (len(id_lists), width).
+    """
+    lengths = np.fromiter(map(len, id_lists), dtype=np.int64, count=len(id_lists))
+    rows = np.repeat(np.arange(len(id_lists)), lengths)
+    columns = np.fromiter(
+        (i for ids in id_lists for i in ids), dtype=np.int64, count=lengths.sum()
+    )
+    if sparse:
+        import scipy.sparse
+
+        return scipy.sparse.csr_matrix(
+            (np.ones(len(columns), dtype=np.int32), (rows, columns)),
+            shape=(len(id_lists), width),
+        )
+    matrix = np.zeros((len(id_lists), width), dtype=np.uint8)
+    matrix[rows, columns] = 1
+    return matrix
+
+
+def talent_language_levels(
+    rows: np.ndarray, language_ids: np.ndarray, ratings: np.ndarray, n: int, width: int
+) -> np.ndarray:
+    """
+    Builds the talent language vectors from flat language entries. Later entries
+    of the same language win, like the dict in feature_utils.
+
+    :param rows: Talent row of every entry.
+    :param language_ids: Language id of every entry.
+    :param ratings: Rating ordinal of every entry.
+    :param n: Number of talents.
+    :param width: Number of languages.
+    :return: (n, width) int8 levels, NOT_LISTED for the languages not listed.
+    """
+    levels = np.full((n, width), NOT_LISTED, dtype=np.int8)
+    keys = (rows * width + language_ids)[::-1]
+    _, last = np.unique(keys, return_index=True)
+    last = len(keys) - 1 - last
+    levels[rows[last], language_ids[last]] = ratings[last]
+    return levels
+
+
+def job_language_levels(
+    rows: np.ndarray, language_ids: np.ndarray, ratings: np.ndarray, m: int, width: int
+) -> np.ndarray:
+    """
+    Builds the job language vectors from flat language entries, the repeated
+    entries of a language going to the next layers.
+
+    :param rows: Job row of every entry.
+    :param language_ids: Language id of every entry.
+    :param ratings: Rating ordinal of every entry.
+    :param m: Number of jobs.
+    :param width: Number of languages.
+    :return: (m, n_layers, width) int8 levels (n_layers >= 1), NOT_REQUIRED
+        where there is no entry.
+    """
+    keys = rows * width + language_ids
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    positions = np.arange(len(keys))
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    layers = np.empty(len(keys), dtype=np.int64)
+    layers[order] = positions - np.maximum.accumulate(np.where(first, positions, 0))
+
+    n_layers = int(layers.max()) + 1 if len(layers) else 1
+    levels = np.full((m, n_layers, width), NOT_REQUIRED, dtype=np.int8)
+    levels[rows, layers, language_ids] = ratings
+    return levels
+
+
+def offered_levels(talent_levels: np.ndarray) -> np.ndarray:
+    """
+    :return: The rating a talent offers per language, "A1" for the languages not
+        listed.
+    """
+    return np.where(
+        talent_levels == NOT_LISTED, np.int8(PROFICIENCY_SCALE["A1"]), talent_levels
+    )
+
+
+def language_counts(job_levels: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    :return: Tuple of the number of distinct required languages and the number of
+        language entries of every job.
+    """
+    required = job_levels != NOT_REQUIRED
+    return (
+        required[:, 0].sum(axis=1, dtype=np.int64),
+        required.sum(axis=(1, 2), dtype=np.int64),
+    )
+
+
+def language_entries(
+    profiles: list[dict], languages: Vocabulary
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Flattens the language lists of talent or job dictionaries.
+
+    :param profiles: List of dictionaries with a "languages" list.
+    :param languages: Language vocabulary to extend.
+    :return: Tuple of row, language id and rating ordinal of every entry.
+    """
+    entries = [(row, lang) for row, p in enumerate(profiles) for lang in p["languages"]]
+    rows = np.fromiter((row for row, _ in entries), np.int64, len(entries))
+    language_ids = np.fromiter(
+        (languages.add(lang["title"]) for _, lang in entries), np.int64, len(entries)
+    )
+    ratings = np.fromiter(
+        (PROFICIENCY_ENCODER.encode(lang["rating"]) for _, lang in entries),
+        np.int8,
+        len(entries),
+    )
+    return rows, language_ids, ratings
+
+
+@instrumented(rows=lambda talents, jobs, *args, **kwargs: len(talents) + len(jobs))
+def encode_profiles(
+    talents: list[dict],
+    jobs: list[dict],
+    vocabularies: Vocabularies = None,
+    sparse: bool = None,
+) -> tuple[TalentEncoding, JobEncoding]:
+    """
+    Encodes each talent and each job once.
+
+    :param talents: List of talent dictionaries.
+    :param jobs: List of job dictionaries.
+    :param vocabularies: Vocabularies to extend, a fresh set by default.
+    :param sparse: Sparse role incidence matrices, None for sparse ones from
+        SPARSE_MIN_WIDTH roles on.
+    :return: Tuple of talent and job encodings over the same vocabularies.
+    """
+    vocabularies = vocabularies or Vocabularies()
+    roles, languages = vocabularies.roles, vocabularies.languages
+
+    talent_roles = [{roles.add(r) for r in t["job_roles"]} for t in talents]
+    talent_seniority = [vocabularies.seniorities.add(t["seniority"]) for t in talents]
+    talent_languages = language_entries(talents, languages)
+
+    job_roles = [{roles.add(r) for r in j["job_roles"]} for j in jobs]
+    job_seniorities = [
+        {vocabularies.seniorities.add(s) for s in j["seniorities"]} for j in jobs
+    ]
+    job_languages = language_entries(jobs, languages)
+
+    sparse_roles = is_sparse(len(roles), sparse)
+    talent_encoding = TalentEncoding(
+        roles=incidence_matrix(talent_roles, len(roles), sparse_roles),
+        role_count=np.fromiter(map(len, talent_roles), np.int64, len(talents)),
+        seniority=np.array(talent_seniority, dtype=np.int64),
+        degree=np.array(
+            [DEGREE_ENCODER.encode(t["degree"]) for t in talents], np.int64
+        ),
+        salary=np.array([t["salary_expectation"] for t in talents], np.float64),
+        language_levels=talent_language_levels(
+            *talent_languages, len(talents), len(languages)
+        ),
+    )
+    job_encoding = JobEncoding(
+        roles=incidence_matrix(job_roles, len(roles), sparse_roles),
+        role_count=np.fromiter(map(len, job_roles), np.int64, len(jobs)),
+        seniorities=incidence_matrix(job_seniorities, len(vocabularies.seniorities)),
+        degree=np.array(
+            [DEGREE_ENCODER.encode(j["min_degree"]) for j in jobs], np.int64
+        ),
+        salary=np.array([j["max_salary"] for j in jobs], np.float64),
+        language_levels=job_language_levels(*job_languages, len(jobs), len(languages)),
+    )
+    return talent_encoding, job_encoding
+
+
+def overlap(talent_matrix: np.ndarray, job_matrix: np.ndarray) -> np.ndarray:
+    """
+    Counts shared columns for every talent x job pair with one matrix product,
+    a sparse one if either matrix is sparse.
+    """
+    if isinstance(talent_matrix, np.ndarray) and isinstance(job_matrix, np.ndarray):
+        counts = talent_matrix.astype(np.float32) @ job_matrix.astype(np.float32).T
+        return counts.astype(np.int64)
+    import scipy.sparse
+
+    counts = scipy.sparse.csr_matrix(talent_matrix, dtype=np.int32) @ (
+        scipy.sparse.csr_matrix(job_matrix, dtype=np.int32).T
+    )
+    return counts.toarray().astype(np.int64)
+
+
+def row_counts(matrix: np.ndarray) -> np.ndarray:
+    """
+    :return: int64 number of ones in every row of an incidence matrix.
+    """
+    if isinstance(matrix, np.ndarray):
+        return matrix.sum(axis=1, dtype=np.int64)
+    return np.diff(matrix.indptr).astype(np.int64)
+
+
+def paired_overlap(talent_matrix: np.ndarray, job_matrix: np.ndarray) -> np.ndarray:
+    """
+    Counts shared columns of row-aligned talent/job pairs.
+    """
+    if isinstance(talent_matrix, np.ndarray) and isinstance(job_matrix, np.ndarray):
+        return (talent_matrix & job_matrix).sum(axis=1, dtype=np.int64)
+    import scipy.sparse
+
+    shared = scipy.sparse.csr_matrix(talent_matrix).multiply(job_matrix)
+    return np.asarray(shared.sum(axis=1), dtype=np.int64).ravel()
+
+
+def rating_matches(offered: np.ndarray, job_levels: np.ndarray) -> np.ndarray:
+    """
+    Counts the job language entries whose rating the talent reaches, i.e.
+    offered >= required summed over the entries, for every talent x job pair.
+    The comparison runs once per talent against the RATING_LEVELS of the
+    languages the block requires, and one matrix product with the number of
+    entries per (language, level) of every job sums it up.
+
+    :param offered: (n, n_languages) offered ratings, see offered_levels.
+    :param job_levels: (m, n_layers, n_languages) job language levels.
+    :return: (n, m) int64 counts.
+    """
+    required = job_levels != NOT_REQUIRED
+    columns = np.flatnonzero(required.any(axis=(0, 1)))
+    required = required[:, :, columns]
+    reached = offered[:, columns, None] >= RATING_LEVELS[None, None, :]
+
+    n_levels, width = len(RATING_LEVELS), len(columns)
+    jobs, _, column = np.nonzero(required)
+    levels = job_levels[:, :, columns][required].astype(np.int64)
+    entries = np.bincount(
+        (jobs * width + column) * n_levels + levels,
+        minlength=len(job_levels) * width * n_levels,
+    ).reshape(len(job_levels), width * n_levels)
+    return overlap(reached.reshape(len(offered), -1), entries)
+
+
+def ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """
+    Broadcasts numerator / denominator over the job axis, 0 where it is empty.
+    """
+    denominator = np.broadcast_to(denominator, numerator.shape)
+    out = np.zeros(numerator.shape, dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+@instrumented(rows=lambda talents, jobs: len(talents) * len(jobs))
+def compute_pair_features(
+    talents: TalentEncoding, jobs: JobEncoding
+) -> dict[str, np.ndarray]:
+    """
+    Computes the FEATURES for every talent x job pair of two encoded blocks.
+
+    :param talents: Encoded talents (n).
+    :param jobs: Encoded jobs (m).
+    :return: Dictionary of (n, m) feature arrays.
+    """
+    shape = (len(talents), len(jobs))
+    shared_roles = overlap(talents.roles, jobs.roles)
+    listed = talents.language_levels != NOT_LISTED
+    shared_languages = overlap(listed, jobs.language_levels[:, 0] != NOT_REQUIRED)
+    language_count, required_languages = language_counts(jobs.language_levels)
+    matches = rating_matches(
+        offered_levels(talents.language_levels), jobs.language_levels
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = (jobs.salary[None, :] - talents.salary[:, None]) / jobs.salary[None, :]
+    degree_diff = talents.degree[:, None] - jobs.degree[None, :]
+
+    return {
+        "skill_match_ratio": ratio(shared_roles, jobs.role_count[None, :]),
+        "seniority_match": jobs.seniorities.T[talents.seniority].astype(np.int64),
+        "skill_diff_talent": talents.role_count[:, None] - shared_roles,
+        "skill_diff_job": jobs.role_count[None, :] - shared_roles,
+        "salary_expectation_delta": delta,
+        "salary_expectation_over_budget": (delta < 0).astype(np.int64),
+        "degree_level_matched": (degree_diff >= 0).astype(np.int64),
+        "degree_level_diff": degree_diff,
+        "language_match_ratio": ratio(shared_languages, language_count[None, :]),
+        "required_languages": np.broadcast_to(required_languages, shape),
+        "Language_rating_match_ratio": ratio(matches, required_languages[None, :]),
+    }
+
+
+def paired_language_matches(
+    talent_levels: np.ndarray, job_levels: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compares the language vectors of row-aligned talent/job pairs.
+
+    :param talent_levels: (n, n_languages) talent language levels.
+    :param job_levels: (n, n_layers, n_languages) job language levels.
+    :return: Tuple of the number of shared languages, of distinct required
+        languages, of language entries and of entries whose rating the talent
+        reaches, per pair.
+    """
+    listed = talent_levels != NOT_LISTED
+    shared = (listed & (job_levels[:, 0] != NOT_REQUIRED)).sum(axis=1, dtype=np.int64)
+    reached = offered_levels(talent_levels)[:, None, :] >= job_levels
+    return (
+        shared,
+        *language_counts(job_levels),
+        reached.sum(axis=(1, 2), dtype=np.int64),
+    )
+
+
+@instrumented()
+def compute_paired_features(
+    talents: TalentEncoding, jobs: JobEncoding
+) -> dict[str, np.ndarray]:
+    """
+    Computes the FEATURES of row-aligned pairs: talent i with job i, e.g. the
+    candidate pairs left by a prefilter (see TalentEncoding.take/JobEncoding.take).
+
+    :param talents: Encoded talents (n).
+    :param jobs: Encoded jobs (n).
+    :return: Dictionary of (n,) feature arrays.
+    """
+    rows = np.arange(len(talents))
+    shared_roles = paired_overlap(talents.roles, jobs.roles)
+    shared_languages, language_count, required_languages, matches = (
+        paired_language_matches(talents.language_levels, jobs.language_levels)
+    )
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = (jobs.salary - talents.salary) / jobs.salary
+    degree_diff = talents.degree - jobs.degree
+
+    return {
+        "skill_match_ratio": ratio(shared_roles, jobs.role_count),
+        "seniority_match": jobs.seniorities[rows, talents.seniority].astype(np.int64),
+        "skill_diff_talent": talents.role_count - shared_roles,
+        "skill_diff_job": jobs.role_count - shared_roles,
+        "salary_expectation_delta": delta,
+        "salary_expectation_over_budget": (delta < 0).astype(np.int64),
+        "degree_level_matched": (degree_diff >= 0).astype(np.int64),
+        "degree_level_diff": degree_diff,
+        "language_match_ratio": ratio(shared_languages, language_count),
+        "required_languages": required_languages,
+        "Language_rating_match_ratio": ratio(matches, required_languages),
+    }
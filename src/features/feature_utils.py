@@ -1,4 +1,9 @@
-import pandas as pd
+from src.util.instrumentation import instrumented
+from src.features.encoders import (
+    DEGREE_ENCODER,
+    PROFICIENCY_ENCODER,
+    PROFICIENCY_SCALE,
+)
 
 
 def calculate_match_ratio(x, talent_col, job_col):
@@ -38,40 +43,28 @@ def calculate_required_languages(x, job_lang_col):
 
 
 def calculate_rating_matches_ratio(x, talent_lang_col, job_lang_col):
-    talent_lang_dict = {lang["title"]: lang["rating"] for lang in x[talent_lang_col]}
-    proficiency_to_numeric = lambda rating: {
-        "A1": 1,
-        "A2": 2,
-        "B1": 3,
-        "B2": 4,
-        "C1": 5,
-        "C2": 6,
-    }.get(rating, 0)
+    encode = PROFICIENCY_ENCODER.encode
+    talent_ratings = {
+        lang["title"]: encode(lang["rating"]) for lang in x[talent_lang_col]
+    }
+    # languages the talent does not list count as "A1"
+    not_listed = PROFICIENCY_SCALE["A1"]
     matched_count = sum(
         1
         for lang in x[job_lang_col]
-        if proficiency_to_numeric(talent_lang_dict.get(lang["title"], "A1"))
-        >= proficiency_to_numeric(lang["rating"])
+        if talent_ratings.get(lang["title"], not_listed) >= encode(lang["rating"])
     )
     return matched_count / len(x[job_lang_col]) if x[job_lang_col] else 0
 
 
+@instrumented()
 def scale_degrees(df, degree_col):
-    # Map degrees to numeric values with 'apprenticeship' added
-    degree_scale = {
-        "none": 0,
-        "apprenticeship": 1,
-        "associate": 2,
-        "bachelor": 3,
-        "master": 4,
-        "doctorate": 5,
-    }
-    df[degree_col + "_scaled"] = df[degree_col].apply(
-        lambda x: degree_scale.get(x, -1)
-    )  # Use -1 for unknown degrees
+    # -1 for unknown degrees
+    df[degree_col + "_scaled"] = DEGREE_ENCODER.encode_many(df[degree_col])
     return df
 
 
+@instrumented()
 def append_match_ratio(df, talent_col, job_col):
     df["match_ratio"] = df.apply(
         lambda x: calculate_match_ratio(x, talent_col, job_col), axis=1
@@ -79,6 +72,7 @@ def append_match_ratio(df, talent_col, job_col):
     return df
 
 
+@instrumented()
 def append_hit(df, talent_col, job_col):
     df["seniority_match"] = df.apply(
         lambda x: calculate_hit(x, talent_col, job_col), axis=1
@@ -86,6 +80,7 @@ def append_hit(df, talent_col, job_col):
     return df
 
 
+@instrumented()
 def append_skill_diff(df, talent_skills_col, job_skills_col):
     df["skill_diff_talent"], df["skill_diff_job"] = zip(
         *df.apply(
@@ -95,6 +90,7 @@ def append_skill_diff(df, talent_skills_col, job_skills_col):
     return df
 
 
+@instrumented()
 def append_degree_level_match(df, talent_degree_scaled_col, job_degree_scaled_col):
     df["degree_level_diff"] = df.apply(
         lambda x: degree_level_comparison(
@@ -110,6 +106,7 @@ def calculate_salary_expectation(x, salary_col_candidate, salary_col_job):
     return delta, 1 if delta < 0 else 0
 
 
+@instrumented()
 def append_salary_expectation_features(df, salary_col_candidate, salary_col_job):
     df["salary_expectation_delta"], df["salary_expectation_over_budget"] = zip(
         *df.apply(
@@ -122,6 +119,7 @@ def append_salary_expectation_features(df, salary_col_candidate, salary_col_job)
     return df
 
 
+@instrumented()
 def append_matched_languages_ratio(df, talent_lang_col, job_lang_col):
     df["language_match_ratio"] = df.apply(
         lambda x: calculate_matched_languages_ratio(x, talent_lang_col, job_lang_col),
@@ -130,6 +128,7 @@ def append_matched_languages_ratio(df, talent_lang_col, job_lang_col):
     return df
 
 
+@instrumented()
 def append_required_languages(df, job_lang_col):
     df["required_languages"] = df.apply(
         lambda x: calculate_required_languages(x, job_lang_col), axis=1
@@ -137,6 +136,7 @@ def append_required_languages(df, job_lang_col):
     return df
 
 
+@instrumented()
 def append_of_rating_matches(df, talent_lang_col, job_lang_col):
     df["Language_rating_match_ratio"] = df.apply(
         lambda x: calculate_rating_matches_ratio(x, talent_lang_col, job_lang_col),
@@ -145,6 +145,7 @@ def append_of_rating_matches(df, talent_lang_col, job_lang_col):
     return df
 
 
+@instrumented()
 def append_skill_match_ratio(df, talent_skills_col, job_skills_col):
     df["skill_match_ratio"] = df.apply(
         lambda x: calculate_match_ratio(x, talent_skills_col, job_skills_col),
@@ -153,6 +154,7 @@ def append_skill_match_ratio(df, talent_skills_col, job_skills_col):
     return df
 
 
+@instrumented()
 def append_degree_level_matched(df, talent_degree_scaled_col, job_degree_scaled_col):
     df["degree_level_matched"] = df.apply(
         lambda x: degree_level_match(
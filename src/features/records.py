@@ -0,0 +1,461 @@
+from dataclasses import dataclass, replace
+import numpy as np
+from src.features.encoders import (
+    DEGREE_ENCODER,
+    PROFICIENCY_ENCODER,
+    Vocabularies,
+)
+from src.features.encoding import (
+    JobEncoding,
+    TalentEncoding,
+    is_sparse,
+    job_language_levels,
+    row_counts,
+    talent_language_levels,
+)
+
+# Compact storage of large talent and job pools: one array per field instead of
+# one dict per entity. Strings are interned into Vocabularies ids, list fields
+# (roles, seniorities, languages) are flattened with an offsets array (entity i
+# owns values[offsets[i]:offsets[i + 1]]), degrees and CEFR ratings are stored
+# as their small ordinals. Records convert back to the dict schema; degrees and
+# ratings outside DEGREE_SCALE / PROFICIENCY_SCALE come back as None, which gives
+# the same features.
+
+
+def flatten(lists: list[list]) -> tuple[np.ndarray, list]:
+    """
+    :param lists: List of lists.
+    :return: Tuple of the int64 offsets (len(lists) + 1) and the concatenated items.
+    """
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum([len(items) for items in lists], out=offsets[1:])
+    return offsets, [item for items in lists for item in items]
+
+
+def take_lists(offsets: np.ndarray, indices, *values: np.ndarray) -> tuple:
+    """
+    Selects the lists of some entities from flattened storage.
+
+    :param offsets: Offsets of the lists.
+    :param indices: Index array or slice of the selected entities.
+    :param values: Flattened value arrays sharing the offsets.
+    :return: Tuple of the new offsets followed by the selected value arrays.
+    """
+    starts = offsets[:-1][indices]
+    lengths = (offsets[1:] - offsets[:-1])[indices]
+    new_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_offsets[1:])
+    positions = np.repeat(starts - new_offsets[:-1], lengths) + np.arange(
+        new_offsets[-1]
+    )
+    return (new_offsets, *(value[positions] for value in values))
+
+
+def list_incidence(
+    offsets: np.ndarray, ids: np.ndarray, width: int, sparse: bool = False
+) -> np.ndarray:
+    """
+    Builds a 0/1 matrix with one row per list of flattened ids, like
+    encoding.incidence_matrix.
+    """
+    n = len(offsets) - 1
+    if sparse:
+        import scipy.sparse
+
+        # the offsets and ids are already CSR, repeated ids are merged to a 1
+        matrix = scipy.sparse.csr_matrix(
+            (np.ones(len(ids), dtype=np.int32), ids, offsets),
+            shape=(n, width),
+            copy=True,  # sum_duplicates sorts the ids in place
+        )
+        matrix.sum_duplicates()
+        matrix.data[:] = 1
+        return matrix
+    matrix = np.zeros((n, width), dtype=np.uint8)
+    matrix[np.repeat(np.arange(n), np.diff(offsets)), ids] = 1
+    return matrix
+
+
+def remap(ids: np.ndarray, source, target) -> np.ndarray:
+    """
+    Translates ids of the source Vocabulary into ids of the target Vocabulary,
+    adding the missing values to the target.
+    """
+    mapping = np.array([target.add(value) for value in source.values], np.int32)
+    return mapping[ids]
+
+
+@dataclass
+class TalentRecords:
+    vocabularies: Vocabularies
+    role_offsets: np.ndarray  # (n + 1) int64
+    role_ids: np.ndarray  # int32 role ids, in dict order
+    seniority: np.ndarray  # int32 seniority id
+    degree: np.ndarray  # int8 DEGREE_SCALE ordinal, -1 if unknown
+    salary: np.ndarray  # float64 salary expectation
+    language_offsets: np.ndarray  # (n + 1) int64
+    language_ids: np.ndarray  # int32 language ids, in dict order
+    ratings: np.ndarray  # int8 PROFICIENCY_SCALE rating, 0 if unknown
+
+    @classmethod
+    def from_dicts(
+        cls, talents: list[dict], vocabularies: Vocabularies = None
+    ) -> "TalentRecords":
+        """
+        :param talents: List of talent dictionaries.
+        :param vocabularies: Vocabularies to extend, a fresh set by default.
+        :return: TalentRecords of the talents.
+        """
+        vocabularies = vocabularies or Vocabularies()
+        role_offsets, roles = flatten([t["job_roles"] for t in talents])
+        language_offsets, languages = flatten([t["languages"] for t in talents])
+        return cls(
+            vocabularies=vocabularies,
+            role_offsets=role_offsets,
+            role_ids=np.array([vocabularies.roles.add(r) for r in roles], np.int32),
+            seniority=np.array(
+                [vocabularies.seniorities.add(t["seniority"]) for t in talents],
+                np.int32,
+            ),
+            degree=np.array(
+                [DEGREE_ENCODER.encode(t["degree"]) for t in talents], np.int8
+            ),
+            salary=np.array([t["salary_expectation"] for t in talents], np.float64),
+            language_offsets=language_offsets,
+            language_ids=np.array(
+                [vocabularies.languages.add(lang["title"]) for lang in languages],
+                np.int32,
+            ),
+            ratings=np.array(
+                [PROFICIENCY_ENCODER.encode(lang["rating"]) for lang in languages],
+                np.int8,
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(self.degree)
+
+    def __getitem__(self, i: int) -> dict:
+        """
+        :return: Dictionary of the i-th talent.
+        """
+        roles = self.vocabularies.roles.values
+        languages = self.vocabularies.languages.values
+        span = slice(*self.language_offsets[i : i + 2])
+        return {
+            "languages": [
+                {
+                    "rating": PROFICIENCY_ENCODER.decode(rating),
+                    "title": languages[language],
+                }
+                for language, rating in zip(
+                    self.language_ids[span].tolist(), self.ratings[span].tolist()
+                )
+            ],
+            "job_roles": [
+                roles[r]
+                for r in self.role_ids[slice(*self.role_offsets[i : i + 2])].tolist()
+            ],
+            "seniority": self.vocabularies.seniorities.values[self.seniority[i]],
+            "salary_expectation": self.salary[i].item(),
+            "degree": DEGREE_ENCODER.decode(self.degree[i].item()),
+        }
+
+    def to_dicts(self) -> list[dict]:
+        return [self[i] for i in range(len(self))]
+
+    def take(self, indices) -> "TalentRecords":
+        """
+        Selects a subset (index array or slice) of the talents.
+        """
+        role_offsets, role_ids = take_lists(self.role_offsets, indices, self.role_ids)
+        language_offsets, language_ids, ratings = take_lists(
+            self.language_offsets, indices, self.language_ids, self.ratings
+        )
+        return TalentRecords(
+            vocabularies=self.vocabularies,
+            role_offsets=role_offsets,
+            role_ids=role_ids,
+            seniority=self.seniority[indices],
+            degree=self.degree[indices],
+            salary=self.salary[indices],
+            language_offsets=language_offsets,
+            language_ids=language_ids,
+            ratings=ratings,
+        )
+
+    def reindex(self, vocabularies: Vocabularies) -> "TalentRecords":
+        """
+        Translates the records to other vocabularies (extending them).
+        """
+        if vocabularies is self.vocabularies:
+            return self
+        source = self.vocabularies
+        return TalentRecords(
+            **{
+                **vars(self),
+                "vocabularies": vocabularies,
+                "role_ids": remap(self.role_ids, source.roles, vocabularies.roles),
+                "seniority": remap(
+                    self.seniority, source.seniorities, vocabularies.seniorities
+                ),
+                "language_ids": remap(
+                    self.language_ids, source.languages, vocabularies.languages
+                ),
+            }
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            value.nbytes
+            for value in vars(self).values()
+            if isinstance(value, np.ndarray)
+        )
+
+
+@dataclass
+class JobRecords:
+    vocabularies: Vocabularies
+    role_offsets: np.ndarray  # (m + 1) int64
+    role_ids: np.ndarray  # int32 role ids, in dict order
+    seniority_offsets: np.ndarray  # (m + 1) int64
+    seniority_ids: np.ndarray  # int32 seniority ids, in dict order
+    degree: np.ndarray  # int8 DEGREE_SCALE ordinal of the min degree, -1 if unknown
+    salary: np.ndarray  # float64 max salary
+    language_offsets: np.ndarray  # (m + 1) int64
+    language_ids: np.ndarray  # int32 language ids, in dict order
+    ratings: np.ndarray  # int8 PROFICIENCY_SCALE rating, 0 if unknown
+    must_have: np.ndarray  # int8 must_have flag of the languages, -1 if absent
+
+    @classmethod
+    def from_dicts(
+        cls, jobs: list[dict], vocabularies: Vocabularies = None
+    ) -> "JobRecords":
+        """
+        :param jobs: List of job dictionaries.
+        :param vocabularies: Vocabularies to extend, a fresh set by default.
+        :return: JobRecords of the jobs.
+        """
+        vocabularies = vocabularies or Vocabularies()
+        role_offsets, roles = flatten([j["job_roles"] for j in jobs])
+        seniority_offsets, seniorities = flatten([j["seniorities"] for j in jobs])
+        language_offsets, languages = flatten([j["languages"] for j in jobs])
+        return cls(
+            vocabularies=vocabularies,
+            role_offsets=role_offsets,
+            role_ids=np.array([vocabularies.roles.add(r) for r in roles], np.int32),
+            seniority_offsets=seniority_offsets,
+            seniority_ids=np.array(
+                [vocabularies.seniorities.add(s) for s in seniorities], np.int32
+            ),
+            degree=np.array(
+                [DEGREE_ENCODER.encode(j["min_degree"]) for j in jobs], np.int8
+            ),
+            salary=np.array([j["max_salary"] for j in jobs], np.float64),
+            language_offsets=language_offsets,
+            language_ids=np.array(
+                [vocabularies.languages.add(lang["title"]) for lang in languages],
+                np.int32,
+            ),
+            ratings=np.array(
+                [PROFICIENCY_ENCODER.encode(lang["rating"]) for lang in languages],
+                np.int8,
+            ),
+            must_have=np.array(
+                [int(lang.get("must_have", -1)) for lang in languages], np.int8
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(self.degree)
+
+    def __getitem__(self, i: int) -> dict:
+        """
+        :return: Dictionary of the i-th job.
+        """
+        roles = self.vocabularies.roles.values
+        seniorities = self.vocabularies.seniorities.values
+        languages = self.vocabularies.languages.values
+        span = slice(*self.language_offsets[i : i + 2])
+        job_languages = []
+        for language, rating, must_have in zip(
+            self.language_ids[span].tolist(),
+            self.ratings[span].tolist(),
+            self.must_have[span].tolist(),
+        ):
+            entry = {
+                "title": languages[language],
+                "rating": PROFICIENCY_ENCODER.decode(rating),
+            }
+            if must_have >= 0:
+                entry["must_have"] = bool(must_have)
+            job_languages.append(entry)
+        return {
+            "languages": job_languages,
+            "job_roles": [
+                roles[r]
+                for r in self.role_ids[slice(*self.role_offsets[i : i + 2])].tolist()
+            ],
+            "seniorities": [
+                seniorities[s]
+                for s in self.seniority_ids[
+                    slice(*self.seniority_offsets[i : i + 2])
+                ].tolist()
+            ],
+            "max_salary": self.salary[i].item(),
+            "min_degree": DEGREE_ENCODER.decode(self.degree[i].item()),
+        }
+
+    def to_dicts(self) -> list[dict]:
+        return [self[i] for i in range(len(self))]
+
+    def take(self, indices) -> "JobRecords":
+        """
+        Selects a subset (index array or slice) of the jobs.
+        """
+        role_offsets, role_ids = take_lists(self.role_offsets, indices, self.role_ids)
+        seniority_offsets, seniority_ids = take_lists(
+            self.seniority_offsets, indices, self.seniority_ids
+        )
+        language_offsets, language_ids, ratings, must_have = take_lists(
+            self.language_offsets,
+            indices,
+            self.language_ids,
+            self.ratings,
+            self.must_have,
+        )
+        return JobRecords(
+            vocabularies=self.vocabularies,
+            role_offsets=role_offsets,
+            role_ids=role_ids,
+            seniority_offsets=seniority_offsets,
+            seniority_ids=seniority_ids,
+            degree=self.degree[indices],
+            salary=self.salary[indices],
+            language_offsets=language_offsets,
+            language_ids=language_ids,
+            ratings=ratings,
+            must_have=must_have,
+        )
+
+    def reindex(self, vocabularies: Vocabularies) -> "JobRecords":
+        """
+        Translates the records to other vocabularies (extending them).
+        """
+        if vocabularies is self.vocabularies:
+            return self
+        source = self.vocabularies
+        return JobRecords(
+            **{
+                **vars(self),
+                "vocabularies": vocabularies,
+                "role_ids": remap(self.role_ids, source.roles, vocabularies.roles),
+                "seniority_ids": remap(
+                    self.seniority_ids, source.seniorities, vocabularies.seniorities
+                ),
+                "language_ids": remap(
+                    self.language_ids, source.languages, vocabularies.languages
+                ),
+            }
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return sum(
+            value.nbytes
+            for value in vars(self).values()
+            if isinstance(value, np.ndarray)
+        )
+
+
+def as_records(
+    talents, jobs, vocabularies: Vocabularies = None
+) -> tuple[TalentRecords, JobRecords]:
+    """
+    Converts talents and jobs (records or lists of dicts) to records over the
+    same vocabularies. The vocabularies of given records are never extended: new
+    values go to a copy, which the returned records share.
+
+    :param talents: TalentRecords or list of talent dictionaries.
+    :param jobs: JobRecords or list of job dictionaries.
+    :param vocabularies: Vocabularies to extend when neither side is records,
+        fresh ones by default.
+    :return: Tuple of TalentRecords and JobRecords.
+    """
+    talent_records = isinstance(talents, TalentRecords)
+    job_records = isinstance(jobs, JobRecords)
+    if talent_records and job_records and jobs.vocabularies is talents.vocabularies:
+        return talents, jobs
+    if talent_records:
+        # the copy keeps the ids, so the records need no remapping
+        vocabularies = talents.vocabularies.copy()
+        talents = replace(talents, vocabularies=vocabularies)
+    elif job_records:
+        vocabularies = jobs.vocabularies.copy()
+        jobs = replace(jobs, vocabularies=vocabularies)
+    elif vocabularies is None:
+        vocabularies = Vocabularies()
+    if not talent_records:
+        talents = TalentRecords.from_dicts(talents, vocabularies)
+    if not job_records:
+        jobs = JobRecords.from_dicts(jobs, vocabularies)
+    return talents, jobs.reindex(talents.vocabularies)
+
+
+def encode_records(
+    talents: TalentRecords, jobs: JobRecords, sparse: bool = None
+) -> tuple[TalentEncoding, JobEncoding]:
+    """
+    Builds the encodings of encoding.encode_profiles straight from the record
+    arrays, without touching a string.
+
+    :param talents: Talent records.
+    :param jobs: Job records, over the same vocabularies.
+    :param sparse: Sparse role incidence matrices, see encode_profiles.
+    :return: Tuple of talent and job encodings.
+    """
+    if jobs.vocabularies is not talents.vocabularies:
+        raise ValueError("Talent and job records must share their vocabularies")
+    vocabularies = talents.vocabularies
+    n_roles, n_languages = len(vocabularies.roles), len(vocabularies.languages)
+    n, m = len(talents), len(jobs)
+
+    sparse_roles = is_sparse(n_roles, sparse)
+    talent_roles = list_incidence(
+        talents.role_offsets, talents.role_ids, n_roles, sparse_roles
+    )
+    job_roles = list_incidence(jobs.role_offsets, jobs.role_ids, n_roles, sparse_roles)
+
+    talent_encoding = TalentEncoding(
+        roles=talent_roles,
+        role_count=row_counts(talent_roles),
+        seniority=talents.seniority.astype(np.int64),
+        degree=talents.degree.astype(np.int64),
+        salary=talents.salary,
+        language_levels=talent_language_levels(
+            np.repeat(np.arange(n), np.diff(talents.language_offsets)),
+            talents.language_ids,
+            talents.ratings,
+            n,
+            n_languages,
+        ),
+    )
+    job_encoding = JobEncoding(
+        roles=job_roles,
+        role_count=row_counts(job_roles),
+        seniorities=list_incidence(
+            jobs.seniority_offsets, jobs.seniority_ids, len(vocabularies.seniorities)
+        ),
+        degree=jobs.degree.astype(np.int64),
+        salary=jobs.salary,
+        language_levels=job_language_levels(
+            np.repeat(np.arange(m), np.diff(jobs.language_offsets)),
+            jobs.language_ids,
+            jobs.ratings,
+            m,
+            n_languages,
+        ),
+    )
+    return talent_encoding, job_encoding
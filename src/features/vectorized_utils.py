@@ -0,0 +1,232 @@
+import itertools
+import numpy as np
+from src.features.encoders import DEGREE_ENCODER, PROFICIENCY_ENCODER, Vocabulary
+from src.features.encoding import (
+    job_language_levels,
+    paired_language_matches,
+    talent_language_levels,
+)
+from src.util.instrumentation import instrumented
+
+# Column-wise counterparts of the row-wise functions in feature_utils.py.
+# List columns are flattened once and encoded into int64 keys
+# (row * vocab_size + item id), so set operations become sorted array ops.
+# Item ids come from the shared Vocabularies (see encoders.py) when given.
+# Languages use the per-language rating vectors of encoding.py.
+
+
+def flatten_column(values) -> tuple[np.ndarray, list, np.ndarray]:
+    """
+    Flattens a column of lists.
+
+    :param values: Iterable of lists (one per row).
+    :return: Tuple of row index per item, flat list of items and list lengths.
+    """
+    values = list(values)
+    lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    rows = np.repeat(np.arange(len(values), dtype=np.int64), lengths)
+    flat = list(itertools.chain.from_iterable(values))
+    return rows, flat, lengths
+
+
+def encode_keys(
+    talent_rows: np.ndarray,
+    talent_items: list,
+    job_rows: np.ndarray,
+    job_items: list,
+    vocabulary: Vocabulary = None,
+) -> tuple[np.ndarray, np.ndarray, int]:
+    """
+    Encodes talent and job items into (row, item) keys over a shared vocabulary.
+
+    :param talent_rows: Row index of every talent item.
+    :param talent_items: Flat list of talent items.
+    :param job_rows: Row index of every job item.
+    :param job_items: Flat list of job items.
+    :param vocabulary: Vocabulary to extend, a fresh one by default.
+    :return: Tuple of talent keys, job keys and the vocabulary size.
+    """
+    vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+    codes = vocabulary.encode_many(talent_items + job_items)
+    vocab_size = max(len(vocabulary), 1)
+    talent_keys = talent_rows * vocab_size + codes[: len(talent_items)]
+    job_keys = job_rows * vocab_size + codes[len(talent_items) :]
+    return talent_keys, job_keys, vocab_size
+
+
+def set_sizes(keys: np.ndarray, vocab_size: int, n_rows: int) -> np.ndarray:
+    """
+    Counts distinct items per row.
+
+    :param keys: Unique (row, item) keys.
+    :param vocab_size: Size of the shared vocabulary.
+    :param n_rows: Number of rows.
+    :return: Array of set sizes.
+    """
+    return np.bincount(keys // vocab_size, minlength=n_rows)
+
+
+def intersection_sizes(
+    talent_keys: np.ndarray, job_keys: np.ndarray, vocab_size: int, n_rows: int
+) -> np.ndarray:
+    """
+    Counts the items shared by the talent and job sets of every row.
+
+    :param talent_keys: Unique talent (row, item) keys.
+    :param job_keys: Unique job (row, item) keys.
+    :param vocab_size: Size of the shared vocabulary.
+    :param n_rows: Number of rows.
+    :return: Array of intersection sizes.
+    """
+    shared = np.intersect1d(talent_keys, job_keys, assume_unique=True)
+    return set_sizes(shared, vocab_size, n_rows)
+
+
+def safe_ratio(numerator: np.ndarray, denominator: np.ndarray, mask: np.ndarray):
+    """
+    Divides where mask is set and returns 0 elsewhere.
+    """
+    out = np.zeros(len(numerator), dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=mask)
+    return out
+
+
+@instrumented()
+def compute_set_features(
+    talent_values, job_values, vocabulary: Vocabulary = None
+) -> dict[str, np.ndarray]:
+    """
+    Computes the role based features: match ratio and skill differences.
+
+    :param talent_values: Column of talent role lists.
+    :param job_values: Column of job role lists.
+    :param vocabulary: Role vocabulary to extend, a fresh one by default.
+    :return: Dictionary with skill_match_ratio, skill_diff_talent and skill_diff_job.
+    """
+    t_rows, t_items, _ = flatten_column(talent_values)
+    j_rows, j_items, j_lengths = flatten_column(job_values)
+    n_rows = len(j_lengths)
+    talent_keys, job_keys, vocab_size = encode_keys(
+        t_rows, t_items, j_rows, j_items, vocabulary
+    )
+    talent_keys, job_keys = np.unique(talent_keys), np.unique(job_keys)
+
+    talent_size = set_sizes(talent_keys, vocab_size, n_rows)
+    job_size = set_sizes(job_keys, vocab_size, n_rows)
+    shared = intersection_sizes(talent_keys, job_keys, vocab_size, n_rows)
+    return {
+        "skill_match_ratio": safe_ratio(shared, job_size, j_lengths > 0),
+        "skill_diff_talent": talent_size - shared,
+        "skill_diff_job": job_size - shared,
+    }
+
+
+@instrumented()
+def compute_hit(talent_values, job_values, vocabulary: Vocabulary = None) -> np.ndarray:
+    """
+    Flags rows whose talent value is contained in the job list.
+
+    :param talent_values: Column of scalar talent values.
+    :param job_values: Column of job lists.
+    :param vocabulary: Vocabulary of the values to extend, a fresh one by default.
+    :return: Array of 0/1 flags.
+    """
+    talent_items = list(talent_values)
+    n_rows = len(talent_items)
+    j_rows, j_items, _ = flatten_column(job_values)
+    talent_keys, job_keys, _ = encode_keys(
+        np.arange(n_rows, dtype=np.int64), talent_items, j_rows, j_items, vocabulary
+    )
+    return np.isin(talent_keys, job_keys).astype(np.int64)
+
+
+@instrumented()
+def compute_degree_features(talent_degrees, job_degrees) -> dict[str, np.ndarray]:
+    """
+    Computes the degree features from the raw degree columns.
+
+    :param talent_degrees: Column of talent degrees.
+    :param job_degrees: Column of job minimum degrees.
+    :return: Dictionary with degree_level_matched and degree_level_diff.
+    """
+    talent_scaled = DEGREE_ENCODER.encode_many(talent_degrees)
+    job_scaled = DEGREE_ENCODER.encode_many(job_degrees)
+    return {
+        "degree_level_matched": (talent_scaled >= job_scaled).astype(np.int64),
+        "degree_level_diff": talent_scaled - job_scaled,
+    }
+
+
+@instrumented()
+def compute_salary_features(talent_salaries, job_salaries) -> dict[str, np.ndarray]:
+    """
+    Computes the salary expectation features.
+
+    :param talent_salaries: Column of talent salary expectations.
+    :param job_salaries: Column of job maximum salaries.
+    :return: Dictionary with salary_expectation_delta and salary_expectation_over_budget.
+    """
+    talent_salaries = np.asarray(talent_salaries)
+    job_salaries = np.asarray(job_salaries)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        delta = (job_salaries - talent_salaries) / job_salaries
+    return {
+        "salary_expectation_delta": delta.astype(np.float64),
+        "salary_expectation_over_budget": (delta < 0).astype(np.int64),
+    }
+
+
+@instrumented()
+def compute_language_features(
+    talent_langs, job_langs, vocabulary: Vocabulary = None
+) -> dict[str, np.ndarray]:
+    """
+    Computes the language features from the lists of language dictionaries.
+
+    :param talent_langs: Column of talent language lists.
+    :param job_langs: Column of job language lists.
+    :param vocabulary: Language title vocabulary to extend, a fresh one by default.
+    :return: Dictionary with language_match_ratio, required_languages and
+        Language_rating_match_ratio.
+    """
+    t_rows, t_flat, _ = flatten_column(talent_langs)
+    j_rows, j_flat, j_lengths = flatten_column(job_langs)
+    n_rows = len(j_lengths)
+    vocabulary = vocabulary if vocabulary is not None else Vocabulary()
+    codes = vocabulary.encode_many(
+        [lang["title"] for lang in t_flat] + [lang["title"] for lang in j_flat]
+    )
+    talent_codes, job_codes = codes[: len(t_flat)], codes[len(t_flat) :]
+
+    # language vectors over the languages some job requires only: the talent
+    # languages outside of them match nothing
+    columns, job_columns = np.unique(job_codes, return_inverse=True)
+    position = np.minimum(np.searchsorted(columns, talent_codes), len(columns) - 1)
+    required = (
+        columns[position] == talent_codes if len(columns) else np.zeros(0, dtype=bool)
+    )
+    talent_levels = talent_language_levels(
+        t_rows[required],
+        position[required],
+        PROFICIENCY_ENCODER.encode_many([lang["rating"] for lang in t_flat])[required],
+        n_rows,
+        len(columns),
+    )
+    job_levels = job_language_levels(
+        j_rows,
+        job_columns.reshape(-1),
+        PROFICIENCY_ENCODER.encode_many([lang["rating"] for lang in j_flat]),
+        n_rows,
+        len(columns),
+    )
+    shared, job_size, _, rating_matches = paired_language_matches(
+        talent_levels, job_levels
+    )
+
+    return {
+        "language_match_ratio": safe_ratio(shared, job_size, j_lengths > 0),
+        "required_languages": j_lengths,
+        "Language_rating_match_ratio": safe_ratio(
+            rating_matches, j_lengths, j_lengths > 0
+        ),
+    }
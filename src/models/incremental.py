@@ -0,0 +1,208 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from src.util.logger import logger
+from src.data.columnar import read_columns, read_matrix, read_schema
+from src.features.feature_utils import FEATURES, LABEL
+
+# Out-of-core training: the processed features are streamed in chunks (from the
+# column store or a CSV file), so memory holds one chunk whatever the dataset
+# size. A StandardScaler is fitted with partial_fit in a first pass, then a
+# logistic SGDClassifier over a few epochs of partial_fit calls. Every row is
+# assigned to the training or the held-out stream by a hash of its row number,
+# so the split does not depend on the chunk size or order. The held-out stream
+# is evaluated with StreamingMetrics (counts and score histograms).
+
+DEFAULT_TRAIN_CHUNK_SIZE = 100_000  # rows per training chunk
+DEFAULT_EPOCHS = 5
+CLASSES = np.array([0, 1])
+SCORE_BINS = 1000  # resolution of the held-out ROC-AUC
+
+
+def build_streaming_pipeline(seed: int = 42) -> Pipeline:
+    """
+    :return: Scaler + logistic SGD pipeline, fitted by fit_streaming. The averaged
+        SGD weights make the model depend little on the order of the last chunks.
+    """
+    classifier = SGDClassifier(loss="log_loss", average=True, random_state=seed)
+    return Pipeline([("scaler", StandardScaler()), ("classifier", classifier)])
+
+
+def holdout_mask(rows: np.ndarray, test_size: float, seed: int = 42) -> np.ndarray:
+    """
+    Assigns rows to the held-out stream with a splitmix64 hash of their number.
+
+    :param rows: Row numbers in the dataset.
+    :param test_size: Fraction of held-out rows.
+    :param seed: Seed of the split.
+    :return: Boolean mask of the held-out rows.
+    """
+    offset = np.uint64(seed * 0x9E3779B97F4A7C15 % 2**64)
+    z = rows.astype(np.uint64) + offset
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    return (z >> np.uint64(11)).astype(np.float64) * 2.0**-53 < test_size
+
+
+def iter_feature_chunks(
+    path: str,
+    chunk_size: int = DEFAULT_TRAIN_CHUNK_SIZE,
+    rng: np.random.Generator = None,
+):
+    """
+    Iterates the features and labels of a processed dataset in chunks.
+
+    :param path: Processed column store directory or CSV file.
+    :param chunk_size: Rows per chunk.
+    :param rng: Shuffles the chunk order of column stores when given (CSV files
+        are read in order).
+    :return: Generator of (row numbers, feature DataFrame, label array) tuples.
+    """
+    if not os.path.isdir(path):
+        start = 0
+        for df in pd.read_csv(path, usecols=[*FEATURES, LABEL], chunksize=chunk_size):
+            rows = np.arange(start, start + len(df))
+            yield rows, df[FEATURES].reset_index(drop=True), df[LABEL].to_numpy()
+            start += len(df)
+        return
+
+    schema = read_schema(path)
+    n_rows = schema["n_rows"]
+    starts = np.arange(0, n_rows, chunk_size)
+    if rng is not None:
+        starts = rng.permutation(starts)
+    matrix = None
+    if set(FEATURES) <= set(schema.get("matrix_columns", ())):
+        matrix, columns = read_matrix(path)
+        positions = [columns.index(feature) for feature in FEATURES]
+    for start in starts.tolist():
+        stop = min(start + chunk_size, n_rows)
+        if matrix is not None:
+            X = pd.DataFrame(
+                np.array(matrix[start:stop][:, positions]), columns=FEATURES
+            )
+        else:
+            X = read_columns(path, FEATURES, rows=slice(start, stop))
+            X = X.reset_index(drop=True)
+        y = read_columns(path, [LABEL], rows=slice(start, stop))[LABEL].to_numpy()
+        yield np.arange(start, stop), X, y
+
+
+class StreamingMetrics:
+    """
+    Binary classification metrics accumulated over chunks in constant memory:
+    confusion counts at the 0.5 threshold, log loss, and ROC-AUC from score
+    histograms (ties within a bin count half).
+    """
+
+    def __init__(self, bins: int = SCORE_BINS) -> None:
+        self.bins = bins
+        self.histograms = np.zeros((2, bins), dtype=np.int64)  # negatives, positives
+        self.confusion = np.zeros((2, 2), dtype=np.int64)  # true x predicted
+        self.log_loss_sum = 0.0
+
+    def update(self, y_true: np.ndarray, y_score: np.ndarray) -> None:
+        """
+        :param y_true: 0/1 labels of a chunk.
+        :param y_score: Positive class probabilities of the chunk.
+        """
+        y_true = np.asarray(y_true, dtype=np.int64)
+        bins = np.minimum((y_score * self.bins).astype(np.int64), self.bins - 1)
+        np.add.at(self.histograms, (y_true, bins), 1)
+        np.add.at(self.confusion, (y_true, (y_score >= 0.5).astype(np.int64)), 1)
+        p = np.clip(y_score, 1e-15, 1 - 1e-15)
+        self.log_loss_sum -= float(
+            np.sum(np.where(y_true == 1, np.log(p), np.log1p(-p)))
+        )
+
+    def result(self) -> dict:
+        """
+        :return: Dictionary of rows, positives, accuracy, precision, recall,
+            log_loss, roc_auc and the confusion matrix.
+        """
+        negatives, positives = self.histograms
+        n_neg, n_pos = int(negatives.sum()), int(positives.sum())
+        below = np.cumsum(negatives) - negatives  # negatives in lower bins
+        auc = (positives * (below + 0.5 * negatives)).sum() / max(n_neg * n_pos, 1)
+        (tn, fp), (fn, tp) = self.confusion.tolist()
+        n = n_neg + n_pos
+        return {
+            "rows": n,
+            "positives": n_pos,
+            "accuracy": (tp + tn) / max(n, 1),
+            "precision": tp / max(tp + fp, 1),
+            "recall": tp / max(tp + fn, 1),
+            "log_loss": self.log_loss_sum / max(n, 1),
+            "roc_auc": float(auc) if n_neg and n_pos else float("nan"),
+            "confusion_matrix": self.confusion.tolist(),
+        }
+
+
+def log_pass(name: str, rows: int, seconds: float) -> None:
+    rate = rows / max(seconds, 1e-9)
+    logger.info(f"{name}: {rows} rows in {seconds:.2f} s ({rate:.0f} rows/s)")
+
+
+def fit_streaming(
+    path: str,
+    chunk_size: int = DEFAULT_TRAIN_CHUNK_SIZE,
+    epochs: int = DEFAULT_EPOCHS,
+    test_size: float = 0.2,
+    seed: int = 42,
+) -> tuple[Pipeline, dict]:
+    """
+    Fits the streaming pipeline on the training stream of a processed dataset and
+    evaluates it on the held-out stream. Memory holds one chunk at a time.
+
+    :param path: Processed column store directory or CSV file.
+    :param chunk_size: Rows per chunk.
+    :param epochs: Passes of SGD over the training stream.
+    :param test_size: Fraction of held-out rows, 0 to train on every row.
+    :param seed: Seed of the split, the chunk and row shuffling and the SGD.
+    :return: Tuple of the fitted pipeline and the held-out metrics (see
+        StreamingMetrics.result).
+    """
+    pipeline = build_streaming_pipeline(seed)
+    scaler, classifier = pipeline.named_steps.values()
+    rng = np.random.default_rng(seed)
+
+    start_time, n_rows = time.perf_counter(), 0
+    for rows, X, _ in iter_feature_chunks(path, chunk_size):
+        train = ~holdout_mask(rows, test_size, seed)
+        if train.any():
+            scaler.partial_fit(X[train])
+            n_rows += int(train.sum())
+    if not n_rows:
+        raise ValueError(f"No training rows in {path}")
+    log_pass("Scaler pass", n_rows, time.perf_counter() - start_time)
+
+    for epoch in range(epochs):
+        start_time = time.perf_counter()
+        for rows, X, y in iter_feature_chunks(path, chunk_size, rng):
+            train = np.flatnonzero(~holdout_mask(rows, test_size, seed))
+            if train.size == 0:
+                continue
+            # SGD sees the rows of a chunk in random order, not by talent or job
+            train = rng.permutation(train)
+            classifier.partial_fit(
+                scaler.transform(X.iloc[train]), y[train], classes=CLASSES
+            )
+        log_pass(
+            f"Epoch {epoch + 1}/{epochs}", n_rows, time.perf_counter() - start_time
+        )
+
+    metrics = StreamingMetrics()
+    start_time = time.perf_counter()
+    for rows, X, y in iter_feature_chunks(path, chunk_size):
+        held_out = holdout_mask(rows, test_size, seed)
+        if held_out.any():
+            metrics.update(y[held_out], pipeline.predict_proba(X[held_out])[:, 1])
+    result = metrics.result()
+    log_pass("Held-out evaluation", result["rows"], time.perf_counter() - start_time)
+    return pipeline, result
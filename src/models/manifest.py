@@ -0,0 +1,192 @@
+import datetime
+import json
+import os
+import time
+import numpy as np
+from src.app.cache import file_hash
+from src.models.scoring import SklearnScorer, compile_scorer
+
+# The manifest saved next to a model (models/my_model.manifest.json) describes
+# what the model expects (feature order, dtype), which files it was saved to
+# (with their hashes), and what each scoring backend costs at several batch
+# sizes. Search validates it on load and picks the fastest compatible backend.
+
+MANIFEST_VERSION = 1
+FEATURE_DTYPE = "float64"
+BATCH_SIZES = (1, 64, 1024, 16384)
+# scorer options of each backend, see scoring.load_scorer
+BACKENDS = {
+    "sklearn": {"fused": False, "dtype": np.float64},
+    "fused": {"fused": True, "dtype": np.float64},
+    "fused32": {"fused": True, "dtype": np.float32},
+}
+# maximum score difference to the model for a backend to be compatible
+SCORE_TOLERANCE = 1e-6
+
+
+def manifest_path(model_path: str) -> str:
+    """
+    :param model_path: Path of the joblib model or of its exported scorer.
+    :return: Path of the manifest shared by both files.
+    """
+    return f"{os.path.splitext(model_path)[0]}.manifest.json"
+
+
+def time_batches(scorer, X, batch_sizes, repeats: int) -> dict:
+    """
+    :return: Dictionary batch size -> seconds per row and rows per second of the
+        fastest of repeats runs.
+    """
+    timings = {}
+    for batch_size in batch_sizes:
+        batch = X.iloc[np.arange(batch_size) % len(X)]
+        seconds = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            scorer.predict(batch)
+            seconds.append(time.perf_counter() - start)
+        best = min(seconds)
+        timings[str(batch_size)] = {
+            "seconds_per_row": best / batch_size,
+            "rows_per_second": batch_size / best,
+        }
+    return timings
+
+
+def measure_backends(
+    model, X, batch_sizes=BATCH_SIZES, repeats: int = 5
+) -> dict[str, dict]:
+    """
+    Measures the scoring backends available for a model.
+
+    :param model: Fitted model.
+    :param X: Feature rows the batches are drawn from.
+    :param batch_sizes: Batch sizes to time.
+    :param repeats: Timed runs per batch size, the fastest is kept.
+    :return: Dictionary backend -> compatibility, score error and timings.
+    """
+    reference = model.predict_proba(X)[:, 1]
+    backends = {}
+    for name, options in BACKENDS.items():
+        scorer = compile_scorer(model, **options)
+        if options["fused"] and isinstance(scorer, SklearnScorer):
+            continue  # the model cannot be fused
+        error = float(np.abs(scorer.predict(X)[1] - reference).max())
+        backends[name] = {
+            "compatible": error <= SCORE_TOLERANCE,
+            "max_abs_error": error,
+            "batch_sizes": time_batches(scorer, X, batch_sizes, repeats),
+        }
+    return backends
+
+
+def artifact(path: str) -> dict:
+    return {"hash": file_hash(path), "size": os.path.getsize(path)}
+
+
+def build_manifest(
+    model, X, features: list[str], model_path: str, scorer_path: str = None
+) -> dict:
+    """
+    :param model: Fitted model, already saved to model_path.
+    :param X: DataFrame of feature rows for the latency measurements.
+    :param features: Feature order the model expects.
+    :param model_path: Path of the saved model.
+    :param scorer_path: Path of the exported scorer, None if there is none.
+    :return: Manifest dictionary.
+    """
+    import sklearn
+
+    artifacts = {os.path.basename(model_path): artifact(model_path)}
+    if scorer_path is not None and os.path.exists(scorer_path):
+        artifacts[os.path.basename(scorer_path)] = artifact(scorer_path)
+    steps = getattr(model, "steps", [(None, model)])
+    return {
+        "manifest_version": MANIFEST_VERSION,
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "sklearn": sklearn.__version__,
+        "model": [type(step).__name__ for _, step in steps],
+        "features": list(features),
+        "feature_dtype": FEATURE_DTYPE,
+        "artifacts": artifacts,
+        "backends": measure_backends(model, X[list(features)].astype(FEATURE_DTYPE)),
+    }
+
+
+def save_manifest(manifest: dict, path: str) -> None:
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_manifest(path: str) -> dict:
+    """
+    :return: The manifest, None if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def describes(manifest: dict, model_path: str, digest: str) -> bool:
+    """
+    :param manifest: Manifest dictionary.
+    :param model_path: Path of the loaded model file.
+    :param digest: file_hash of the loaded model file.
+    :return: Whether the manifest was written for this exact file.
+    """
+    entry = manifest.get("artifacts", {}).get(os.path.basename(model_path))
+    return entry is not None and entry["hash"] == digest
+
+
+def validate_manifest(manifest: dict, features: list[str]) -> None:
+    """
+    Checks that a model can be fed the features computed by this code.
+
+    :param manifest: Manifest dictionary.
+    :param features: Feature order of the feature pipelines.
+    """
+    version = manifest.get("manifest_version")
+    if version != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported model manifest version {version}")
+    if manifest["features"] != list(features):
+        raise ValueError(
+            f"Model expects features {manifest['features']}, "
+            f"the pipeline computes {list(features)}"
+        )
+    if manifest["feature_dtype"] != FEATURE_DTYPE:
+        raise ValueError(f"Unsupported feature dtype {manifest['feature_dtype']}")
+
+
+def choose_backend(manifest: dict, exported: bool = False) -> str:
+    """
+    Picks the compatible backend with the lowest mean slowdown relative to the
+    fastest backend at each measured batch size.
+
+    :param manifest: Manifest dictionary.
+    :param exported: The model was loaded from an exported scorer (no sklearn).
+    :return: Name of a BACKENDS entry, None if none is compatible.
+    """
+    backends = {
+        name: entry["batch_sizes"]
+        for name, entry in manifest["backends"].items()
+        if name in BACKENDS
+        and entry["compatible"]
+        and not (exported and name == "sklearn")
+    }
+    if not backends:
+        return None
+    batch_sizes = set.intersection(*(set(timings) for timings in backends.values()))
+    fastest = {
+        size: min(timings[size]["seconds_per_row"] for timings in backends.values())
+        for size in batch_sizes
+    }
+    return min(
+        backends,
+        key=lambda name: np.mean(
+            [
+                backends[name][size]["seconds_per_row"] / fastest[size]
+                for size in batch_sizes
+            ]
+        ),
+    )
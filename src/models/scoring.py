@@ -0,0 +1,221 @@
+import numpy as np
+
+from src.util.lazy import is_dataframe, lazy_import
+from src.util.logger import logger
+from src.util.instrumentation import instrumented
+
+# sklearn is only imported to compile or verify a scorer from a fitted model,
+# an exported LinearScorer (LinearScorer.save) loads with numpy alone
+pd = lazy_import("pandas")
+
+# version of the LinearScorer.save format
+SCORER_FORMAT_VERSION = 1
+
+
+class SklearnScorer:
+    """
+    Generic scorer calling the model's predict and predict_proba.
+    """
+
+    def __init__(self, model) -> None:
+        self.model = model
+
+    @instrumented("scorer.predict", rows=lambda self, X: len(X))
+    def predict(self, X) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :param X: Feature matrix or DataFrame.
+        :return: Tuple of predicted labels and positive class scores.
+        """
+        feature_names = getattr(self.model, "feature_names_in_", None)
+        if feature_names is not None and not isinstance(X, pd.DataFrame):
+            X = pd.DataFrame(X, columns=feature_names)
+        label = self.model.predict(X)
+        score = self.model.predict_proba(X)[:, 1]
+        return label, score
+
+
+class LinearScorer:
+    """
+    Fused scorer for StandardScaler + binary LogisticRegression pipelines.
+    The scaler is folded into the coefficients, so scoring is a single dot
+    product plus sigmoid.
+    """
+
+    def __init__(
+        self,
+        coef: np.ndarray,
+        intercept: float,
+        classes: np.ndarray,
+        feature_names: list[str] = None,
+        dtype=np.float64,
+    ) -> None:
+        self.dtype = np.dtype(dtype)
+        self.coef = np.asarray(coef, dtype=self.dtype)
+        self.intercept = self.dtype.type(intercept)
+        self.classes = np.asarray(classes)
+        self.feature_names = feature_names
+
+    def decision_function(self, X) -> np.ndarray:
+        """
+        :param X: Feature matrix or DataFrame (columns reordered by feature names).
+        :return: Log-odds of the positive class.
+        """
+        if is_dataframe(X):
+            if self.feature_names is not None:
+                X = X[self.feature_names]
+            X = X.to_numpy(dtype=self.dtype)
+        else:
+            X = np.asarray(X, dtype=self.dtype)
+        return X @ self.coef + self.intercept
+
+    @instrumented("scorer.predict", rows=lambda self, X: len(X))
+    def predict(self, X) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :param X: Feature matrix or DataFrame.
+        :return: Tuple of predicted labels and positive class scores.
+        """
+        decision = self.decision_function(X)
+        with np.errstate(over="ignore"):
+            score = 1.0 / (1.0 + np.exp(-decision))
+        # same rule as LogisticRegression.predict: positive log-odds
+        label = self.classes[(decision > 0).astype(np.int64)]
+        return label, score
+
+    def save(self, path: str) -> None:
+        """
+        Exports the coefficients to a small npz file, see LinearScorer.load.
+
+        :param path: Path of the .npz file.
+        """
+        np.savez(
+            path,
+            format_version=SCORER_FORMAT_VERSION,
+            coef=self.coef.astype(np.float64),
+            intercept=np.float64(self.intercept),
+            classes=self.classes,
+            feature_names=np.array(self.feature_names or [], dtype=str),
+        )
+
+    @classmethod
+    def load(cls, path: str, dtype=np.float64) -> "LinearScorer":
+        """
+        Loads an exported scorer without sklearn or joblib.
+
+        :param path: Path of the .npz file.
+        :param dtype: Floating point type used for scoring.
+        :return: LinearScorer.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data["format_version"])
+            if version != SCORER_FORMAT_VERSION:
+                raise ValueError(
+                    f"Unsupported scorer format version {version} in {path}"
+                )
+            feature_names = data["feature_names"].tolist()
+            return cls(
+                data["coef"],
+                float(data["intercept"]),
+                data["classes"],
+                feature_names=feature_names or None,
+                dtype=dtype,
+            )
+
+
+def compile_linear_scorer(model, dtype=np.float64) -> LinearScorer:
+    """
+    Folds a StandardScaler + binary LogisticRegression pipeline into a LinearScorer,
+    or one with a logistic SGDClassifier (see src/models/incremental.py).
+
+    :param model: Fitted model (Pipeline, LogisticRegression or SGDClassifier).
+    :param dtype: Floating point type used for scoring.
+    :return: LinearScorer, or None if the model is not supported.
+    """
+    from sklearn.linear_model import LogisticRegression, SGDClassifier
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    steps = model.steps if isinstance(model, Pipeline) else [(None, model)]
+    *transforms, (_, classifier) = steps
+    logistic = isinstance(classifier, LogisticRegression) or (
+        isinstance(classifier, SGDClassifier) and classifier.loss == "log_loss"
+    )
+    if not logistic or len(classifier.classes_) != 2:
+        return None
+
+    coef = classifier.coef_[0].astype(np.float64)
+    intercept = float(classifier.intercept_[0])
+    for _, transform in reversed(transforms):
+        if transform is None or transform == "passthrough":
+            continue
+        if not isinstance(transform, StandardScaler):
+            return None
+        # w . (x - mean) / scale + b == (w / scale) . x + (b - (w / scale) . mean)
+        if transform.scale_ is not None:
+            coef = coef / transform.scale_
+        if transform.mean_ is not None:
+            intercept -= float(coef @ transform.mean_)
+
+    feature_names = getattr(model, "feature_names_in_", None)
+    return LinearScorer(
+        coef,
+        intercept,
+        classifier.classes_,
+        feature_names=None if feature_names is None else list(feature_names),
+        dtype=dtype,
+    )
+
+
+def verify_scorer(scorer, model, n_features: int, atol: float = 1e-6) -> bool:
+    """
+    Checks a compiled scorer against the model's predict_proba on random inputs.
+
+    :param scorer: Compiled scorer.
+    :param model: Original model.
+    :param n_features: Number of input features.
+    :param atol: Allowed absolute score difference.
+    :return: True if the scores agree.
+    """
+    rng = np.random.default_rng(0)
+    X = rng.normal(scale=3.0, size=(64, n_features))
+    if scorer.feature_names is not None:
+        X = pd.DataFrame(X, columns=scorer.feature_names)
+    _, score = scorer.predict(X)
+    return bool(np.allclose(score, model.predict_proba(X)[:, 1], rtol=0, atol=atol))
+
+
+def compile_scorer(model, dtype=np.float64, fused: bool = True):
+    """
+    Compiles the fastest scorer available for a model, falling back to the
+    generic sklearn path for models that cannot be fused.
+
+    :param model: Fitted model.
+    :param dtype: Floating point type used by the fused scorer.
+    :param fused: Whether to try the fused scorer at all.
+    :return: LinearScorer or SklearnScorer.
+    """
+    scorer = compile_linear_scorer(model, dtype) if fused else None
+    if scorer is None:
+        return SklearnScorer(model)
+    atol = 1e-6 if scorer.dtype == np.float64 else 1e-3
+    if not verify_scorer(scorer, model, len(scorer.coef), atol=atol):
+        logger.warning("Fused scorer does not match the model, using sklearn scoring")
+        return SklearnScorer(model)
+    return scorer
+
+
+def load_scorer(model_path: str, dtype=np.float64, fused: bool = True) -> tuple:
+    """
+    Loads a model file and compiles its scorer. Exported scorers (.npz) load
+    without sklearn and have no model object.
+
+    :param model_path: Path of the joblib model or of an exported LinearScorer.
+    :param dtype: Floating point type used by the fused scorer.
+    :param fused: Whether to try the fused scorer (exported scorers always are).
+    :return: Tuple of the model (None for exported scorers) and the scorer.
+    """
+    if model_path.endswith(".npz"):
+        return None, LinearScorer.load(model_path, dtype=dtype)
+    import joblib
+
+    model = joblib.load(model_path)
+    return model, compile_scorer(model, dtype=dtype, fused=fused)
@@ -1,38 +1,83 @@
+import argparse
+import contextlib
+import json
+import os
+import tempfile
+import time
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.pipeline import Pipeline
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.ensemble import HistGradientBoostingClassifier, RandomForestClassifier
 from sklearn.linear_model import LogisticRegression
-from sklearn.model_selection import cross_val_score
+from sklearn.model_selection import cross_validate
 from joblib import dump
 from sklearn.metrics import classification_report, roc_auc_score, confusion_matrix
 
 from src.util.paths import Paths
-from src.util.logger import logger
-
-
-def create_features_and_labels(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+from src.util.logger import configure_logging, logger
+from src.data.columnar import read_columns, read_matrix
+from src.features.feature_utils import FEATURES, LABEL
+from src.models.manifest import (
+    BATCH_SIZES,
+    build_manifest,
+    manifest_path,
+    save_manifest,
+)
+from src.models.scoring import compile_linear_scorer
+from src.models.incremental import (
+    DEFAULT_EPOCHS,
+    DEFAULT_TRAIN_CHUNK_SIZE,
+    fit_streaming,
+    iter_feature_chunks,
+)
+
+
+def load_features_and_labels(
+    path: str, mmap: bool = True
+) -> tuple[pd.DataFrame, pd.Series]:
     """
-    Preprocess the data by splitting into features and target.
+    Load the features and target from the processed column store.
 
-    :param df: DataFrame containing the dataset.
+    :param path: Processed dataset directory.
+    :param mmap: Memory-map the feature matrix instead of reading it into memory.
     :return: Tuple containing features (X) and target (y).
     """
-    X = df.drop(columns=["label"])
-    y = df["label"]
+    matrix, columns = read_matrix(path, mmap=mmap)
+    X = pd.DataFrame(matrix, columns=columns, copy=False)
+    y = read_columns(path, [LABEL])[LABEL]
     return X, y
 
 
-def build_pipeline() -> Pipeline:
+# Candidate classifiers of the model selection, all behind the same scaler so the
+# cached scaler fits are shared (tree models are unaffected by the scaling).
+# Tree ensembles use one core, the folds already run in parallel.
+CANDIDATES = {
+    "logreg": lambda: LogisticRegression(),
+    "logreg_balanced": lambda: LogisticRegression(class_weight="balanced"),
+    "logreg_l1": lambda: LogisticRegression(penalty="l1", solver="liblinear"),
+    "logreg_c0.1": lambda: LogisticRegression(C=0.1),
+    "random_forest": lambda: RandomForestClassifier(
+        n_estimators=100, min_samples_leaf=5, n_jobs=1, random_state=42
+    ),
+    "gradient_boosting": lambda: HistGradientBoostingClassifier(random_state=42),
+}
+
+SELECTION_METRICS = ("roc_auc", "precision", "recall")
+
+
+def build_pipeline(candidate: str = "logreg", memory=None) -> Pipeline:
     """
     Build a machine learning pipeline with preprocessing and model.
 
+    :param candidate: Name of the classifier in CANDIDATES.
+    :param memory: Directory (or joblib.Memory) caching the fitted scaler.
     :return: Configured machine learning pipeline.
     """
     scaler = StandardScaler()
-    classifier = LogisticRegression()
-    pipeline = Pipeline([("scaler", scaler), ("classifier", classifier)])
+    classifier = CANDIDATES[candidate]()
+    pipeline = Pipeline([("scaler", scaler), ("classifier", classifier)], memory=memory)
     return pipeline
 
 
@@ -49,7 +94,7 @@ def log_confusion_matrix(y_true: pd.Series, y_pred: pd.Series) -> None:
 
 
 def evaluate_model(
-    pipeline: Pipeline, X_train: pd.DataFrame, y_train: pd.Series
+    pipeline: Pipeline, X_train: pd.DataFrame, y_train: pd.Series, n_jobs: int = None
 ) -> None:
     """
     Evaluate the model using cross-validation and log the scores.
@@ -57,15 +102,121 @@ def evaluate_model(
     :param pipeline: Machine learning pipeline.
     :param X_train: Training features.
     :param y_train: Training labels.
+    :param n_jobs: Folds fitted in parallel, None for one, -1 for all cores.
     """
-    p_scores = cross_val_score(pipeline, X_train, y_train, cv=5, scoring="precision")
-    r_scores = cross_val_score(pipeline, X_train, y_train, cv=5, scoring="recall")
+    # one fit per fold for both metrics
+    scores = cross_validate(
+        pipeline, X_train, y_train, cv=5, scoring=["precision", "recall"], n_jobs=n_jobs
+    )
+    p_scores, r_scores = scores["test_precision"], scores["test_recall"]
     logger.info(f"Cross-Validation Precision Scores: {p_scores}")
     logger.info(f"Cross-Validation Recall Scores: {r_scores}")
     logger.info(f"Average Precision: {p_scores.mean()}")
     logger.info(f"Average Recall: {r_scores.mean()}")
 
 
+def measure_latency(
+    model, X: pd.DataFrame, batch_size: int = 10_000, repeats: int = 5
+) -> dict:
+    """
+    Measure the inference cost of a fitted model with predict_proba.
+
+    :param model: Fitted model.
+    :param X: Features to predict on.
+    :param batch_size: Rows of the batch measurement.
+    :param repeats: Timed runs, the fastest is kept.
+    :return: Dictionary with the single row latency and the batch throughput.
+    """
+
+    def fastest(rows: pd.DataFrame) -> float:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            model.predict_proba(rows)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    batch = X.iloc[:batch_size]
+    batch_seconds = fastest(batch)
+    return {
+        "predict_row_seconds": fastest(X.iloc[:1]),
+        "predict_batch_rows": len(batch),
+        "predict_rows_per_second": len(batch) / batch_seconds,
+    }
+
+
+def select_model(
+    X: pd.DataFrame,
+    y: pd.Series,
+    candidates: list[str] = None,
+    cv: int = 5,
+    n_jobs: int = -1,
+    cache_dir: str = None,
+) -> pd.DataFrame:
+    """
+    Cross-validate candidate pipelines with all SELECTION_METRICS in one pass per
+    candidate, the folds fitted in parallel, and measure their inference cost.
+
+    :param X: Training features.
+    :param y: Training labels.
+    :param candidates: Names of CANDIDATES to evaluate, all by default.
+    :param cv: Number of folds.
+    :param n_jobs: Folds fitted in parallel, -1 for all cores.
+    :param cache_dir: Directory caching the fitted scalers across candidates,
+        a temporary directory by default.
+    :return: One row per candidate, sorted by mean ROC-AUC.
+    """
+    candidates = candidates or list(CANDIDATES)
+    rows = []
+    if cache_dir:
+        cache = contextlib.nullcontext(cache_dir)
+    else:
+        cache = tempfile.TemporaryDirectory()
+    with cache as memory:
+        for candidate in candidates:
+            scores = cross_validate(
+                build_pipeline(candidate, memory=memory),
+                X,
+                y,
+                cv=cv,
+                scoring=list(SELECTION_METRICS),
+                n_jobs=n_jobs,
+                return_estimator=True,
+            )
+            row = {"candidate": candidate}
+            for metric in SELECTION_METRICS:
+                row[metric] = scores[f"test_{metric}"].mean()
+                row[f"{metric}_std"] = scores[f"test_{metric}"].std()
+            row["fit_seconds"] = scores["fit_time"].mean()
+            row["score_seconds"] = scores["score_time"].mean()
+            row.update(measure_latency(scores["estimator"][0], X))
+            rows.append(row)
+            logger.info(
+                f"{candidate:<18} ROC-AUC {row['roc_auc']:.4f} "
+                f"(+/- {row['roc_auc_std']:.4f}), fit {row['fit_seconds']:.2f} s, "
+                f"predict {row['predict_row_seconds'] * 1e3:.2f} ms/row, "
+                f"{row['predict_rows_per_second']:.0f} rows/s"
+            )
+    return (
+        pd.DataFrame(rows)
+        .sort_values("roc_auc", ascending=False, kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+def save_selection(results: pd.DataFrame, path: str) -> None:
+    """
+    Save the model selection results as JSON.
+
+    :param results: Output of select_model.
+    :param path: Path of the report.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results.to_dict(orient="records"), f, indent=2)
+    logger.info(f"Model selection saved to {path}")
+
+
 def train_model(pipeline: Pipeline, X_train: pd.DataFrame, y_train: pd.Series) -> None:
     """
     Train the model on the training data.
@@ -89,6 +240,52 @@ def save_model(pipeline: Pipeline, model_path: str) -> None:
     logger.info(f"Model saved to {model_path}")
 
 
+def export_scorer(pipeline: Pipeline, scorer_path: str) -> None:
+    """
+    Export the fused linear scorer of the model, which Search loads without sklearn.
+
+    :param pipeline: Trained machine learning pipeline.
+    :param scorer_path: Path to save the scorer (.npz).
+    """
+    scorer = compile_linear_scorer(pipeline)
+    if scorer is None:
+        logger.info("The model cannot be fused into a linear scorer, not exported")
+        # a scorer exported from a previous model would shadow the new one
+        if os.path.exists(scorer_path):
+            os.remove(scorer_path)
+        return
+    scorer.save(scorer_path)
+    logger.info(f"Scorer exported to {scorer_path}")
+
+
+def write_manifest(
+    pipeline: Pipeline, X: pd.DataFrame, model_path: str, scorer_path: str
+) -> None:
+    """
+    Save the model manifest (features, dtype, file hashes, measured inference cost
+    of each scoring backend) next to the model, see src/models/manifest.py.
+
+    :param pipeline: Trained machine learning pipeline, already saved.
+    :param X: Features the latency measurements draw their batches from.
+    :param model_path: Path of the saved model.
+    :param scorer_path: Path of the exported scorer (if any).
+    """
+    sample = X.iloc[: max(BATCH_SIZES)]
+    manifest = build_manifest(pipeline, sample, FEATURES, model_path, scorer_path)
+    path = manifest_path(model_path)
+    save_manifest(manifest, path)
+    for backend, entry in manifest["backends"].items():
+        timings = entry["batch_sizes"]
+        logger.info(
+            f"{backend:<8} compatible={entry['compatible']} "
+            + ", ".join(
+                f"batch {size}: {timing['rows_per_second']:.0f} rows/s"
+                for size, timing in timings.items()
+            )
+        )
+    logger.info(f"Manifest saved to {path}")
+
+
 def evaluate_on_test_set(
     pipeline: Pipeline, X_test: pd.DataFrame, y_test: pd.Series
 ) -> None:
@@ -106,30 +303,108 @@ def evaluate_on_test_set(
     logger.info(f"ROC-AUC Score: {roc_auc_score(y_test, y_score)}")
 
 
-if __name__ == "__main__":
-    df = pd.read_csv(Paths.processed_dataset_path)
-    logger.info(f"Data loaded from {Paths.processed_dataset_path}")
-
-    logger.info(f"Data Info:\n{df.info()}")
-    logger.info(f"First few rows:\n{df.head().T}")
-
-    # Create features and labels
-    X, y = create_features_and_labels(df)
-
-    # Split data for evaluation purposes
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
+def train_streaming_model(
+    path: str, chunk_size: int = DEFAULT_TRAIN_CHUNK_SIZE, epochs: int = DEFAULT_EPOCHS
+) -> None:
+    """
+    Train the logistic SGD model out of core (see src/models/incremental.py), log
+    its held-out metrics and save it with its scorer and manifest. The saved model
+    is the one fitted on the training stream, another pass over the whole
+    dataset would cost as much as the training itself.
+
+    :param path: Processed column store directory or CSV file.
+    :param chunk_size: Rows per chunk.
+    :param epochs: Passes of SGD over the training stream.
+    """
+    pipeline, metrics = fit_streaming(path, chunk_size, epochs)
+    logger.info("Confusion Matrix:\n" + str(np.array(metrics["confusion_matrix"])))
+    logger.info(
+        f"Held-out rows {metrics['rows']}: precision {metrics['precision']:.4f}, "
+        f"recall {metrics['recall']:.4f}, log loss {metrics['log_loss']:.4f}"
     )
+    logger.info(f"ROC-AUC Score: {metrics['roc_auc']}")
 
-    # Build the pipeline
-    pipeline = build_pipeline()
-
-    # Train the model on the training data
-    train_model(pipeline, X_train, y_train)
+    save_model(pipeline, Paths.match_model_path)
+    export_scorer(pipeline, Paths.match_scorer_path)
+    _, sample, _ = next(iter_feature_chunks(path, max(BATCH_SIZES)))
+    write_manifest(pipeline, sample, Paths.match_model_path, Paths.match_scorer_path)
 
-    # Evaluate on the test set
-    evaluate_on_test_set(pipeline, X_test, y_test)
 
-    # Train on the entire dataset and save the model
-    train_model(pipeline, X, y)
-    save_model(pipeline, Paths.match_model_path)
+if __name__ == "__main__":
+    configure_logging()
+
+    parser = argparse.ArgumentParser(description="Train the matching model.")
+    parser.add_argument(
+        "--model",
+        choices=[*CANDIDATES, "best"],
+        default="logreg",
+        help="candidate to train, best picks the highest ROC-AUC of the selection",
+    )
+    parser.add_argument(
+        "--select", action="store_true", help="cross-validate the candidates first"
+    )
+    parser.add_argument(
+        "--candidate",
+        action="append",
+        choices=list(CANDIDATES),
+        help="candidate of the selection, can be repeated (default: all)",
+    )
+    parser.add_argument("--cv", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="train a logistic SGD model out of core, chunk by chunk",
+    )
+    parser.add_argument(
+        "--data",
+        default=None,
+        help="processed column store or CSV file to stream (default: processed store)",
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_TRAIN_CHUNK_SIZE)
+    parser.add_argument("--epochs", type=int, default=DEFAULT_EPOCHS)
+    args = parser.parse_args()
+
+    if args.stream:
+        train_streaming_model(
+            args.data or Paths.processed_dataset_path, args.chunk_size, args.epochs
+        )
+    else:
+        # Load features (memory-mapped) and labels
+        X, y = load_features_and_labels(Paths.processed_dataset_path)
+        logger.info(f"Data loaded from {Paths.processed_dataset_path}")
+
+        logger.info(f"Data Info:\n{X.info()}")
+        logger.info(f"First few rows:\n{X.head().T}")
+
+        # Split data for evaluation purposes
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.2, random_state=42
+        )
+
+        # Compare the candidates on the training split
+        candidate = args.model
+        if args.select or candidate == "best":
+            selection = select_model(
+                X_train, y_train, args.candidate, cv=args.cv, n_jobs=args.n_jobs
+            )
+            logger.info(f"Model selection:\n{selection.to_string()}")
+            save_selection(selection, Paths.model_selection_path)
+            if candidate == "best":
+                candidate = selection["candidate"].iloc[0]
+        logger.info(f"Training {candidate}")
+
+        # Build the pipeline
+        pipeline = build_pipeline(candidate)
+
+        # Train the model on the training data
+        train_model(pipeline, X_train, y_train)
+
+        # Evaluate on the test set
+        evaluate_on_test_set(pipeline, X_test, y_test)
+
+        # Train on the entire dataset and save the model
+        train_model(pipeline, X, y)
+        save_model(pipeline, Paths.match_model_path)
+        export_scorer(pipeline, Paths.match_scorer_path)
+        write_manifest(pipeline, X, Paths.match_model_path, Paths.match_scorer_path)
@@ -0,0 +1,215 @@
+import functools
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+
+# Upper bounds (seconds) of the stage duration histogram buckets
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    float("inf"),
+)
+
+
+class StageStats:
+    """
+    Aggregated measurements of one stage.
+    """
+
+    def __init__(self, buckets: tuple) -> None:
+        self.calls = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.memory_bytes = 0
+        self.bucket_counts = [0] * len(buckets)
+
+
+class Instrumentation:
+    """
+    Opt-in per-stage instrumentation. Disabled by default: instrumented
+    functions then only pay one attribute lookup.
+    Records wall time, rows processed and (with track_memory) the net memory
+    allocated per stage, as counters and a duration histogram.
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS) -> None:
+        self.enabled = False
+        self.track_memory = False
+        self.buckets = buckets
+        self.stats = defaultdict(lambda: StageStats(self.buckets))
+        self.gauges = {}  # name -> last value, e.g. the chosen predict batch size
+        self.callbacks = []
+        self.lock = threading.Lock()
+
+    def enable(self, track_memory: bool = False) -> None:
+        """
+        :param track_memory: Also record allocated memory (starts tracemalloc,
+            which slows down Python heavy stages).
+        """
+        self.track_memory = track_memory
+        if track_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        with self.lock:
+            self.stats.clear()
+            self.gauges.clear()
+
+    def add_callback(self, callback) -> None:
+        """
+        Registers callback(stage, seconds, rows, memory_bytes) called after every stage.
+        """
+        self.callbacks.append(callback)
+
+    def record(
+        self, stage: str, seconds: float, rows: int = 0, memory_bytes: int = 0
+    ) -> None:
+        with self.lock:
+            stats = self.stats[stage]
+            stats.calls += 1
+            stats.rows += rows
+            stats.seconds += seconds
+            stats.memory_bytes += memory_bytes
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    stats.bucket_counts[i] += 1
+                    break
+        for callback in self.callbacks:
+            callback(stage, seconds, rows, memory_bytes)
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """
+        Records the current value of a setting chosen at runtime.
+        """
+        with self.lock:
+            self.gauges[name] = value
+
+    def measure(self, stage: str, rows: int, func, *args, **kwargs):
+        """
+        Calls func and records it as stage.
+        """
+        track_memory = self.track_memory and tracemalloc.is_tracing()
+        memory_before = tracemalloc.get_traced_memory()[0] if track_memory else 0
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        memory = (
+            tracemalloc.get_traced_memory()[0] - memory_before if track_memory else 0
+        )
+        self.record(stage, seconds, rows, memory)
+        return result
+
+    def gauge_snapshot(self) -> dict:
+        """
+        :return: Dictionary of gauge name -> last value.
+        """
+        with self.lock:
+            return dict(self.gauges)
+
+    def snapshot(self) -> dict:
+        """
+        :return: Dictionary of stage -> calls, rows, seconds and memory_bytes.
+        """
+        with self.lock:
+            return {
+                stage: {
+                    "calls": stats.calls,
+                    "rows": stats.rows,
+                    "seconds": stats.seconds,
+                    "memory_bytes": stats.memory_bytes,
+                }
+                for stage, stats in self.stats.items()
+            }
+
+    def prometheus_text(self, prefix: str = "matching") -> str:
+        """
+        Renders the measurements in the Prometheus text exposition format.
+        """
+        lines = [
+            f"# HELP {prefix}_stage_seconds Wall time per stage.",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        with self.lock:
+            stats = dict(self.stats)
+            for stage, s in stats.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, s.bucket_counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(
+                        f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} '
+                        f"{cumulative}"
+                    )
+                lines.append(
+                    f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {s.seconds}'
+                )
+                lines.append(
+                    f'{prefix}_stage_seconds_count{{stage="{stage}"}} {s.calls}'
+                )
+            for name, attribute, help_text in (
+                ("rows_total", "rows", "Rows processed per stage."),
+                (
+                    "memory_bytes_total",
+                    "memory_bytes",
+                    "Net memory allocated per stage.",
+                ),
+            ):
+                lines.append(f"# HELP {prefix}_stage_{name} {help_text}")
+                lines.append(f"# TYPE {prefix}_stage_{name} counter")
+                for stage, s in stats.items():
+                    lines.append(
+                        f'{prefix}_stage_{name}{{stage="{stage}"}} {getattr(s, attribute)}'
+                    )
+            for name, value in self.gauges.items():
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                lines.append(f"{prefix}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+instrumentation = Instrumentation()
+
+
+def first_len(*args, **kwargs) -> int:
+    return len(args[0])
+
+
+def instrumented(stage: str = None, rows=first_len):
+    """
+    Decorator recording every call of a function as a stage when
+    instrumentation is enabled.
+
+    :param stage: Stage name, the function name by default.
+    :param rows: Function of the call arguments returning the rows processed.
+    """
+
+    def decorator(func):
+        name = stage or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not instrumentation.enabled:
+                return func(*args, **kwargs)
+            return instrumentation.measure(
+                name, rows(*args, **kwargs), func, *args, **kwargs
+            )
+
+        return wrapper
+
+    return decorator
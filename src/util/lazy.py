@@ -0,0 +1,34 @@
+import importlib.util
+import sys
+
+# pandas and sklearn take most of the startup time of the matching entry points,
+# while the dict and records paths only need numpy. Modules on those paths import
+# pandas lazily, so it is only loaded by the code that actually uses it.
+
+
+def lazy_import(name: str):
+    """
+    Returns a module whose import is deferred to its first attribute access.
+
+    :param name: Absolute module name.
+    :return: The module (already imported, or lazily loading).
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def is_dataframe(obj) -> bool:
+    """
+    isinstance(obj, pd.DataFrame) without importing pandas.
+    """
+    return type(obj).__module__.startswith("pandas") and isinstance(
+        obj, sys.modules["pandas"].DataFrame
+    )
@@ -1,8 +1,14 @@
 import logging
 
 log_fmt = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-logging.basicConfig(level=logging.INFO, format=log_fmt)
 
 logger = logging.getLogger(__name__)
 
-logger.info("logger initialized")
+
+def configure_logging(level: int = logging.INFO) -> None:
+    """
+    Sets up the root logging handler. Called by the command line entry points,
+    importing the package leaves the logging configuration alone.
+    """
+    logging.basicConfig(level=level, format=log_fmt)
+    logger.info("logger initialized")
@@ -1,21 +1,49 @@
 import os
-from dotenv import load_dotenv, find_dotenv
 
-# read dotenv
-load_dotenv(find_dotenv())
+
+class LazyPaths(type):
+    """
+    Resolves the paths on first access, so importing this module does not read
+    the .env file.
+    """
+
+    def __getattr__(cls, name: str):
+        if cls._resolved:
+            raise AttributeError(name)
+        cls.resolve()
+        return getattr(cls, name)
 
 
 # open Working director
-class Paths:
-    working_dir = os.getenv("WORKING_DIR")
+class Paths(metaclass=LazyPaths):
+    _resolved = False
+
+    @classmethod
+    def resolve(cls) -> None:
+        from dotenv import load_dotenv, find_dotenv
+
+        # read dotenv
+        load_dotenv(find_dotenv())
+
+        cls.working_dir = working_dir = os.getenv("WORKING_DIR")
 
-    data_processed_dir = f"{working_dir}/data/processed"
-    data_raw_dir = f"{working_dir}/data/raw"
-    data_interim_dir = f"{working_dir}/data/interim"
+        cls.data_processed_dir = f"{working_dir}/data/processed"
+        cls.data_raw_dir = f"{working_dir}/data/raw"
+        cls.data_interim_dir = f"{working_dir}/data/interim"
 
-    models_dir = f"{working_dir}/models"
+        cls.models_dir = f"{working_dir}/models"
+        cls.benchmarks_dir = f"{working_dir}/reports/benchmarks"
+        cls.model_selection_path = f"{working_dir}/reports/model_selection.json"
 
-    match_model_path = f"{models_dir}/my_model.joblib"
-    raw_dataset_path = f"{data_raw_dir}/data.json"
-    interim_dataset_path = f"{data_interim_dir}/data.pkl"
-    processed_dataset_path = f"{data_processed_dir}/data.csv"
+        cls.match_model_path = f"{cls.models_dir}/my_model.joblib"
+        # coefficients of the fused scorer, loads without sklearn
+        cls.match_scorer_path = f"{cls.models_dir}/my_model.npz"
+        # roles, seniorities and languages fitted by make_dataset.py
+        cls.vocabularies_path = f"{cls.models_dir}/my_model.vocab.json"
+        # MatchingIndex snapshot the UI warm starts from, see src/app/snapshot.py
+        cls.index_snapshot_path = f"{cls.models_dir}/index.snap"
+        cls.raw_dataset_path = f"{cls.data_raw_dir}/data.json"
+        # column store directories, see src/data/columnar.py
+        cls.interim_dataset_path = f"{cls.data_interim_dir}/data.cols"
+        cls.processed_dataset_path = f"{cls.data_processed_dir}/data.cols"
+        cls._resolved = True
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from src.data.make_dataset import normalize_and_merge
+from src.data.synthetic import generate_profiles
+from src.features.build_features import process_data_pipeline
+from src.features.feature_utils import FEATURES, LABEL
+
+
+@pytest.fixture(scope="session")
+def profiles() -> tuple[list[dict], list[dict]]:
+    """
+    Row-aligned synthetic talents and jobs.
+    """
+    talents, jobs = generate_profiles(300, 300, seed=7)
+    return talents, jobs
+
+
+@pytest.fixture(scope="session")
+def features(profiles) -> pd.DataFrame:
+    """
+    Features of the synthetic pairs, with a label that depends on them.
+    """
+    df = normalize_and_merge(*profiles)
+    df[LABEL] = 0
+    X = process_data_pipeline(df, FEATURES, LABEL)
+    rng = np.random.default_rng(7)
+    logit = 3 * X["skill_match_ratio"] + X["degree_level_matched"] - 1
+    X[LABEL] = (rng.random(len(X)) < 1 / (1 + np.exp(-logit))).astype(int)
+    return X
+
+
+@pytest.fixture(scope="session")
+def pipeline(features) -> Pipeline:
+    """
+    StandardScaler + LogisticRegression fitted on the synthetic features.
+    """
+    model = Pipeline(
+        [("scaler", StandardScaler()), ("classifier", LogisticRegression())]
+    )
+    return model.fit(features[FEATURES], features[LABEL])
+
+
+@pytest.fixture()
+def model_path(tmp_path, pipeline) -> str:
+    """
+    The fitted pipeline saved alone (no manifest, scorer or vocabularies).
+    """
+    import joblib
+
+    path = str(tmp_path / "model.joblib")
+    joblib.dump(pipeline, path)
+    return path
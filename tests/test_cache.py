@@ -0,0 +1,93 @@
+import json
+import os
+
+import joblib
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+import src.app.cache as cache_module
+from src.app.cache import MatchCache, content_hash
+from src.app.search import Search
+from src.features.feature_utils import FEATURES, LABEL
+
+
+def rows(results: list[dict]) -> list[tuple]:
+    """
+    Results as comparable tuples, independent of the order of equal scores.
+    """
+    return sorted(
+        (json.dumps(r["talent"]), json.dumps(r["job"]), int(r["label"]), r["score"])
+        for r in results
+    )
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash({"a": 1, "b": [1, 2]}) == content_hash({"b": [1, 2], "a": 1})
+    assert content_hash({"a": 1}) != content_hash({"a": 2})
+
+
+def test_lru_eviction():
+    cache = MatchCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # b is now the least recently used
+    cache.put("c", 3)
+    assert cache.get_many(["a", "b", "c"]) == [1, None, 3]
+    stats = cache.stats()
+    assert (stats["size"], stats["evictions"]) == (2, 1)
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+
+
+def test_ttl_expiry(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    cache = MatchCache(10, ttl=5)
+    cache.put("a", 1)
+    now[0] += 4
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0 and cache.stats()["expirations"] == 1
+
+
+def test_cached_results_match_uncached(model_path, profiles):
+    talents, jobs = profiles[0][:12], profiles[1][:9]
+    uncached = Search(model_path, engine="encoded")
+    cached = Search(model_path, engine="encoded", cache_size=10_000)
+
+    expected = rows(uncached.match_bulk(talents, jobs))
+    assert rows(cached.match_bulk(talents[:5], jobs)) == rows(
+        uncached.match_bulk(talents[:5], jobs)
+    )
+    # partial hits: only the pairs of the new talents are scored
+    assert rows(cached.match_bulk(talents, jobs)) == expected
+    assert cached.cache.stats()["hits"] == 5 * len(jobs)
+    assert rows(cached.match_bulk(talents, jobs)) == expected
+    assert len(cached.cache) == len(talents) * len(jobs)
+
+    pairs = cached.match_pairs(talents[:9], jobs)
+    assert pairs == uncached.match_pairs(talents[:9], jobs)
+    single = cached.match(talents[0], jobs[0])
+    assert single["score"] == uncached.match(talents[0], jobs[0])["score"]
+
+
+def test_model_change_invalidates_cache(model_path, profiles, features):
+    talents, jobs = profiles
+    search = Search(model_path, cache_size=100, model_check_interval=0)
+    before = search.match(talents[0], jobs[0])
+    version = search.model_version
+
+    # a model with the opposite labels scores every pair differently
+    flipped = Pipeline(
+        [("scaler", StandardScaler()), ("classifier", LogisticRegression())]
+    ).fit(features[FEATURES], 1 - features[LABEL])
+    joblib.dump(flipped, model_path)
+    stat = os.stat(model_path)
+    os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    after = search.match(talents[0], jobs[0])
+    assert search.model_version != version
+    assert search.cache.stats()["invalidations"] == 1
+    assert after["score"] == Search(model_path).match(talents[0], jobs[0])["score"]
+    assert after["score"] != before["score"]
@@ -0,0 +1,88 @@
+import json
+import numpy as np
+import pandas as pd
+from src.data.columnar import ColumnStoreWriter, read_columns, read_schema
+from src.data.make_dataset import ingest_raw_dataset
+
+
+def write_chunks(path, chunks):
+    with ColumnStoreWriter(str(path)) as writer:
+        for chunk in chunks:
+            writer.append(pd.DataFrame(chunk))
+    return read_schema(str(path))["columns"], read_columns(str(path))
+
+
+def test_int_column_widens_to_float(tmp_path):
+    columns, df = write_chunks(
+        tmp_path / "store", [{"salary": [1, 2]}, {"salary": [2.5, 3]}]
+    )
+    assert columns["salary"]["kind"] == "numeric"
+    assert df["salary"].dtype == np.float64
+    assert df["salary"].tolist() == [1.0, 2.0, 2.5, 3.0]
+
+
+def test_missing_values_widen_to_json(tmp_path):
+    columns, df = write_chunks(
+        tmp_path / "store",
+        [
+            {"flag": [True, False], "title": ["a", "b"]},
+            {"flag": [None, True], "title": ["c", 5]},
+        ],
+    )
+    assert columns["flag"]["kind"] == columns["title"]["kind"] == "json"
+    assert df["flag"].tolist() == [True, False, None, True]
+    assert df["title"].tolist() == ["a", "b", "c", 5]
+
+
+def test_record_field_widens_to_json(tmp_path):
+    chunks = [
+        {"languages": [[{"title": "English", "must_have": True}]]},
+        {"languages": [[{"title": "German"}, {"title": "French", "must_have": False}]]},
+    ]
+    _, df = write_chunks(tmp_path / "store", chunks)
+    assert df["languages"].tolist() == [
+        [{"title": "English", "must_have": True}],
+        [
+            {"title": "German", "must_have": None},
+            {"title": "French", "must_have": False},
+        ],
+    ]
+
+
+def test_ingest_widens_later_chunks(tmp_path):
+    records = []
+    for i in range(25):
+        talent = {
+            "languages": [{"title": "English", "rating": "B2"}],
+            "job_roles": ["data-scientist"],
+            "seniority": "junior",
+            "salary_expectation": 50000 + i,
+            "degree": "bachelor",
+        }
+        job = {
+            "languages": [{"title": "English", "rating": "B1", "must_have": True}],
+            "job_roles": ["data-scientist"],
+            "seniorities": ["junior"],
+            "max_salary": 60000,
+            "min_degree": "bachelor",
+        }
+        if i == 15:
+            talent["salary_expectation"] = 51234.5
+            del job["languages"][0]["must_have"]
+        records.append({"talent": talent, "job": job, "label": i % 2})
+    raw_path = tmp_path / "data.json"
+    raw_path.write_text(json.dumps(records))
+
+    interim_path = str(tmp_path / "interim")
+    processed_path = str(tmp_path / "processed")
+    n_rows = ingest_raw_dataset(
+        str(raw_path), interim_path, processed_path, chunk_size=10
+    )
+    assert n_rows == 25
+    df = read_columns(interim_path)
+    assert df["talent_salary_expectation"][15] == 51234.5
+    assert df["job_languages"][15] == [
+        {"title": "English", "rating": "B1", "must_have": None}
+    ]
+    assert df["job_languages"][0][0]["must_have"] is True
+    assert len(read_columns(processed_path)) == 25
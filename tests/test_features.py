@@ -0,0 +1,115 @@
+import copy
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.app.search import Search
+from src.data.make_dataset import normalize_and_merge
+from src.features.build_features import process_data_pipeline, process_pair
+from src.features.encoders import Vocabularies
+from src.features.feature_utils import FEATURES, LABEL
+
+
+def edge_cases(talents: list[dict], jobs: list[dict]) -> list[tuple[dict, dict]]:
+    """
+    Pairs with empty lists, unknown degrees and ratings and duplicate entries.
+    """
+    talent, job = copy.deepcopy(talents[0]), copy.deepcopy(jobs[0])
+    english = {"title": "English", "rating": "B2"}
+    return [
+        ({**talent, "job_roles": []}, job),
+        (talent, {**job, "job_roles": []}),
+        ({**talent, "languages": []}, job),
+        (talent, {**job, "languages": []}),
+        ({**talent, "languages": []}, {**job, "languages": [], "job_roles": []}),
+        ({**talent, "degree": "phd"}, job),
+        (talent, {**job, "min_degree": "unknown"}),
+        ({**talent, "languages": [{"title": "English", "rating": "native"}]}, job),
+        (
+            talent,
+            {
+                **job,
+                "languages": [
+                    {"title": "English", "rating": "fluent", "must_have": True}
+                ],
+            },
+        ),
+        ({**talent, "job_roles": talent["job_roles"] * 2}, job),
+        (talent, {**job, "job_roles": job["job_roles"] * 2}),
+        (
+            {**talent, "languages": [english, {"title": "English", "rating": "A1"}]},
+            {**job, "languages": [{**english, "must_have": True}] * 2},
+        ),
+        (
+            {**talent, "languages": [english]},
+            {
+                **job,
+                "languages": [{"title": "German", "rating": "A1", "must_have": True}],
+            },
+        ),
+    ]
+
+
+@pytest.fixture(scope="module")
+def pairs(profiles) -> tuple[list[dict], list[dict]]:
+    talents, jobs = profiles
+    edges = edge_cases(talents, jobs)
+    return (
+        list(talents) + [talent for talent, _ in edges],
+        list(jobs) + [job for _, job in edges],
+    )
+
+
+@pytest.mark.parametrize("engine", ["pandas", "numpy"])
+def test_process_pair_matches_pipeline(pairs, engine):
+    talents, jobs = pairs
+    df = normalize_and_merge(talents, jobs)
+    df[LABEL] = 0
+    expected = process_data_pipeline(df, FEATURES, LABEL, engine=engine)[FEATURES]
+    actual = pd.DataFrame(
+        [process_pair(talent, job, FEATURES) for talent, job in zip(talents, jobs)],
+        columns=FEATURES,
+    )
+    np.testing.assert_array_equal(actual.to_numpy(), expected.to_numpy(np.float64))
+
+
+def test_dict_engine_matches_pandas_engine(model_path, pairs):
+    search = Search(model_path)
+    for talent, job in zip(*pairs):
+        expected = search.match(talent, job, engine="pandas")
+        actual = search.match(talent, job, engine="dict")
+        assert (actual["label"], actual["score"]) == (
+            expected["label"],
+            expected["score"],
+        )
+
+
+@pytest.mark.parametrize("ignore_label", [False, True])
+def test_numpy_engine_matches_pandas_engine(pairs, ignore_label):
+    talents, jobs = pairs
+    df = normalize_and_merge(talents, jobs)
+    df[LABEL] = np.arange(len(df)) % 2
+    # inference passes no label, like Search
+    label = [] if ignore_label else LABEL
+    expected = process_data_pipeline(
+        df.copy(), FEATURES, label, ignore_label=ignore_label
+    )
+    actual = process_data_pipeline(
+        df.copy(), FEATURES, label, ignore_label=ignore_label, engine="numpy"
+    )
+    pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+
+
+def test_numpy_engine_with_fitted_vocabularies(pairs, profiles):
+    talents, jobs = pairs
+    # fitted on part of the data, the rest has values they have not seen
+    df = normalize_and_merge(talents, jobs)
+    df[LABEL] = 0
+    vocabularies = Vocabularies().fit(df.iloc[:20])
+    sizes = [len(v) for v in vars(vocabularies).values()]
+    expected = process_data_pipeline(df.copy(), FEATURES, LABEL)
+    actual = process_data_pipeline(
+        df.copy(), FEATURES, LABEL, engine="numpy", vocabularies=vocabularies
+    )
+    pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+    assert [len(v) for v in vars(vocabularies).values()] == sizes
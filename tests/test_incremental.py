@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from sklearn.metrics import log_loss, roc_auc_score
+
+from src.features.feature_utils import FEATURES, LABEL
+from src.models.incremental import StreamingMetrics, fit_streaming, holdout_mask
+
+
+def test_holdout_mask_is_deterministic():
+    rows = np.arange(100_000)
+    mask = holdout_mask(rows, 0.2, seed=1)
+    assert abs(mask.mean() - 0.2) < 0.01
+    # the split of a row does not depend on the chunk it is read in
+    assert np.array_equal(mask[500:700], holdout_mask(rows[500:700], 0.2, seed=1))
+    assert not np.array_equal(mask, holdout_mask(rows, 0.2, seed=2))
+    assert not holdout_mask(rows, 0.0).any()
+
+
+def test_streaming_metrics_match_sklearn():
+    rng = np.random.default_rng(0)
+    y_true = rng.integers(0, 2, 5000)
+    y_score = np.clip(0.3 * y_true + 0.7 * rng.random(5000), 0, 1)
+    metrics = StreamingMetrics()
+    for start in range(0, 5000, 700):
+        metrics.update(y_true[start : start + 700], y_score[start : start + 700])
+    result = metrics.result()
+
+    assert result["rows"] == 5000
+    assert result["positives"] == int(y_true.sum())
+    assert result["roc_auc"] == pytest.approx(roc_auc_score(y_true, y_score), abs=1e-3)
+    assert result["log_loss"] == pytest.approx(log_loss(y_true, y_score), rel=1e-6)
+    y_pred = (y_score >= 0.5).astype(int)
+    assert result["accuracy"] == pytest.approx((y_pred == y_true).mean())
+
+
+@pytest.fixture()
+def separable(features):
+    """
+    The synthetic features with a label that is linear in two of them.
+    """
+    df = features[FEATURES].copy()
+    df[LABEL] = (df["seniority_match"] + df["language_match_ratio"] > 0.7).astype(int)
+    return df
+
+
+@pytest.fixture()
+def features_csv(tmp_path, separable) -> str:
+    path = str(tmp_path / "features.csv")
+    separable.to_csv(path, index=False)
+    return path
+
+
+def test_fit_streaming_learns(features_csv, separable):
+    pipeline, result = fit_streaming(features_csv, chunk_size=64, epochs=5)
+    held_out = holdout_mask(np.arange(len(separable)), 0.2)
+    assert result["rows"] == int(held_out.sum())
+    assert result["positives"] == int(separable[LABEL][held_out].sum())
+    assert result["roc_auc"] > 0.9
+    scores = pipeline.predict_proba(separable[FEATURES])[:, 1]
+    assert roc_auc_score(separable[LABEL], scores) > 0.9
+
+
+def test_fit_streaming_skips_held_out_chunks(features_csv):
+    # with 2 rows per chunk some chunks are entirely held out
+    pipeline, result = fit_streaming(features_csv, chunk_size=2, epochs=1)
+    assert result["rows"] > 0
@@ -0,0 +1,112 @@
+import pytest
+
+from src.app.search import Search
+
+K = 3
+
+
+@pytest.fixture()
+def search(model_path) -> Search:
+    return Search(model_path, engine="encoded")
+
+
+def in_slot_order(pool, entities: dict) -> list:
+    return sorted(entities, key=lambda entity_id: pool.slots[entity_id])
+
+
+def check(index, search: Search, talents: dict, jobs: dict, k: int = K) -> None:
+    """
+    Compares every kept list and pair of the index with Search on the live pools,
+    listed in slot order (ties go to the lowest slot in both).
+    """
+    talent_ids = in_slot_order(index.talents, talents)
+    job_ids = in_slot_order(index.jobs, jobs)
+    assert (len(index.talents), len(index.jobs)) == (len(talents), len(jobs))
+    talent_list = [talents[i] for i in talent_ids]
+    job_list = [jobs[i] for i in job_ids]
+
+    for talent_id in talent_ids:
+        expected = search.top_k([talents[talent_id]], job_list, k, per="talent")
+        results = index.best_jobs(talent_id, k)
+        assert [(r["job"], r["label"], r["score"]) for r in results] == [
+            (e["job"], int(e["label"]), float(e["score"])) for e in expected
+        ]
+        assert all(r["talent"] == talents[talent_id] for r in results)
+    for job_id in job_ids:
+        expected = search.top_k(talent_list, [jobs[job_id]], k, per="job")
+        results = index.best_talents(job_id, k)
+        assert [(r["talent"], r["label"], r["score"]) for r in results] == [
+            (e["talent"], int(e["label"]), float(e["score"])) for e in expected
+        ]
+    for talent_id in talent_ids[:3]:
+        for job_id in job_ids[:3]:
+            expected = search.match(talents[talent_id], jobs[job_id])
+            assert index.match(talent_id, job_id)["score"] == expected["score"]
+
+
+def test_add_update_remove(search, profiles):
+    pool_talents, pool_jobs = profiles
+    index = search.create_index(k=K)
+    talents = {f"t{i}": pool_talents[i] for i in range(8)}
+    jobs = {f"j{i}": pool_jobs[i] for i in range(6)}
+    index.upsert_talents(talents)
+    index.upsert_jobs(jobs)
+    check(index, search, talents, jobs)
+
+    jobs["j6"] = pool_jobs[6]
+    index.add_job("j6", pool_jobs[6])
+    talents["t8"] = pool_talents[8]
+    index.add_talent("t8", pool_talents[8])
+    check(index, search, talents, jobs)
+
+    # the best talent of a job changes profile
+    best = index.best_talents("j0")[0]["talent_id"]
+    talents[best] = pool_talents[20]
+    index.update_talent(best, pool_talents[20])
+    jobs["j1"] = pool_jobs[21]
+    index.update_job("j1", pool_jobs[21])
+    check(index, search, talents, jobs)
+
+    # removing the best entities rebuilds the lists they were part of
+    for talent_id in {index.best_talents(j)[0]["talent_id"] for j in ("j2", "j3")}:
+        del talents[talent_id]
+        index.remove_talent(talent_id)
+    job_id = index.best_jobs("t4")[0]["job_id"]
+    del jobs[job_id]
+    index.remove_job(job_id)
+    check(index, search, talents, jobs)
+    check(index, search, talents, jobs, k=K + 4)  # longer than the kept lists
+
+    # freed slots are reused
+    n_slots, n_free = len(index.talents.ids), len(index.talents.free)
+    added = {f"t{i}": pool_talents[i] for i in range(30, 33)}
+    talents.update(added)
+    index.upsert_talents(added)
+    assert len(index.talents.ids) == n_slots + len(added) - n_free
+    check(index, search, talents, jobs)
+
+    with pytest.raises(KeyError):
+        index.best_jobs(job_id)
+
+
+def test_grows_with_new_vocabulary(search, profiles):
+    pool_talents, pool_jobs = profiles
+    index = search.create_index(k=K)
+    talents = {i: pool_talents[i] for i in range(5)}
+    jobs = {i: pool_jobs[i] for i in range(5)}
+    index.upsert_talents(talents)
+    index.upsert_jobs(jobs)
+    # roles and languages the vocabularies have not seen
+    jobs[5] = dict(
+        pool_jobs[5],
+        job_roles=["astronaut", *pool_jobs[5]["job_roles"]],
+        languages=[{"title": "Klingon", "rating": "C2", "must_have": True}],
+    )
+    talents[5] = dict(
+        pool_talents[5],
+        job_roles=["astronaut"],
+        languages=[{"title": "Klingon", "rating": "C2"}],
+    )
+    index.add_job(5, jobs[5])
+    index.add_talent(5, talents[5])
+    check(index, search, talents, jobs)
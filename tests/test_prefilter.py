@@ -0,0 +1,97 @@
+import json
+
+import joblib
+import numpy as np
+import pytest
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from src.app.prefilter import Constraints, JobIndex
+from src.app.search import Search
+from src.features.build_features import process_pair
+from src.features.feature_utils import FEATURES
+
+# constraint -> pairs it keeps, from the features the full scorer sees
+CONSTRAINTS = [
+    (Constraints(), lambda f: f["skill_match_ratio"] > 0 and f["seniority_match"]),
+    (
+        Constraints(min_shared_roles=0, max_salary_overshoot=0.0),
+        lambda f: f["seniority_match"] and not f["salary_expectation_over_budget"],
+    ),
+    (
+        Constraints(
+            min_shared_roles=0, require_seniority=False, min_language_ratio=0.5
+        ),
+        lambda f: f["language_match_ratio"] >= 0.5 or not f["required_languages"],
+    ),
+]
+
+
+def key(result: dict) -> tuple:
+    return json.dumps(result["talent"]), json.dumps(result["job"])
+
+
+@pytest.fixture(scope="module")
+def pool(profiles):
+    talents, jobs = profiles
+    return talents[:60], jobs[:60]
+
+
+@pytest.mark.parametrize("constraints, keeps", CONSTRAINTS)
+def test_candidates_match_pair_features(pool, constraints, keeps):
+    talents, jobs = pool
+    talent_ids, job_ids = JobIndex(jobs).candidate_pairs(talents, constraints)
+    expected = [
+        (t, j)
+        for t, talent in enumerate(talents)
+        for j, job in enumerate(jobs)
+        if keeps(dict(zip(FEATURES, process_pair(talent, job, FEATURES))))
+    ]
+    assert list(zip(talent_ids.tolist(), job_ids.tolist())) == expected
+
+
+@pytest.fixture()
+def constrained_model_path(tmp_path, features) -> str:
+    """
+    A model trained on labels that require a shared role and the seniority, like
+    the hard constraints of the default prefilter.
+    """
+    labels = (features["skill_match_ratio"] > 0) & (features["seniority_match"] == 1)
+    pipeline = Pipeline(
+        [("scaler", StandardScaler()), ("classifier", LogisticRegression(C=100))]
+    ).fit(features[FEATURES], labels.astype(int))
+    path = str(tmp_path / "constrained.joblib")
+    joblib.dump(pipeline, path)
+    return path
+
+
+def test_pruned_pairs_are_rejected_by_the_scorer(constrained_model_path, pool):
+    talents, jobs = pool
+    search = Search(constrained_model_path, engine="encoded")
+    full = {key(result): result for result in search.match_bulk(talents, jobs)}
+    results, report = search.match_candidates(talents, jobs, block_size=100)
+
+    assert report["n_pairs"] == len(full)
+    assert report["n_candidates"] == len(results) < len(full)
+    candidates = {key(result) for result in results}
+    for result in results:
+        assert result["score"] == full[key(result)]["score"]
+        assert result["label"] == full[key(result)]["label"]
+    pruned = [full[pair] for pair in full.keys() - candidates]
+    assert len(pruned) == report["n_pruned"]
+    assert not any(result["label"] for result in pruned)
+
+
+def test_without_constraints_matches_match_bulk(model_path, pool):
+    talents, jobs = pool
+    search = Search(model_path, engine="encoded")
+    results, report = search.match_candidates(
+        talents, jobs, Constraints(min_shared_roles=0, require_seniority=False)
+    )
+    assert report["n_pruned"] == 0
+    expected = search.match_bulk(talents, jobs)
+    assert sorted(map(key, results)) == sorted(map(key, expected))
+    assert np.array_equal(
+        sorted(r["score"] for r in results), sorted(r["score"] for r in expected)
+    )
@@ -0,0 +1,65 @@
+import numpy as np
+
+from src.app.search import Search
+from src.features.encoders import Vocabularies
+from src.features.encoding import encode_profiles
+from src.features.records import (
+    JobRecords,
+    TalentRecords,
+    as_records,
+    encode_records,
+)
+
+
+def sizes(vocabularies: Vocabularies) -> list[int]:
+    return [len(vocabulary) for vocabulary in vars(vocabularies).values()]
+
+
+def assert_same_encodings(actual: tuple, expected: tuple) -> None:
+    for a, e in zip(actual, expected):
+        for name, value in vars(e).items():
+            other = getattr(a, name)
+            if hasattr(value, "toarray"):
+                value, other = value.toarray(), other.toarray()
+            np.testing.assert_array_equal(other, value, err_msg=name)
+
+
+def test_round_trip(profiles):
+    talents, jobs = profiles
+    records = as_records(talents, jobs)
+    assert records[0].to_dicts() == talents
+    assert records[1].to_dicts() == jobs
+    assert records[1].vocabularies is records[0].vocabularies
+
+
+def test_mixed_inputs_leave_record_vocabularies_unchanged(profiles):
+    talents, jobs = profiles
+    talent_records = TalentRecords.from_dicts(talents[:10])
+    job_records = JobRecords.from_dicts(jobs[:10])
+    before = sizes(talent_records.vocabularies), sizes(job_records.vocabularies)
+    expected = encode_profiles(talents[:10], jobs)
+
+    for pair in (
+        as_records(talent_records, jobs),
+        as_records(talents[:10], job_records),
+        as_records(talent_records, job_records),
+    ):
+        assert pair[1].vocabularies is pair[0].vocabularies
+        assert pair[0].vocabularies is not talent_records.vocabularies
+        assert pair[0].vocabularies is not job_records.vocabularies
+    after = sizes(talent_records.vocabularies), sizes(job_records.vocabularies)
+    assert after == before
+    assert_same_encodings(encode_records(*as_records(talent_records, jobs)), expected)
+
+
+def test_search_accepts_records(model_path, profiles):
+    talents, jobs = profiles[0][:15], profiles[1][:12]
+    search = Search(model_path, engine="encoded")
+    talent_records = TalentRecords.from_dicts(talents, search.vocabularies.copy())
+    before = sizes(talent_records.vocabularies)
+    expected = search.match_bulk(talents, jobs)
+    assert search.match_bulk(talent_records, jobs) == expected
+    assert search.match_bulk(talent_records, JobRecords.from_dicts(jobs)) == expected
+    assert sizes(talent_records.vocabularies) == before
+    single = search.match(talent_records.take([0]), jobs[0])
+    assert single["score"] == search.match(talents[0], jobs[0])["score"]
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from src.features.feature_utils import FEATURES, LABEL
+from src.models.scoring import (
+    LinearScorer,
+    SklearnScorer,
+    compile_linear_scorer,
+    compile_scorer,
+    load_scorer,
+)
+
+
+@pytest.mark.parametrize("dtype, atol", [(np.float64, 1e-12), (np.float32, 1e-5)])
+def test_linear_scorer_matches_pipeline(pipeline, features, dtype, atol):
+    scorer = compile_linear_scorer(pipeline, dtype=dtype)
+    X = features[FEATURES]
+    label, score = scorer.predict(X)
+    np.testing.assert_allclose(score, pipeline.predict_proba(X)[:, 1], atol=atol)
+    if dtype == np.float64:
+        np.testing.assert_array_equal(label, pipeline.predict(X))
+    # plain matrices and shuffled DataFrame columns give the same scores
+    np.testing.assert_allclose(scorer.predict(X.to_numpy())[1], score, atol=atol)
+    np.testing.assert_allclose(scorer.predict(X[FEATURES[::-1]])[1], score, atol=atol)
+
+
+def test_scorer_save_and_load(tmp_path, pipeline, features):
+    path = str(tmp_path / "model.npz")
+    compile_linear_scorer(pipeline).save(path)
+    model, scorer = load_scorer(path)
+    assert model is None and isinstance(scorer, LinearScorer)
+    assert scorer.feature_names == FEATURES
+    X = features[FEATURES]
+    label, score = scorer.predict(X)
+    np.testing.assert_allclose(score, pipeline.predict_proba(X)[:, 1], atol=1e-12)
+    np.testing.assert_array_equal(label, pipeline.predict(X))
+    assert LinearScorer.load(path, dtype=np.float32).dtype == np.float32
+
+
+def test_logistic_sgd_is_fused(features):
+    model = Pipeline(
+        [
+            ("scaler", StandardScaler()),
+            ("classifier", SGDClassifier(loss="log_loss", random_state=0)),
+        ]
+    ).fit(features[FEATURES], features[LABEL])
+    scorer = compile_scorer(model)
+    assert isinstance(scorer, LinearScorer)
+    X = features[FEATURES]
+    np.testing.assert_allclose(
+        scorer.predict(X)[1], model.predict_proba(X)[:, 1], atol=1e-12
+    )
+
+
+def test_unfusable_models_fall_back_to_sklearn(features):
+    model = RandomForestClassifier(n_estimators=5, random_state=0)
+    model.fit(features[FEATURES], features[LABEL])
+    assert compile_linear_scorer(model) is None
+    scorer = compile_scorer(model)
+    assert isinstance(scorer, SklearnScorer)
+    X = features[FEATURES]
+    label, score = scorer.predict(X)
+    np.testing.assert_array_equal(label, model.predict(X))
+    np.testing.assert_array_equal(score, model.predict_proba(X)[:, 1])
+    # matrices get the feature names back
+    np.testing.assert_array_equal(scorer.predict(X.to_numpy())[1], score)
+
+
+def test_unfused_option_uses_sklearn(pipeline):
+    assert isinstance(compile_scorer(pipeline, fused=False), SklearnScorer)
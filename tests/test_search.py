@@ -0,0 +1,30 @@
+import pytest
+from src.app.search import Search
+from src.models.manifest import BACKENDS
+
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_backend_without_manifest(model_path, profiles, backend):
+    search = Search(model_path, backend=backend)
+    assert search.manifest is None
+    assert search.backend == backend
+    talents, jobs = profiles
+    result = search.match(talents[0], jobs[0])
+    assert 0 <= result["score"] <= 1
+
+
+def test_worker_pool_is_kept_across_calls(model_path, profiles):
+    talents, jobs = profiles[0][:40], profiles[1][:30]
+    with Search(model_path, engine="encoded") as search:
+        expected = search.match_bulk(talents, jobs)
+        ranked = search.top_k(talents, jobs, 3, per="job")
+
+        assert search.match_bulk(talents, jobs, n_workers=2, chunk_size=200) == expected
+        pool = search._pool
+        assert search.top_k(talents, jobs, 3, per="job", n_workers=2) == ranked
+        assert search._pool is pool
+
+        search.reload_model(force=True)
+        assert search._pool is not pool and search._pool.n_workers == 2
+        assert search.match_bulk(talents, jobs, n_workers=2, chunk_size=200) == expected
+    assert search._pool is None
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from src.app.search import Search
+from src.app.service import MatchService
+
+
+async def request(port: int, head: str, body: bytes = b"") -> tuple[int, bytes]:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(head.encode("latin-1") + b"\r\n\r\n" + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    status_line, _, rest = response.partition(b"\r\n")
+    return int(status_line.split()[1]), rest.partition(b"\r\n\r\n")[2]
+
+
+async def post(port: int, path: str, payload) -> tuple[int, object]:
+    body = json.dumps(payload).encode()
+    status, data = await request(
+        port, f"POST {path} HTTP/1.1\r\nContent-Length: {len(body)}", body
+    )
+    return status, json.loads(data)
+
+
+def serve(search: Search, client, **options):
+    """
+    Runs the client coroutine against a MatchService listening on a free port.
+    """
+
+    async def main():
+        service = MatchService(search, **options)
+        await service.start(port=0)
+        try:
+            return await client(service)
+        finally:
+            await service.stop()
+
+    return asyncio.run(main())
+
+
+@pytest.fixture()
+def search(model_path) -> Search:
+    with Search(model_path, cache_size=0) as search:
+        yield search
+
+
+def test_concurrent_matches_are_batched(search, profiles):
+    talents, jobs = profiles[0][:40], profiles[1][:40]
+
+    async def client(service):
+        responses = await asyncio.gather(
+            *(
+                post(service.port, "/match", {"talent": talent, "job": job})
+                for talent, job in zip(talents, jobs)
+            )
+        )
+        return responses, service.batcher.n_batches, service.batcher.n_pairs
+
+    responses, n_batches, n_pairs = serve(search, client, max_latency=0.05)
+    assert n_pairs == len(talents)
+    assert n_batches < len(talents)
+    for (status, body), talent, job in zip(responses, talents, jobs):
+        expected = search.match(talent, job)
+        assert status == 200
+        assert body["label"] == int(expected["label"])
+        assert body["score"] == float(expected["score"])
+
+
+def test_malformed_pair_fails_alone(search, profiles):
+    talents, jobs = profiles
+    bad = dict(talents[1], languages=5)
+
+    async def client(service):
+        return await asyncio.gather(
+            *(
+                post(service.port, "/match", {"talent": talent, "job": job})
+                for talent, job in zip([talents[0], bad, talents[2]], jobs)
+            )
+        )
+
+    responses = serve(search, client, max_latency=0.05)
+    assert [status for status, _ in responses] == [200, 400, 200]
+
+
+def test_bad_requests_and_metrics(model_path):
+    async def client(service):
+        port = service.port
+        return [
+            await request(port, "POST /match HTTP/1.1\r\nContent-Length: abc"),
+            await request(port, "POST /match HTTP/1.1\r\nContent-Length: -3"),
+            await request(port, "POST /match HTTP/1.1\r\nContent-Length: 2", b"{x"),
+            await post(port, "/match", {"talent": {}}),
+            await request(port, "GET /nowhere HTTP/1.1"),
+            await request(port, "GET /metrics HTTP/1.1"),
+        ]
+
+    with Search(model_path, cache_size=100) as search:
+        *errors, metrics = serve(search, client)
+    assert [status for status, _ in errors] == [400, 400, 400, 400, 404]
+    assert metrics[0] == 200
+    assert b"matching_cache_maxsize 100" in metrics[1]
+
+
+def test_batches_are_scored_concurrently(search, profiles, monkeypatch):
+    talents, jobs = profiles
+    # each batch waits for another one to be scored at the same time
+    barrier = threading.Barrier(2, timeout=5)
+    match_pairs = search.match_pairs
+
+    def blocking_match_pairs(*args):
+        barrier.wait()
+        return match_pairs(*args)
+
+    monkeypatch.setattr(search, "match_pairs", blocking_match_pairs)
+
+    async def client(service):
+        first = asyncio.create_task(
+            post(service.port, "/match", {"talent": talents[0], "job": jobs[0]})
+        )
+        await asyncio.sleep(0.1)
+        second = post(service.port, "/match", {"talent": talents[1], "job": jobs[1]})
+        return await asyncio.gather(first, second), service.batcher.n_batches
+
+    responses, n_batches = serve(search, client, max_latency=0.01, n_threads=2)
+    assert [status for status, _ in responses] == [200, 200]
+    assert n_batches == 2
@@ -0,0 +1,98 @@
+import mmap
+
+import numpy as np
+import pytest
+
+from src.app.cache import file_hash
+from src.app.matching_index import MatchingIndex
+from src.app.search import Search
+from src.app.snapshot import JsonValues, pack_json, read_snapshot, write_snapshot
+
+
+def base_buffer(array: np.ndarray):
+    while isinstance(array, np.ndarray):
+        array = array.base
+    return array.obj if isinstance(array, memoryview) else array
+
+
+def state(index: MatchingIndex) -> list:
+    """
+    Every kept list and profile of an index.
+    """
+    return [
+        *(index.best_jobs(i) for i in sorted(index.talents.slots)),
+        *(index.best_talents(j) for j in sorted(index.jobs.slots)),
+    ]
+
+
+@pytest.mark.parametrize("mmap_arrays", [True, False])
+def test_snapshot_round_trip(tmp_path, mmap_arrays):
+    path = str(tmp_path / "arrays.snap")
+    offsets, data = pack_json([{"a": [1, 2]}, None, "x"])
+    arrays = {
+        "floats": np.linspace(0, 1, 12).reshape(3, 4),
+        "ints": np.arange(5, dtype=np.int8),
+        "offsets": offsets,
+        "data": data,
+        "empty": np.zeros((0, 3)),
+    }
+    size = write_snapshot(path, arrays, {"version": 3})
+    digest = file_hash(path)
+
+    loaded, meta = read_snapshot(path, mmap_arrays)
+    assert meta == {"version": 3}
+    for name, array in arrays.items():
+        assert loaded[name].dtype == array.dtype
+        assert np.array_equal(loaded[name], array)
+    values = JsonValues(loaded["offsets"], loaded["data"])
+    assert [values[i] for i in range(len(values))] == [{"a": [1, 2]}, None, "x"]
+    assert isinstance(base_buffer(loaded["floats"]), mmap.mmap) == mmap_arrays
+
+    # arrays are writable, the file is left as it is
+    loaded["floats"][0, 0] = 42
+    loaded["ints"] += 1
+    assert file_hash(path) == digest
+    assert read_snapshot(path)[0]["floats"][0, 0] == 0
+    assert size == (tmp_path / "arrays.snap").stat().st_size
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / "other.snap"
+    path.write_bytes(b"NOTASNAP" + bytes(64))
+    with pytest.raises(ValueError):
+        read_snapshot(str(path))
+
+
+@pytest.mark.parametrize("fused", [True, False])
+def test_index_warm_start(tmp_path, model_path, profiles, fused):
+    talents, jobs = profiles
+    search = Search(model_path, fused_scoring=fused)
+    index = search.create_index(k=3)
+    index.upsert_talents({i: talents[i] for i in range(10)})
+    index.upsert_jobs({f"j{i}": jobs[i] for i in range(8)})
+    index.remove_talent(3)
+    path = str(tmp_path / "index.snap")
+    index.save(path)
+    digest = file_hash(path)
+
+    loaded = search.load_index(path)
+    assert isinstance(base_buffer(loaded.scores), mmap.mmap)
+    assert state(loaded) == state(index)
+    # the saved scorer scores like the model
+    assert state(MatchingIndex.load(path)) == state(index)
+
+    # updates copy the pages they touch, the snapshot is unchanged
+    for live in (index, loaded, MatchingIndex.load(path, mmap=False)):
+        live.add_talent(3, talents[40])
+        live.add_talent(10, talents[41])
+        live.update_job("j0", jobs[42])
+        live.remove_job("j5")
+        live.add_job("j8", jobs[43])
+    assert state(loaded) == state(index)
+    assert file_hash(path) == digest
+    assert state(search.load_index(path)) != state(loaded)
+
+    other = tmp_path / "other.joblib"
+    other.write_bytes((tmp_path / "model.joblib").read_bytes() + b"\0")
+    with pytest.raises(ValueError):
+        Search(str(other)).load_index(path)
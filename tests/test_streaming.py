@@ -0,0 +1,21 @@
+import io
+import json
+
+import pytest
+
+from src.data.streaming import iter_json_array
+
+ELEMENTS = [1, 1.5e3, "a,]b", {"x": [1, {"y": "é"}]}, [], None, True]
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 7, 1 << 20])
+def test_iter_json_array_across_blocks(block_size):
+    text = " [\n" + " ,\n".join(json.dumps(e) for e in ELEMENTS) + "] "
+    assert list(iter_json_array(io.StringIO(text), block_size)) == ELEMENTS
+    assert list(iter_json_array(io.StringIO(" [ ] "), block_size)) == []
+
+
+@pytest.mark.parametrize("text", ["", "{}", "[1", "[1,", "[1 2]", "[1,]", "[1.5e"])
+def test_iter_json_array_rejects_malformed(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), 2))